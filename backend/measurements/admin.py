@@ -6,7 +6,9 @@ from .models import (
     Measurement,
     Threshold,
     Alert,
-    MeasurementConfiguration
+    MeasurementConfiguration,
+    LatestReading,
+    ReportJob
 )
 
 
@@ -317,6 +319,29 @@ class MeasurementConfigurationAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('station')
 
 
+@admin.register(LatestReading)
+class LatestReadingAdmin(admin.ModelAdmin):
+    """
+    Administrador (solo lectura) para la tabla de estado actual LatestReading
+    """
+    list_display = [
+        'station', 'sensor', 'sensor_type', 'measurement_type',
+        'value', 'unit', 'quality_flag', 'timestamp', 'updated_at'
+    ]
+    list_filter = ['measurement_type', 'station']
+    search_fields = ['station__name', 'station__code', 'sensor__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        """Optimizar consultas"""
+        return super().get_queryset(request).select_related('station', 'sensor', 'sensor_type')
+
+
 # Personalización del admin site
 admin.site.site_header = "Sistema de Monitoreo Río Claro - Administración"
 admin.site.site_title = "Río Claro Admin"
@@ -327,3 +352,23 @@ admin.site.index_title = "Panel de Administración"
 # ========================================
 # Importar el admin del sistema modular
 from . import admin_dynamic
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    """
+    Administrador (solo lectura) para los trabajos asíncronos de reportes
+    """
+    list_display = [
+        'id', 'user', 'report_type', 'file_format', 'status',
+        'created_at', 'finished_at', 'expires_at'
+    ]
+    list_filter = ['status', 'report_type', 'file_format']
+    search_fields = ['user__username', 'params_hash']
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
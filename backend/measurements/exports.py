@@ -0,0 +1,133 @@
+"""
+Exportaciones en modo streaming
+
+Excel: el libro se escribe con openpyxl en modo write-only; cada fila se serializa
+al agregarse y no queda en memoria. El archivo resultante se guarda en un
+SpooledTemporaryFile (en memoria hasta EXPORT_SPOOL_MAX_SIZE bytes, luego en
+disco) y se envía con FileResponse por bloques.
+
+Las filas se reciben como iterables, de modo que la vista puede alimentarlas
+directamente desde la base de datos en bloques keyset (queries.iterate_keyset).
+No se usa .iterator(chunk_size=...): el driver de MySQL carga el resultado
+completo de la consulta aunque se lea por bloques.
+
+CSV / NDJSON: generadores de líneas para StreamingHttpResponse; el servidor
+mantiene en memoria sólo el bloque de filas que está enviando.
+"""
+
+import csv
+import datetime
+import json
+import tempfile
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse
+
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Filas por bloque al leer desde la base de datos
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# Tamaño máximo en memoria del archivo antes de pasar a disco
+EXPORT_SPOOL_MAX_SIZE = getattr(settings, 'EXPORT_SPOOL_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def build_excel_report(sheet_title, title, info_lines, headers, rows, column_count=8):
+    """
+    Genera un reporte Excel en un archivo temporal posicionado al inicio
+
+    - info_lines: líneas de texto bajo el título (período, filtros, etc.)
+    - headers: encabezados de la tabla
+    - rows: iterable de listas de valores (puede ser un generador)
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    # En modo write-only el ancho de columnas se define antes de escribir filas
+    for col in range(1, column_count + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 15
+
+    # Título del reporte
+    title_cell = WriteOnlyCell(ws, value=title)
+    title_cell.font = Font(size=14, bold=True)
+    ws.append([title_cell])
+    ws.merged_cells.add(f'A1:{get_column_letter(column_count)}1')
+    ws.append([])
+
+    # Información del reporte
+    for line in info_lines:
+        ws.append([line])
+
+    # Espacio
+    ws.append([])
+    ws.append([])
+
+    # Encabezados
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = border
+        cell.alignment = Alignment(horizontal='center')
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # Datos (una fila a la vez)
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def excel_report_response(filename, output):
+    """Archivo Excel generado por build_excel_report como descarga"""
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=EXCEL_CONTENT_TYPE
+    )
+
+
+def round_or_none(value, digits=2):
+    """Redondea valores numéricos (Decimal, float o texto) para la planilla"""
+    if value is None or value == '':
+        return None
+    return round(float(value), digits)
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: retorna la línea en lugar de escribirla"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """Genera un archivo CSV línea por línea (encabezado + filas)"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in row
+        ])
+
+
+def stream_ndjson(fields, rows):
+    """Genera un objeto JSON por línea a partir de filas (tuplas) y nombres de campo"""
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
@@ -0,0 +1,356 @@
+"""
+Motor de ingesta por lotes para mediciones (RF2.2)
+
+Procesa un lote completo de mediciones con un número fijo de consultas,
+independiente del tamaño del lote:
+
+1. Validación de campos fila por fila (sin acceso a base de datos)
+2. Precarga de sensores del lote (los umbrales vienen del índice en memoria)
+3. Detección de duplicados con una única consulta por clave
+4. Inserción con bulk_create por bloques
+5. Actualización en bloque del estado actual (LatestReading) y de los
+   agregados horarios/diarios
+6. Evaluación de umbrales en memoria y creación de alertas en bloque
+
+Cada fila recibe un resultado individual (aceptada / rechazada).
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from sensors.models import Sensor
+from rioclaro_api.cache_versions import (
+    ALERTS_NAMESPACE,
+    bump_versions_on_commit,
+    measurement_namespaces
+)
+from rioclaro_api.metrics import ALERTS_CREATED, MEASUREMENTS_INGESTED
+from rioclaro_api.tracing import current_span, span, traced_atomic
+from .models import (
+    Measurement,
+    Alert,
+    AlertLevel,
+    AlertStatus,
+    SENSOR_MEASUREMENT_TYPE_MAP,
+)
+from .threshold_index import threshold_index
+from .latest_readings import record_measurements
+from .rollups import record_rollups
+
+
+# Mapeo de niveles internos de umbral a AlertLevel
+ALERT_LEVEL_MAPPING = {
+    'warning': AlertLevel.WARNING,
+    'critical': AlertLevel.CRITICAL,
+}
+
+# Ventana para evitar alertas repetidas del mismo umbral
+ALERT_DEDUP_WINDOW = timezone.timedelta(hours=1)
+
+
+class BatchMeasurementRowSerializer(serializers.Serializer):
+    """
+    Validación de campos de una fila del lote.
+
+    Estación y sensor se reciben como IDs: su existencia y consistencia
+    se verifican después en bloque, no con una consulta por fila.
+    """
+    station = serializers.IntegerField()
+    sensor = serializers.IntegerField()
+    measurement_type = serializers.ChoiceField(
+        choices=Measurement._meta.get_field('measurement_type').choices
+    )
+    value = serializers.DecimalField(max_digits=12, decimal_places=4)
+    raw_value = serializers.DecimalField(
+        max_digits=12, decimal_places=4, required=False, allow_null=True
+    )
+    unit = serializers.CharField(max_length=20)
+    quality_flag = serializers.ChoiceField(
+        choices=Measurement._meta.get_field('quality_flag').choices,
+        required=False,
+        default='good'
+    )
+    timestamp = serializers.DateTimeField()
+    metadata = serializers.JSONField(required=False, default=dict)
+
+
+class MeasurementBatchIngestor:
+    """
+    Ingesta set-based de un lote de mediciones.
+
+    Uso:
+        result = MeasurementBatchIngestor(rows).run()
+
+    El resultado contiene las mediciones creadas, el conteo y una lista
+    `results` con el estado de cada fila en el mismo orden de entrada.
+    """
+    bulk_batch_size = 500
+
+    def __init__(self, rows, bulk_batch_size=None):
+        self.rows = rows
+        if bulk_batch_size:
+            self.bulk_batch_size = bulk_batch_size
+        self.results = [
+            {'index': index, 'status': 'accepted'} for index in range(len(rows))
+        ]
+
+    def run(self):
+        """Ejecuta la ingesta completa dentro de una transacción"""
+        current_span().set_attribute('rows', len(self.rows))
+        with span('batch.validate_fields'):
+            candidates = self._validate_fields()
+
+        with traced_atomic():
+            with span('batch.validate_sensors'):
+                candidates = self._validate_sensors(candidates)
+            with span('batch.reject_duplicates'):
+                candidates = self._reject_duplicates(candidates)
+
+            with span('batch.insert') as current:
+                candidates, created = self._insert(candidates)
+                current.set_attribute('rows', len(created))
+
+            for (index, _), measurement in zip(candidates, created):
+                self.results[index]['id'] = measurement.pk
+
+            with span('latest_readings'):
+                record_measurements(created)
+            with span('rollups'):
+                record_rollups(created)
+            with span('batch.thresholds') as current:
+                alerts = self._check_thresholds_and_create_alerts(created)
+                current.set_attribute('alerts', len(alerts))
+
+            # bulk_create no emite señales: invalidar las cachés afectadas
+            if created:
+                bump_versions_on_commit(*measurement_namespaces({m.station_id for m in created}))
+            if alerts:
+                bump_versions_on_commit(ALERTS_NAMESPACE)
+
+            # bulk_create tampoco pasa por los contadores de las señales
+            if created:
+                MEASUREMENTS_INGESTED.inc_on_commit(len(created), source='batch')
+            for alert in alerts:
+                ALERTS_CREATED.inc_on_commit(level=alert.level)
+
+        return {
+            'measurements': created,
+            'count': len(created),
+            'rejected_count': sum(1 for r in self.results if r['status'] == 'rejected'),
+            'results': self.results,
+        }
+
+    def _reject(self, index, errors):
+        """Marca una fila como rechazada con sus errores"""
+        self.results[index] = {
+            'index': index,
+            'status': 'rejected',
+            'errors': errors,
+        }
+
+    def _validate_fields(self):
+        """Valida tipos y formatos de cada fila sin consultar la base de datos"""
+        candidates = []
+        now = timezone.now()
+
+        for index, row in enumerate(self.rows):
+            serializer = BatchMeasurementRowSerializer(data=row)
+            if not serializer.is_valid():
+                self._reject(index, serializer.errors)
+                continue
+
+            data = dict(serializer.validated_data)
+            if data['timestamp'] > now:
+                self._reject(index, {
+                    'timestamp': ["La fecha y hora no puede ser futura"]
+                })
+                continue
+
+            candidates.append((index, data))
+
+        return candidates
+
+    def _validate_sensors(self, candidates):
+        """
+        Precarga los sensores del lote (una consulta) y verifica que cada
+        sensor pertenezca a la estación indicada y sea del tipo correcto
+        """
+        sensor_ids = {data['sensor'] for _, data in candidates}
+        self.sensors = Sensor.objects.select_related('station').in_bulk(sensor_ids)
+
+        valid = []
+        for index, data in candidates:
+            sensor = self.sensors.get(data['sensor'])
+            if sensor is None:
+                self._reject(index, {'sensor': ["El sensor especificado no existe"]})
+                continue
+
+            if sensor.station_id != data['station']:
+                self._reject(index, {
+                    'non_field_errors': [
+                        "El sensor especificado no pertenece a la estación indicada"
+                    ]
+                })
+                continue
+
+            expected_type = SENSOR_MEASUREMENT_TYPE_MAP.get(sensor.sensor_type)
+            if expected_type and data['measurement_type'] != expected_type:
+                self._reject(index, {
+                    'measurement_type': [
+                        "Tipo de medición inconsistente con el tipo de sensor"
+                    ]
+                })
+                continue
+
+            data['sensor'] = sensor
+            data['station'] = sensor.station
+            valid.append((index, data))
+
+        return valid
+
+    def _reject_duplicates(self, candidates):
+        """
+        Detecta duplicados (sensor, timestamp) contra la base de datos con
+        una sola consulta, y también duplicados dentro del mismo lote
+        """
+        if not candidates:
+            return candidates
+
+        existing = set(
+            Measurement.objects.filter(
+                sensor_id__in={data['sensor'].pk for _, data in candidates},
+                timestamp__in={data['timestamp'] for _, data in candidates},
+            ).values_list('sensor_id', 'timestamp')
+        )
+
+        unique = []
+        for index, data in candidates:
+            key = (data['sensor'].pk, data['timestamp'])
+            if key in existing:
+                self._reject(index, {
+                    'non_field_errors': [
+                        "Ya existe una medición para este sensor en la fecha y hora especificada"
+                    ]
+                })
+                continue
+            existing.add(key)
+            unique.append((index, data))
+
+        return unique
+
+    def _insert(self, candidates):
+        """
+        Inserta las filas con bulk_create. Si una medición concurrente ocupó
+        la misma clave después de _reject_duplicates, el lote se reintenta
+        fila por fila y solo se rechazan las filas en conflicto.
+
+        Retorna (candidatos insertados, mediciones creadas) en el mismo orden.
+        """
+        measurements = [Measurement(**data) for _, data in candidates]
+        try:
+            with transaction.atomic():
+                created = Measurement.objects.bulk_create(
+                    measurements, batch_size=self.bulk_batch_size
+                )
+        except IntegrityError:
+            return self._insert_row_by_row(candidates)
+
+        self._ensure_primary_keys(created)
+        return candidates, created
+
+    def _insert_row_by_row(self, candidates):
+        """Inserción con un savepoint por fila, rechazando los conflictos"""
+        inserted, created = [], []
+        for index, data in candidates:
+            measurement = Measurement(**data)
+            try:
+                with transaction.atomic():
+                    Measurement.objects.bulk_create([measurement])
+            except IntegrityError:
+                self._reject(index, {
+                    'non_field_errors': [
+                        "Ya existe una medición para este sensor en la fecha y hora especificada"
+                    ]
+                })
+                continue
+            inserted.append((index, data))
+            created.append(measurement)
+
+        self._ensure_primary_keys(created)
+        return inserted, created
+
+    def _ensure_primary_keys(self, measurements):
+        """
+        Recupera los IDs cuando el motor no los devuelve en bulk_create (MySQL)
+        """
+        missing = [m for m in measurements if m.pk is None]
+        if not missing:
+            return
+
+        ids = {
+            (sensor_id, timestamp): pk
+            for pk, sensor_id, timestamp in Measurement.objects.filter(
+                sensor_id__in={m.sensor_id for m in missing},
+                timestamp__in={m.timestamp for m in missing},
+            ).values_list('id', 'sensor_id', 'timestamp')
+        }
+        for measurement in missing:
+            measurement.pk = ids.get((measurement.sensor_id, measurement.timestamp))
+
+    def _check_thresholds_and_create_alerts(self, measurements):
+        """
+        Evalúa umbrales en memoria y crea las alertas del lote en bloque.
+
+        Mantiene la semántica del flujo individual: como máximo una alerta
+        activa por umbral dentro de la ventana de una hora.
+        """
+        if not measurements:
+            return []
+
+        thresholds = threshold_index.get_many({m.station_id for m in measurements})
+        if not thresholds:
+            return []
+
+        recently_alerted = set(
+            Alert.objects.filter(
+                threshold__in=thresholds.values(),
+                status=AlertStatus.ACTIVE,
+                triggered_at__gte=timezone.now() - ALERT_DEDUP_WINDOW
+            ).values_list('threshold_id', flat=True)
+        )
+
+        alerts = []
+        for measurement in measurements:
+            threshold = thresholds.get((measurement.station_id, measurement.measurement_type))
+            if threshold is None or threshold.pk in recently_alerted:
+                continue
+
+            alert_level = threshold.get_alert_level_for_value(measurement.value)
+            if alert_level == 'normal':
+                continue
+
+            recently_alerted.add(threshold.pk)
+            alerts.append(build_threshold_alert(measurement, threshold, alert_level))
+
+        return Alert.objects.bulk_create(alerts)
+
+
+def build_threshold_alert(measurement, threshold, alert_level):
+    """Construye (sin guardar) la alerta automática para un umbral superado"""
+    return Alert(
+        station=measurement.station,
+        measurement=measurement,
+        threshold=threshold,
+        level=ALERT_LEVEL_MAPPING.get(alert_level, AlertLevel.WARNING),
+        title=f"Umbral {alert_level} superado en {measurement.station.name}",
+        message=f"El valor {measurement.value} {measurement.unit} "
+                f"de {measurement.get_measurement_type_display()} "
+                f"ha superado el umbral {alert_level} configurado.",
+        metadata={
+            'value': str(measurement.value),
+            'unit': measurement.unit,
+            'threshold_level': alert_level,
+            'auto_generated': True
+        }
+    )
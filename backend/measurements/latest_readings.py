@@ -0,0 +1,196 @@
+"""
+Mantenimiento de la tabla de estado actual LatestReading (RF2.1)
+
+Las rutas de ingesta llaman a estas funciones dentro de su transacción para
+que la última lectura de cada sensor quede actualizada junto con la medición.
+Cada actualización cuesta una consulta de lectura y una de escritura por
+lote, sin importar cuántas mediciones contenga.
+
+Una lectura sólo reemplaza a la existente si es igual o más reciente, de modo
+que cargar datos históricos no retrocede el estado actual. Las filas
+existentes se leen con select_for_update: dos ingestas concurrentes del mismo
+sensor se serializan y la segunda compara contra lo que confirmó la primera.
+Las claves sin fila se insertan sin actualización posterior; sólo si otra
+ingesta crea la misma fila entre la lectura y la inserción (IntegrityError)
+se compara fila por fila.
+"""
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import LatestReading
+from .queries import latest_per_group
+
+
+UPDATE_FIELDS = [
+    'measurement', 'extensible_measurement', 'measurement_type',
+    'value', 'unit', 'quality_flag', 'timestamp', 'updated_at',
+]
+
+
+def record_measurement(measurement):
+    """Actualiza la lectura actual con una medición clásica"""
+    record_measurements([measurement])
+
+
+def record_measurements(measurements):
+    """Actualiza las lecturas actuales con un lote de mediciones clásicas"""
+    readings = _newest_by_key(
+        measurements,
+        key=lambda m: m.sensor_id,
+        build=lambda m: LatestReading(
+            station_id=m.station_id,
+            sensor_id=m.sensor_id,
+            measurement=m,
+            measurement_type=m.measurement_type,
+            value=m.value,
+            unit=m.unit,
+            quality_flag=m.quality_flag,
+            timestamp=m.timestamp,
+        )
+    )
+    if not readings:
+        return
+
+    existing = {
+        reading.sensor_id: reading
+        for reading in _locked(LatestReading.objects.filter(sensor_id__in=readings.keys()))
+    }
+    _upsert(readings, existing, lookup=lambda r: {'sensor_id': r.sensor_id})
+
+
+def record_extensible_measurements(measurements):
+    """Actualiza las lecturas actuales con mediciones de sensores dinámicos"""
+    readings = _newest_by_key(
+        measurements,
+        key=lambda m: (m.station_id, m.sensor_type_id),
+        build=lambda m: LatestReading(
+            station_id=m.station_id,
+            sensor_type_id=m.sensor_type_id,
+            extensible_measurement=m,
+            value=m.value,
+            unit=m.sensor_type.measurement_unit,
+            quality_flag=m.quality_flag,
+            timestamp=m.timestamp,
+        )
+    )
+    if not readings:
+        return
+
+    existing = {
+        (reading.station_id, reading.sensor_type_id): reading
+        for reading in _locked(LatestReading.objects.filter(
+            station_id__in={station_id for station_id, _ in readings},
+            sensor_type_id__in={sensor_type_id for _, sensor_type_id in readings},
+        ))
+    }
+    _upsert(
+        readings, existing,
+        lookup=lambda r: {'station_id': r.station_id, 'sensor_type_id': r.sensor_type_id}
+    )
+
+
+def _newest_by_key(measurements, key, build):
+    """Conserva sólo la medición más reciente de cada clave del lote"""
+    newest = {}
+    for measurement in measurements:
+        current = newest.get(key(measurement))
+        if current is None or measurement.timestamp >= current.timestamp:
+            newest[key(measurement)] = measurement
+    return {k: build(m) for k, m in newest.items()}
+
+
+def _locked(queryset):
+    """Bloquea las filas leídas hasta el fin de la transacción (orden fijo por id)"""
+    if transaction.get_connection(queryset.db).in_atomic_block:
+        return queryset.select_for_update().order_by('pk')
+    return queryset
+
+
+def _upsert(readings, existing, lookup):
+    """
+    Inserta las lecturas nuevas y actualiza las que son más recientes.
+
+    lookup(lectura) retorna el filtro de la fila única de su clave.
+    """
+    now = timezone.now()
+    to_create = []
+    to_update = []
+
+    for key, reading in readings.items():
+        reading.updated_at = now
+        current = existing.get(key)
+        if current is None:
+            to_create.append(reading)
+        elif reading.timestamp >= current.timestamp:
+            reading.pk = current.pk
+            to_update.append(reading)
+
+    if to_create:
+        try:
+            with transaction.atomic():
+                LatestReading.objects.bulk_create(to_create)
+        except IntegrityError:
+            # Otra ingesta concurrente creó alguna fila entre la lectura y la
+            # inserción: se inserta el resto y se reemplaza sólo si esta
+            # lectura es más reciente
+            LatestReading.objects.bulk_create(to_create, ignore_conflicts=True)
+            for reading in to_create:
+                LatestReading.objects.filter(
+                    **lookup(reading), timestamp__lt=reading.timestamp
+                ).update(**{field: getattr(reading, field) for field in UPDATE_FIELDS})
+    if to_update:
+        LatestReading.objects.bulk_update(to_update, UPDATE_FIELDS)
+
+
+def rebuild_latest_readings(apps=global_apps, batch_size=1000):
+    """
+    Reconstruye la tabla completa desde el historial.
+
+    Recibe el registro de apps para poder usarse desde migraciones con los
+    modelos históricos. Retorna (sensores clásicos, sensores dinámicos).
+    """
+    Measurement = apps.get_model('measurements', 'Measurement')
+    ExtensibleMeasurement = apps.get_model('measurements', 'ExtensibleMeasurement')
+    Reading = apps.get_model('measurements', 'LatestReading')
+    now = timezone.now()
+
+    readings = [
+        Reading(
+            station_id=m.station_id,
+            sensor_id=m.sensor_id,
+            measurement_id=m.pk,
+            measurement_type=m.measurement_type,
+            value=m.value,
+            unit=m.unit,
+            quality_flag=m.quality_flag,
+            timestamp=m.timestamp,
+            updated_at=now,
+        )
+        for m in latest_per_group(Measurement.objects.all(), group_by=('sensor',))
+    ]
+    classic_count = len(readings)
+
+    readings += [
+        Reading(
+            station_id=m.station_id,
+            sensor_type_id=m.sensor_type_id,
+            extensible_measurement_id=m.pk,
+            value=m.value,
+            unit=m.sensor_type.measurement_unit,
+            quality_flag=m.quality_flag,
+            timestamp=m.timestamp,
+            updated_at=now,
+        )
+        for m in latest_per_group(
+            ExtensibleMeasurement.objects.select_related('sensor_type'),
+            group_by=('station', 'sensor_type')
+        )
+    ]
+
+    with transaction.atomic():
+        Reading.objects.all().delete()
+        Reading.objects.bulk_create(readings, batch_size=batch_size)
+
+    return classic_count, len(readings) - classic_count
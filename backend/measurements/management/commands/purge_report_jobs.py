@@ -0,0 +1,38 @@
+"""
+Comando para eliminar los archivos de reportes asíncronos expirados y
+recuperar los trabajos que quedaron pendientes o en ejecución
+"""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from measurements.models import ReportJob
+from measurements.report_jobs import purge_expired_artifacts, recover_stale_report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Recupera trabajos interrumpidos y elimina los archivos de reportes expirados y los trabajos antiguos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Eliminar los registros de trabajos con más de N días (por defecto 30)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Recuperando trabajos interrumpidos...')
+        requeued, failed = recover_stale_report_jobs()
+        self.stdout.write(f'  ✓ {requeued} trabajos encolados de nuevo, {failed} marcados como fallidos')
+
+        self.stdout.write('🔄 Eliminando archivos de reportes expirados...')
+        removed = purge_expired_artifacts()
+        self.stdout.write(f'  ✓ {removed} archivos eliminados')
+
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        deleted, _ = ReportJob.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(f'  ✓ {deleted} trabajos con más de {options["days"]} días eliminados')
+
+        self.stdout.write(self.style.SUCCESS('✅ Limpieza de reportes completada'))
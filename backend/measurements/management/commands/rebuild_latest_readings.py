@@ -0,0 +1,29 @@
+"""
+Comando para reconstruir la tabla de estado actual (LatestReading) desde el historial
+"""
+from django.core.management.base import BaseCommand
+
+from measurements.latest_readings import rebuild_latest_readings
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla LatestReading con la última medición de cada sensor'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamaño de bloque para la inserción (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Reconstruyendo lecturas actuales...')
+
+        classic_count, dynamic_count = rebuild_latest_readings(batch_size=options['batch_size'])
+
+        self.stdout.write(f'  ✓ {classic_count} sensores clásicos')
+        self.stdout.write(f'  ✓ {dynamic_count} sensores dinámicos')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Lecturas actuales reconstruidas: {classic_count + dynamic_count} registros'
+        ))
@@ -0,0 +1,56 @@
+"""
+Comando para recalcular los agregados horarios y diarios desde las mediciones crudas
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from measurements.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados horarios y diarios de mediciones (reportes RF3.1 / RF3.3)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date-from',
+            help='Fecha desde (YYYY-MM-DD). Sin fechas se recalcula todo el historial',
+        )
+        parser.add_argument(
+            '--date-to',
+            help='Fecha hasta (YYYY-MM-DD, inclusive)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Recalcular sólo los últimos N días (incluye hoy)',
+        )
+
+    def handle(self, *args, **options):
+        date_from = self._parse_date(options['date_from'])
+        date_to = self._parse_date(options['date_to'])
+
+        if options['days']:
+            date_to = timezone.localdate()
+            date_from = date_to - datetime.timedelta(days=options['days'] - 1)
+
+        if date_from and date_to and date_from > date_to:
+            raise CommandError('La fecha desde no puede ser mayor que la fecha hasta')
+
+        period = f"{date_from or 'inicio'} → {date_to or 'hoy'}"
+        self.stdout.write(f'🔄 Recalculando agregados de mediciones ({period})...')
+
+        hourly_count, daily_count = rebuild_rollups(date_from, date_to)
+
+        self.stdout.write(f'  ✓ {hourly_count} agregados horarios')
+        self.stdout.write(f'  ✓ {daily_count} agregados diarios')
+        self.stdout.write(self.style.SUCCESS('✅ Agregados recalculados'))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Formato de fecha inválido: {value}. Use YYYY-MM-DD')
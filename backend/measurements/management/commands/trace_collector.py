@@ -0,0 +1,64 @@
+"""
+Colector local de trazas compatible con OTLP/HTTP (JSON)
+
+Recibe POST /v1/traces con el formato JSON de OTLP, como los que envía
+rioclaro_api.tracing con TRACING_EXPORTER = 'otlp', y guarda cada span en un
+archivo JSON lines que luego resume `manage.py trace_report`. Sirve para
+probar la exportación OTLP sin instalar un colector de OpenTelemetry.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from rioclaro_api.tracing import append_records, jsonl_path, records_from_otlp
+
+
+class Command(BaseCommand):
+    help = 'Colector OTLP/HTTP (JSON) local que guarda los spans en un archivo JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Interfaz (por defecto 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=4318, help='Puerto (por defecto 4318, el de OTLP/HTTP)')
+        parser.add_argument('--output', type=str, default=None, help='Archivo de salida (por defecto TRACING_JSONL_PATH)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or jsonl_path()
+        lock = threading.Lock()
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip('/') != '/v1/traces':
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    records = list(records_from_otlp(json.loads(self.rfile.read(length))))
+                except (ValueError, KeyError, TypeError) as e:
+                    self.send_error(400, f'Payload OTLP inválido: {e}')
+                    return
+
+                append_records(output, records, lock)
+                command.stdout.write(f'  ✓ {len(records)} spans recibidos')
+
+                body = b'{}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(f'🔄 Colector OTLP en http://{options["host"]}:{options["port"]}/v1/traces → {output}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(self.style.SUCCESS('✅ Colector detenido'))
@@ -0,0 +1,74 @@
+"""
+Resumen por etapa de las trazas exportadas en formato JSON lines
+
+Agrupa los spans por nombre y muestra conteo, p50, p95 y máximo de la
+duración total y del tiempo propio (duración menos la de sus hijos directos),
+para ver qué etapa de la ingesta o de un reporte concentra el tiempo.
+"""
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rioclaro_api.tracing import jsonl_path
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = 'Resume por etapa las trazas exportadas (TRACING_JSONL_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=str, default=None, help='Archivo JSON lines (por defecto TRACING_JSONL_PATH)')
+        parser.add_argument('--root', type=str, default=None, help='Sólo trazas cuyo span raíz tenga este nombre')
+
+    def handle(self, *args, **options):
+        path = options['file'] or jsonl_path()
+        try:
+            with open(path) as handle:
+                spans = [json.loads(line) for line in handle if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'No existe el archivo de trazas {path}')
+
+        if options['root']:
+            roots = {
+                span['trace_id'] for span in spans
+                if span['parent_id'] is None and span['name'] == options['root']
+            }
+            spans = [span for span in spans if span['trace_id'] in roots]
+
+        children_time = defaultdict(float)
+        for span in spans:
+            if span['parent_id']:
+                children_time[(span['trace_id'], span['parent_id'])] += span['duration_ms']
+
+        durations = defaultdict(list)
+        self_times = defaultdict(list)
+        for span in spans:
+            durations[span['name']].append(span['duration_ms'])
+            self_times[span['name']].append(
+                max(0.0, span['duration_ms'] - children_time[(span['trace_id'], span['span_id'])])
+            )
+
+        traces = len({span['trace_id'] for span in spans})
+        self.stdout.write(f'🔄 {len(spans)} spans en {traces} trazas ({path})')
+        self.stdout.write(
+            f'  {"span":<40} {"n":>6} {"p50 ms":>9} {"p95 ms":>9} {"máx ms":>9} {"propio p50":>11} {"propio p95":>11}'
+        )
+
+        # Ordenado por tiempo propio total: las etapas más costosas primero
+        for name in sorted(self_times, key=lambda name: -sum(self_times[name])):
+            total = sorted(durations[name])
+            own = sorted(self_times[name])
+            self.stdout.write(
+                f'  {name:<40} {len(total):>6} {percentile(total, 0.5):>9.2f} {percentile(total, 0.95):>9.2f} '
+                f'{total[-1]:>9.2f} {percentile(own, 0.5):>11.2f} {percentile(own, 0.95):>11.2f}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Resumen completado'))
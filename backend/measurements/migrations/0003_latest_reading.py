@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0002_dynamic_modular_system'),
+        ('sensors', '0002_initial'),
+        ('stations', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('measurement_type', models.CharField(blank=True, choices=[('water_level', 'Nivel de Agua'), ('flow_rate', 'Caudal'), ('temperature', 'Temperatura'), ('ph', 'pH'), ('rainfall', 'Precipitación')], max_length=20, verbose_name='Tipo de Medición')),
+                ('value', models.DecimalField(decimal_places=6, max_digits=15, verbose_name='Valor')),
+                ('unit', models.CharField(blank=True, max_length=20, verbose_name='Unidad')),
+                ('quality_flag', models.CharField(default='good', max_length=20, verbose_name='Indicador de Calidad')),
+                ('timestamp', models.DateTimeField(verbose_name='Fecha y Hora')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('extensible_measurement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='measurements.extensiblemeasurement', verbose_name='Medición Extensible')),
+                ('measurement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='measurements.measurement', verbose_name='Medición')),
+                ('sensor', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='latest_reading', to='sensors.sensor', verbose_name='Sensor')),
+                ('sensor_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='latest_readings', to='measurements.dynamicsensortype', verbose_name='Sensor Dinámico')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_readings', to='stations.station', verbose_name='Estación')),
+            ],
+            options={
+                'verbose_name': 'Lectura Actual',
+                'verbose_name_plural': 'Lecturas Actuales',
+                'db_table': 'latest_readings',
+                'ordering': ['station', '-timestamp'],
+                'unique_together': {('station', 'sensor_type')},
+            },
+        ),
+    ]
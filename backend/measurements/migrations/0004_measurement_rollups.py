@@ -0,0 +1,67 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0003_latest_reading'),
+        ('stations', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('measurement_type', models.CharField(choices=[('water_level', 'Nivel de Agua'), ('flow_rate', 'Caudal'), ('temperature', 'Temperatura'), ('ph', 'pH'), ('rainfall', 'Precipitación')], max_length=20, verbose_name='Tipo de Medición')),
+                ('unit', models.CharField(max_length=20, verbose_name='Unidad')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Cantidad')),
+                ('sum_value', models.DecimalField(decimal_places=4, default=0, max_digits=24, verbose_name='Suma')),
+                ('sum_squares', models.FloatField(default=0, verbose_name='Suma de Cuadrados')),
+                ('min_value', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Mínimo')),
+                ('max_value', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Máximo')),
+                ('first_timestamp', models.DateTimeField(verbose_name='Primera Medición')),
+                ('last_timestamp', models.DateTimeField(verbose_name='Última Medición')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bucket', models.DateField(verbose_name='Fecha')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stations.station', verbose_name='Estación')),
+            ],
+            options={
+                'verbose_name': 'Agregado Diario',
+                'verbose_name_plural': 'Agregados Diarios',
+                'db_table': 'measurement_daily_rollups',
+                'ordering': ['bucket', 'station'],
+                'indexes': [models.Index(fields=['measurement_type', 'bucket'], name='measurement_measure_cd4a19_idx')],
+                'unique_together': {('station', 'measurement_type', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MeasurementHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('measurement_type', models.CharField(choices=[('water_level', 'Nivel de Agua'), ('flow_rate', 'Caudal'), ('temperature', 'Temperatura'), ('ph', 'pH'), ('rainfall', 'Precipitación')], max_length=20, verbose_name='Tipo de Medición')),
+                ('unit', models.CharField(max_length=20, verbose_name='Unidad')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Cantidad')),
+                ('sum_value', models.DecimalField(decimal_places=4, default=0, max_digits=24, verbose_name='Suma')),
+                ('sum_squares', models.FloatField(default=0, verbose_name='Suma de Cuadrados')),
+                ('min_value', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Mínimo')),
+                ('max_value', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Máximo')),
+                ('first_timestamp', models.DateTimeField(verbose_name='Primera Medición')),
+                ('last_timestamp', models.DateTimeField(verbose_name='Última Medición')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bucket', models.DateTimeField(verbose_name='Hora')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stations.station', verbose_name='Estación')),
+            ],
+            options={
+                'verbose_name': 'Agregado Horario',
+                'verbose_name_plural': 'Agregados Horarios',
+                'db_table': 'measurement_hourly_rollups',
+                'ordering': ['bucket', 'station'],
+                'indexes': [models.Index(fields=['measurement_type', 'bucket'], name='measurement_measure_86cdce_idx')],
+                'unique_together': {('station', 'measurement_type', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:56
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0004_measurement_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(max_length=30, verbose_name='Tipo de Reporte')),
+                ('file_format', models.CharField(max_length=10, verbose_name='Formato')),
+                ('params', models.JSONField(default=dict, verbose_name='Parámetros')),
+                ('params_hash', models.CharField(db_index=True, max_length=64, verbose_name='Hash de Parámetros')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En ejecución'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('artifact_name', models.CharField(blank=True, max_length=255, verbose_name='Archivo')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expira en')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reportes',
+                'db_table': 'report_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', 'status'], name='report_jobs_params__d8677c_idx'), models.Index(fields=['user', '-created_at'], name='report_jobs_user_id_f73ed8_idx')],
+            },
+        ),
+    ]
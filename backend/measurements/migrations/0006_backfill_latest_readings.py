@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def backfill_latest_readings(apps, schema_editor):
+    """Llena LatestReading con la última medición de cada sensor existente"""
+    from measurements.latest_readings import rebuild_latest_readings
+
+    rebuild_latest_readings(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0005_report_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_latest_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def backfill_measurement_rollups(apps, schema_editor):
+    """Calcula los agregados horarios y diarios de todo el historial existente"""
+    from measurements.rollups import rebuild_rollups
+
+    rebuild_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0006_backfill_latest_readings'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_measurement_rollups, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from stations.models import Station
 from sensors.models import Sensor
+from rioclaro_api.tracing import span
 
 
 class MeasurementType(models.TextChoices):
@@ -15,6 +18,15 @@ class MeasurementType(models.TextChoices):
     RAINFALL = 'rainfall', 'Precipitación'
 
 
+# Tipo de medición esperado para cada tipo de sensor físico
+SENSOR_MEASUREMENT_TYPE_MAP = {
+    'water_level': MeasurementType.WATER_LEVEL,
+    'flow_rate': MeasurementType.FLOW_RATE,
+    'temperature': MeasurementType.TEMPERATURE,
+    'ph': MeasurementType.PH,
+}
+
+
 class Measurement(models.Model):
     """
     Modelo principal para almacenar mediciones de sensores (RF2.2, RF2.3)
@@ -119,21 +131,16 @@ class Measurement(models.Model):
         """
         Override save para validaciones adicionales y consistencia de datos
         """
-        # Asegurar que el sensor pertenece a la estación
-        if self.sensor.station != self.station:
-            raise ValueError("El sensor debe pertenecer a la estación especificada")
-
-        # Asegurar consistencia en el tipo de medición
-        if hasattr(self.sensor, 'sensor_type'):
-            sensor_type_mapping = {
-                'water_level': MeasurementType.WATER_LEVEL,
-                'flow_rate': MeasurementType.FLOW_RATE,
-                'temperature': MeasurementType.TEMPERATURE,
-                'ph': MeasurementType.PH,
-            }
-            expected_type = sensor_type_mapping.get(self.sensor.sensor_type)
-            if expected_type and self.measurement_type != expected_type:
-                raise ValueError(f"Tipo de medición inconsistente con el tipo de sensor")
+        with span('measurement.integrity_checks'):
+            # Asegurar que el sensor pertenece a la estación
+            if self.sensor.station != self.station:
+                raise ValueError("El sensor debe pertenecer a la estación especificada")
+
+            # Asegurar consistencia en el tipo de medición
+            if hasattr(self.sensor, 'sensor_type'):
+                expected_type = SENSOR_MEASUREMENT_TYPE_MAP.get(self.sensor.sensor_type)
+                if expected_type and self.measurement_type != expected_type:
+                    raise ValueError(f"Tipo de medición inconsistente con el tipo de sensor")
 
         super().save(*args, **kwargs)
 
@@ -457,3 +464,233 @@ class MeasurementConfiguration(models.Model):
 
     def __str__(self):
         return f"Config {self.station.name} - {self.measurement_interval_minutes}min"
+
+
+class LatestReading(models.Model):
+    """
+    Estado actual por sensor (RF2.1)
+
+    Tabla pequeña con la última lectura de cada sensor, actualizada en la
+    misma transacción de la ingesta. El dashboard la consulta en lugar de
+    buscar en la tabla completa de mediciones.
+
+    - Mediciones clásicas: una fila por sensor físico (sensor)
+    - Mediciones extensibles: una fila por estación y sensor dinámico (sensor_type)
+    """
+    station = models.ForeignKey(
+        Station,
+        on_delete=models.CASCADE,
+        related_name='latest_readings',
+        verbose_name='Estación'
+    )
+    sensor = models.OneToOneField(
+        Sensor,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='latest_reading',
+        verbose_name='Sensor'
+    )
+    sensor_type = models.ForeignKey(
+        'measurements.DynamicSensorType',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='latest_readings',
+        verbose_name='Sensor Dinámico'
+    )
+    measurement = models.ForeignKey(
+        Measurement,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Medición'
+    )
+    extensible_measurement = models.ForeignKey(
+        'measurements.ExtensibleMeasurement',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Medición Extensible'
+    )
+    measurement_type = models.CharField(
+        max_length=20,
+        choices=MeasurementType.choices,
+        blank=True,
+        verbose_name='Tipo de Medición'
+    )
+    value = models.DecimalField(
+        max_digits=15,
+        decimal_places=6,
+        verbose_name='Valor'
+    )
+    unit = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name='Unidad'
+    )
+    quality_flag = models.CharField(
+        max_length=20,
+        default='good',
+        verbose_name='Indicador de Calidad'
+    )
+    timestamp = models.DateTimeField(verbose_name='Fecha y Hora')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'latest_readings'
+        verbose_name = 'Lectura Actual'
+        verbose_name_plural = 'Lecturas Actuales'
+        ordering = ['station', '-timestamp']
+        # Una fila por sensor dinámico en cada estación (sensor_type NULL en clásicas)
+        unique_together = ('station', 'sensor_type')
+
+    def __str__(self):
+        return f"{self.station.name}: {self.value} {self.unit} ({self.timestamp})"
+
+
+class MeasurementRollup(models.Model):
+    """
+    Base de los agregados por período de mediciones (RF3.1, RF3.3)
+
+    Guarda sumas parciales (conteo, suma, suma de cuadrados, mínimo, máximo)
+    de las mediciones de buena calidad, de modo que promedios y desviación
+    estándar se obtienen sin recorrer las mediciones crudas.
+    """
+    station = models.ForeignKey(
+        Station,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Estación'
+    )
+    measurement_type = models.CharField(
+        max_length=20,
+        choices=MeasurementType.choices,
+        verbose_name='Tipo de Medición'
+    )
+    unit = models.CharField(max_length=20, verbose_name='Unidad')
+    count = models.PositiveIntegerField(default=0, verbose_name='Cantidad')
+    sum_value = models.DecimalField(
+        max_digits=24,
+        decimal_places=4,
+        default=0,
+        verbose_name='Suma'
+    )
+    sum_squares = models.FloatField(default=0, verbose_name='Suma de Cuadrados')
+    min_value = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Mínimo')
+    max_value = models.DecimalField(max_digits=12, decimal_places=4, verbose_name='Máximo')
+    first_timestamp = models.DateTimeField(verbose_name='Primera Medición')
+    last_timestamp = models.DateTimeField(verbose_name='Última Medición')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def avg_value(self):
+        """Promedio del período"""
+        return self.sum_value / self.count if self.count else None
+
+    @property
+    def std_value(self):
+        """Desviación estándar poblacional del período"""
+        if not self.count:
+            return None
+        mean = float(self.sum_value) / self.count
+        return max(self.sum_squares / self.count - mean * mean, 0.0) ** 0.5
+
+
+class MeasurementHourlyRollup(MeasurementRollup):
+    """
+    Agregado horario de mediciones (bucket: inicio de la hora en UTC)
+    """
+    bucket = models.DateTimeField(verbose_name='Hora')
+
+    class Meta:
+        db_table = 'measurement_hourly_rollups'
+        verbose_name = 'Agregado Horario'
+        verbose_name_plural = 'Agregados Horarios'
+        ordering = ['bucket', 'station']
+        unique_together = ('station', 'measurement_type', 'bucket')
+        indexes = [
+            models.Index(fields=['measurement_type', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.station_id} - {self.measurement_type} @ {self.bucket}: {self.count}"
+
+
+class MeasurementDailyRollup(MeasurementRollup):
+    """
+    Agregado diario de mediciones (bucket: fecha en la zona horaria local)
+    """
+    bucket = models.DateField(verbose_name='Fecha')
+
+    class Meta:
+        db_table = 'measurement_daily_rollups'
+        verbose_name = 'Agregado Diario'
+        verbose_name_plural = 'Agregados Diarios'
+        ordering = ['bucket', 'station']
+        unique_together = ('station', 'measurement_type', 'bucket')
+        indexes = [
+            models.Index(fields=['measurement_type', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.station_id} - {self.measurement_type} @ {self.bucket}: {self.count}"
+
+
+class ReportJobStatus(models.TextChoices):
+    """Estados de un trabajo de generación de reportes"""
+    PENDING = 'pending', 'Pendiente'
+    RUNNING = 'running', 'En ejecución'
+    COMPLETED = 'completed', 'Completado'
+    FAILED = 'failed', 'Fallido'
+
+
+class ReportJob(models.Model):
+    """
+    Trabajo asíncrono de exportación de reportes PDF/Excel (Módulo 3)
+
+    El archivo generado se guarda con el hash de los parámetros normalizados
+    (params_hash), de modo que una solicitud idéntica reutiliza el archivo
+    mientras no expire.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_jobs',
+        verbose_name='Usuario'
+    )
+    report_type = models.CharField(max_length=30, verbose_name='Tipo de Reporte')
+    file_format = models.CharField(max_length=10, verbose_name='Formato')
+    params = models.JSONField(default=dict, verbose_name='Parámetros')
+    params_hash = models.CharField(max_length=64, db_index=True, verbose_name='Hash de Parámetros')
+    status = models.CharField(
+        max_length=20,
+        choices=ReportJobStatus.choices,
+        default=ReportJobStatus.PENDING,
+        verbose_name='Estado'
+    )
+    artifact_name = models.CharField(max_length=255, blank=True, verbose_name='Archivo')
+    error_message = models.TextField(blank=True, verbose_name='Error')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name='Expira en')
+
+    class Meta:
+        db_table = 'report_jobs'
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reportes'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['params_hash', 'status']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} ({self.file_format}) - {self.get_status_display()}"
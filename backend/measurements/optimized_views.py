@@ -6,7 +6,6 @@ import logging
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Q, Avg, Min, Max, Count, F
-from django.core.cache import cache
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -14,14 +13,22 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rioclaro_api.mixins import ComprehensiveOptimizationMixin
-from .models import Measurement, Station, Alert, Threshold
+from rioclaro_api.access_scope import get_access_scope, station_scope_key
+from rioclaro_api.cache_versions import (
+    MEASUREMENTS_NAMESPACE,
+    THRESHOLDS_NAMESPACE,
+    ALERTS_NAMESPACE,
+    station_namespace,
+    measurement_namespaces
+)
+from .models import Measurement, Alert, Threshold
+from .queries import latest_per_group
 from .serializers import (
     MeasurementListSerializer,
     MeasurementDetailSerializer,
     AlertSerializer,
     ThresholdSerializer
 )
-from users.models import UserRole
 
 logger = logging.getLogger(__name__)
 
@@ -37,20 +44,17 @@ class OptimizedMeasurementViewSet(ComprehensiveOptimizationMixin, viewsets.Model
 
     # Optimization settings
     select_related_fields = ['station', 'sensor']
-    cache_timeout = 300  # 5 minutes
+    cache_timeout = 1800  # 30 minutes (writes invalidate through namespace versions)
+    cache_namespaces = (MEASUREMENTS_NAMESPACE,)
+    cache_key_prefix = 'measurements_api'
     rate_limit_key = 'measurements'
     rate_limit_requests = 200
     rate_limit_window = 3600
 
     def get_queryset(self):
         """Optimized queryset with proper filtering and permissions."""
-        queryset = Measurement.objects.all()
-
         # Apply user permissions
-        if self.request.user.role != UserRole.ADMIN:
-            # Filter to only stations assigned to the user
-            assigned_stations = self.request.user.assigned_stations.all()
-            queryset = queryset.filter(station__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(Measurement.objects.all())
 
         # Apply query optimizations
         queryset = queryset.select_related(*self.select_related_fields)
@@ -58,6 +62,13 @@ class OptimizedMeasurementViewSet(ComprehensiveOptimizationMixin, viewsets.Model
         # Order by timestamp for consistent pagination
         return queryset.order_by('-timestamp')
 
+    def get_cache_namespaces(self, request, *args, **kwargs):
+        """Station-filtered requests only depend on that station's writes."""
+        station_id = request.query_params.get('station') or request.query_params.get('station_id')
+        if station_id and station_id.isdigit():
+            return [station_namespace(station_id)]
+        return super().get_cache_namespaces(request, *args, **kwargs)
+
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'retrieve':
@@ -66,48 +77,34 @@ class OptimizedMeasurementViewSet(ComprehensiveOptimizationMixin, viewsets.Model
 
     def list(self, request, *args, **kwargs):
         """Cached list with pagination."""
-        # Check cache first
-        cached_response = self.get_cached_response(request, *args, **kwargs)
-        if cached_response:
-            return cached_response
-
-        # Get paginated response
-        response = super().list(request, *args, **kwargs)
+        parent_list = super().list
 
-        # Cache the response
-        if response.status_code == 200:
-            self.set_cached_response(request, response.data, *args, **kwargs)
-
-        return response
+        # Errors are raised as exceptions, so only successful pages are cached
+        data = self.get_or_set_cached(
+            request, lambda: parent_list(request, *args, **kwargs).data, *args, **kwargs
+        )
+        return Response(data)
 
     @action(detail=False, methods=['get'])
     def latest_by_station(self, request):
         """Get latest measurements grouped by station."""
-        cache_key = f"latest_measurements:{request.user.id}"
-        cached_data = cache.get(cache_key)
-
-        if cached_data:
-            return Response(cached_data)
-
-        # Get user's stations
-        if request.user.role == UserRole.ADMIN:
-            stations = Station.objects.filter(is_active=True)
-        else:
-            stations = request.user.assigned_stations.filter(is_active=True)
+        cache_key = self.get_versioned_cache_key(
+            f"latest_measurements:{station_scope_key(request)}", [MEASUREMENTS_NAMESPACE]
+        )
 
-        latest_data = []
-        for station in stations:
-            latest_measurement = Measurement.objects.filter(
-                station=station
-            ).select_related('station', 'sensor').order_by('-timestamp').first()
+        def compute():
+            # Get user's stations
+            stations = get_access_scope(request).stations().filter(is_active=True)
 
-            if latest_measurement:
-                serializer = MeasurementDetailSerializer(latest_measurement)
-                latest_data.append(serializer.data)
+            # Single query: latest row per station
+            latest_measurements = latest_per_group(
+                Measurement.objects.filter(station__in=stations).select_related('station', 'sensor'),
+                group_by=('station',)
+            )
+            return MeasurementDetailSerializer(latest_measurements, many=True).data
 
-        # Cache for 2 minutes (real-time data)
-        cache.set(cache_key, latest_data, 120)
-        return Response(latest_data)
+        # New measurements bump the namespace version, so a long TTL is safe
+        return Response(self.get_or_set_cached_key(cache_key, compute, 1800))
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -116,46 +113,46 @@ class OptimizedMeasurementViewSet(ComprehensiveOptimizationMixin, viewsets.Model
         measurement_type = request.query_params.get('measurement_type')
         days = int(request.query_params.get('days', 7))
 
-        cache_key = f"stats:{request.user.id}:{station_id}:{measurement_type}:{days}"
-        cached_stats = cache.get(cache_key)
-
-        if cached_stats:
-            return Response(cached_stats)
+        cache_key = self.get_versioned_cache_key(
+            f"stats:{station_scope_key(request)}:{station_id}:{measurement_type}:{days}",
+            self.get_cache_namespaces(request)
+        )
 
-        # Calculate date range
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
+        def compute():
+            # Calculate date range
+            end_date = timezone.now()
+            start_date = end_date - timedelta(days=days)
 
-        # Build query
-        queryset = self.get_queryset().filter(
-            timestamp__gte=start_date,
-            timestamp__lte=end_date
-        )
+            # Build query
+            queryset = self.get_queryset().filter(
+                timestamp__gte=start_date,
+                timestamp__lte=end_date
+            )
 
-        if station_id:
-            queryset = queryset.filter(station_id=station_id)
+            if station_id:
+                queryset = queryset.filter(station_id=station_id)
 
-        if measurement_type:
-            queryset = queryset.filter(measurement_type=measurement_type)
+            if measurement_type:
+                queryset = queryset.filter(measurement_type=measurement_type)
 
-        # Calculate statistics
-        stats = queryset.aggregate(
-            count=Count('id'),
-            avg_value=Avg('value'),
-            min_value=Min('value'),
-            max_value=Max('value')
-        )
+            # Calculate statistics
+            stats = queryset.aggregate(
+                count=Count('id'),
+                avg_value=Avg('value'),
+                min_value=Min('value'),
+                max_value=Max('value')
+            )
 
-        # Add time-based statistics
-        stats.update({
-            'period_start': start_date.isoformat(),
-            'period_end': end_date.isoformat(),
-            'measurements_per_day': stats['count'] / days if days > 0 else 0
-        })
+            # Add time-based statistics
+            stats.update({
+                'period_start': start_date.isoformat(),
+                'period_end': end_date.isoformat(),
+                'measurements_per_day': stats['count'] / days if days > 0 else 0
+            })
+            return stats
 
         # Cache for 10 minutes
-        cache.set(cache_key, stats, 600)
-        return Response(stats)
+        return Response(self.get_or_set_cached_key(cache_key, compute, 600))
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
@@ -175,9 +172,10 @@ class OptimizedMeasurementViewSet(ComprehensiveOptimizationMixin, viewsets.Model
             batch_size=100
         )
 
-        # Invalidate related caches
-        self.invalidate_cache_pattern('latest_measurements')
-        self.invalidate_cache_pattern('stats')
+        # bulk_create skips model signals: invalidate the touched stations here
+        created_station_ids = {measurement.station_id for measurement in result['created_objects']}
+        if created_station_ids:
+            self.invalidate_cache_namespaces(*measurement_namespaces(created_station_ids))
 
         return Response({
             'created_count': result['created_count'],
@@ -194,102 +192,72 @@ class OptimizedAlertViewSet(ComprehensiveOptimizationMixin, viewsets.ModelViewSe
 
     # Optimization settings
     select_related_fields = ['measurement__station', 'measurement__sensor', 'threshold']
-    cache_timeout = 60  # 1 minute for alerts (more real-time)
+    cache_timeout = 600  # 10 minutes (alert writes invalidate through namespace versions)
+    cache_namespaces = (ALERTS_NAMESPACE,)
+    cache_key_prefix = 'alerts_api'
     rate_limit_key = 'alerts'
 
     def get_queryset(self):
         """Optimized queryset for alerts."""
-        queryset = Alert.objects.all()
-
         # Apply user permissions
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.all()
-            queryset = queryset.filter(measurement__station__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(Alert.objects.all(), 'measurement__station')
 
         return queryset.select_related(*self.select_related_fields).order_by('-created_at')
 
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get active alerts with caching."""
-        cache_key = f"active_alerts:{request.user.id}"
-        cached_alerts = cache.get(cache_key)
+        cache_key = self.get_versioned_cache_key(f"active_alerts:{station_scope_key(request)}", [ALERTS_NAMESPACE])
 
-        if cached_alerts:
-            return Response(cached_alerts)
+        def compute():
+            # Get active alerts
+            active_alerts = self.get_queryset().filter(status='active')
+            return self.get_serializer(active_alerts, many=True).data
 
-        # Get active alerts
-        active_alerts = self.get_queryset().filter(status='active')
-        serializer = self.get_serializer(active_alerts, many=True)
-
-        # Cache for 30 seconds (very real-time)
-        cache.set(cache_key, serializer.data, 30)
-        return Response(serializer.data)
+        return Response(self.get_or_set_cached_key(cache_key, compute, self.cache_timeout))
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get alert summary statistics."""
-        cache_key = f"alert_summary:{request.user.id}"
-        cached_summary = cache.get(cache_key)
-
-        if cached_summary:
-            return Response(cached_summary)
-
-        queryset = self.get_queryset()
-
-        # Calculate summary
-        summary = {
-            'total_alerts': queryset.count(),
-            'active_alerts': queryset.filter(status='active').count(),
-            'critical_alerts': queryset.filter(level='critical').count(),
-            'warning_alerts': queryset.filter(level='warning').count(),
-            'alerts_last_24h': queryset.filter(
-                created_at__gte=timezone.now() - timedelta(hours=24)
-            ).count()
-        }
+        cache_key = self.get_versioned_cache_key(f"alert_summary:{station_scope_key(request)}", [ALERTS_NAMESPACE])
+
+        def compute():
+            queryset = self.get_queryset()
+
+            # Calculate summary
+            return {
+                'total_alerts': queryset.count(),
+                'active_alerts': queryset.filter(status='active').count(),
+                'critical_alerts': queryset.filter(level='critical').count(),
+                'warning_alerts': queryset.filter(level='warning').count(),
+                'alerts_last_24h': queryset.filter(
+                    created_at__gte=timezone.now() - timedelta(hours=24)
+                ).count()
+            }
 
         # Cache for 2 minutes
-        cache.set(cache_key, summary, 120)
-        return Response(summary)
+        return Response(self.get_or_set_cached_key(cache_key, compute, 120))
 
 
 class OptimizedThresholdViewSet(ComprehensiveOptimizationMixin, viewsets.ModelViewSet):
     """
     Optimized ViewSet for thresholds.
+
+    Threshold writes bump the thresholds namespace through model signals
+    (measurements.signals), so every write path invalidates cached data.
     """
     serializer_class = ThresholdSerializer
     permission_classes = [IsAuthenticated]
 
     # Optimization settings
     select_related_fields = ['station']
-    cache_timeout = 1800  # 30 minutes (thresholds change less frequently)
+    cache_timeout = 21600  # 6 hours (threshold writes invalidate through namespace versions)
+    cache_namespaces = (THRESHOLDS_NAMESPACE,)
+    cache_key_prefix = 'thresholds_api'
 
     def get_queryset(self):
         """Optimized queryset for thresholds."""
-        queryset = Threshold.objects.all()
-
         # Apply user permissions
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.all()
-            queryset = queryset.filter(station__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(Threshold.objects.all())
 
         return queryset.select_related(*self.select_related_fields)
-
-    def create(self, request, *args, **kwargs):
-        """Override create to invalidate cache."""
-        response = super().create(request, *args, **kwargs)
-
-        if response.status_code == 201:
-            # Invalidate threshold-related caches
-            self.invalidate_cache_pattern('thresholds')
-
-        return response
-
-    def update(self, request, *args, **kwargs):
-        """Override update to invalidate cache."""
-        response = super().update(request, *args, **kwargs)
-
-        if response.status_code == 200:
-            # Invalidate threshold-related caches
-            self.invalidate_cache_pattern('thresholds')
-
-        return response
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Paginación por cursor (keyset) para listas de mediciones y alertas (RF2.3, RF2.5)
+
+La paginación por número de página ejecuta un COUNT(*) en cada petición y un
+OFFSET que crece con la profundidad de la página. La paginación keyset
+posiciona cada página con la clave (timestamp, id) del último elemento
+entregado, por lo que el costo de una página es constante y no hay COUNT.
+
+Se activa por petición con ?pagination=cursor (o al enviar ?cursor=...).
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .queries import keyset_after
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación keyset sobre (ordering_field, id)
+
+    Respeta el sentido del ordenamiento del queryset (ascendente o
+    descendente) cuando el primer criterio es ordering_field.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self, ordering_field='timestamp', page_size=50,
+                 page_size_query_param='page_size', max_page_size=1000):
+        self.ordering_field = ordering_field
+        self.page_size = page_size
+        self.page_size_query_param = page_size_query_param
+        self.max_page_size = max_page_size
+
+    def get_descending(self, queryset):
+        """
+        Sentido del ordenamiento del queryset respecto a ordering_field, o
+        None si el queryset está ordenado por otro campo
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        first = str(ordering[0]) if ordering else f'-{self.ordering_field}'
+        if first == self.ordering_field:
+            return False
+        if first == f'-{self.ordering_field}':
+            return True
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.descending = self.get_descending(queryset)
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        # Al retroceder se recorre en sentido inverso y luego se invierte la página
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.ordering_field}', f'{prefix}id')
+
+        if cursor:
+            queryset = queryset.filter(
+                keyset_after(self.ordering_field, cursor['position'], cursor['id'], descending)
+            )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, instance, reverse):
+        """Construye la URL de la página siguiente/anterior a partir de un elemento"""
+        position = getattr(instance, self.ordering_field)
+        payload = json.dumps({
+            'p': position.isoformat() if isinstance(position, datetime.datetime) else position,
+            'i': instance.pk,
+            'r': 1 if reverse else 0,
+        }, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        url = replace_query_param(url, 'pagination', 'cursor')
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        """Decodifica el cursor de la petición (None si es la primera página)"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position = payload['p']
+            if isinstance(position, str):
+                position = parse_datetime(position)
+                if position is None:
+                    raise ValueError
+            return {
+                'position': position,
+                'id': int(payload['i']),
+                'reverse': bool(payload.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class SelectablePagination(PageNumberPagination):
+    """
+    Paginación por número de página con modo keyset opcional
+
+    - Por defecto: PageNumberPagination (count, next, previous, results)
+    - ?pagination=cursor o ?cursor=...: KeysetPagination sobre
+      (keyset_field, id), sin COUNT (next, previous, results)
+
+    Si la petición ordena por un campo distinto de keyset_field se usa la
+    paginación por número de página.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    keyset_field = 'timestamp'
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+
+        if request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params:
+            keyset = KeysetPagination(
+                ordering_field=self.keyset_field,
+                page_size=self.page_size,
+                page_size_query_param=self.page_size_query_param,
+                max_page_size=self.max_page_size,
+            )
+            if keyset.get_descending(queryset) is not None:
+                self.keyset = keyset
+                return keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,74 @@
+"""
+Consultas compartidas de mediciones (RF2.1)
+
+latest_per_group obtiene la última fila de cada grupo (por ejemplo, la última
+medición de cada estación) en una sola consulta, en lugar de una consulta
+ORDER BY -timestamp LIMIT 1 por grupo.
+
+- PostgreSQL: SELECT DISTINCT ON (grupo) ... ORDER BY grupo, -timestamp
+- Otros motores (SQLite >= 3.25, MySQL 8): ROW_NUMBER() OVER (PARTITION BY grupo)
+
+iterate_keyset recorre un queryset grande por bloques keyset sobre
+(campo de orden, id): cada bloque es una consulta independiente con LIMIT,
+posicionada después de la última fila del bloque anterior. A diferencia de
+.iterator(chunk_size=...), la memoria usada es la de un bloque también en
+MySQL, cuyo driver carga el resultado completo de cada consulta.
+"""
+
+from django.db import connections
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+
+def latest_per_group(queryset, group_by=('station', 'measurement_type'), order_field='timestamp'):
+    """
+    Retorna un queryset con la fila más reciente por cada combinación de
+    los campos de group_by.
+
+    Los empates en order_field se resuelven por el id más alto.
+    """
+    group_by = list(group_by)
+    ordering = [F(order_field).desc(), F('pk').desc()]
+
+    if connections[queryset.db].features.can_distinct_on_fields:
+        return queryset.order_by(*group_by, *ordering).distinct(*group_by)
+
+    return queryset.annotate(
+        group_row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F(field) for field in group_by],
+            order_by=ordering,
+        )
+    ).filter(group_row_number=1).order_by(*group_by)
+
+
+def keyset_after(ordering_field, position, pk, descending=False):
+    """Filtro de las filas posteriores a (position, pk) en el orden (ordering_field, id)"""
+    lookup = 'lt' if descending else 'gt'
+    return (
+        Q(**{f'{ordering_field}__{lookup}': position}) |
+        Q(**{ordering_field: position, f'id__{lookup}': pk})
+    )
+
+
+def iterate_keyset(queryset, ordering_field='timestamp', chunk_size=2000, descending=False, key=None):
+    """
+    Recorre el queryset ordenado por (ordering_field, id) en bloques de
+    chunk_size filas, una consulta por bloque
+
+    key(fila) retorna (valor de ordering_field, id) de una fila; por defecto
+    se leen de los atributos del objeto. Para values_list, incluir ambos
+    campos y pasar key.
+    """
+    if key is None:
+        key = lambda row: (getattr(row, ordering_field), row.pk)
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}{ordering_field}', f'{prefix}id')
+
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        position, pk = key(chunk[-1])
+        chunk = list(queryset.filter(keyset_after(ordering_field, position, pk, descending))[:chunk_size])
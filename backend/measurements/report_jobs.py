@@ -0,0 +1,430 @@
+"""
+Generación asíncrona de reportes PDF/Excel (Módulo 3)
+
+La exportación síncrona construye el documento dentro de la petición HTTP.
+Con trabajos asíncronos el cliente:
+
+1. Envía la solicitud (POST reports/jobs/) y recibe el id del trabajo
+2. Consulta el estado (GET reports/jobs/<id>/)
+3. Descarga el archivo al completarse (GET reports/jobs/<id>/download/)
+
+Ejecución:
+- Celery, si está instalado y el broker acepta el mensaje
+- Pool de hilos del propio proceso como respaldo cuando no hay broker
+- En línea si CELERY_TASK_ALWAYS_EAGER está activo (tests)
+
+El archivo se construye con build_report_pdf / build_report_excel (reports.py),
+las mismas funciones que usa la exportación síncrona, con el usuario y los
+parámetros guardados en el trabajo.
+
+Un trabajo del pool local se pierde si el proceso se reinicia. Los trabajos
+pendientes o en ejecución sin avance durante REPORT_JOBS_STALE_AFTER segundos
+se recuperan (recover_stale_report_jobs): los pendientes se vuelven a encolar
+y los que estaban en ejecución se marcan como fallidos. La recuperación corre
+con purge_report_jobs, al consultar el estado de un trabajo y al repetir una
+solicitud.
+
+Los archivos se guardan en REPORT_JOBS_DIR con nombre <hash>.<ext>, donde el
+hash se calcula sobre los parámetros normalizados y el alcance de estaciones
+del usuario. Una solicitud idéntica se responde con el archivo existente
+mientras no expire: los rangos que incluyen el día actual expiran a los
+REPORT_JOBS_LIVE_TTL segundos (siguen llegando datos) y los rangos cerrados a
+los REPORT_JOBS_CACHE_TTL segundos.
+
+Despliegue: los workers de Celery escriben en REPORT_JOBS_DIR y el backend lee
+desde ahí para la descarga y para reutilizar archivos, así que ambos deben
+compartir el mismo directorio (en docker-compose, el volumen media_files
+montado en /app/media en backend, celery y celery-beat). Si no lo comparten,
+toda descarga responde 410 y cada solicitud vuelve a generar el reporte.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import ReportJob, ReportJobStatus
+from .exports import EXCEL_CONTENT_TYPE
+from .reports import ReportError, build_report_excel, build_report_pdf
+from rioclaro_api.access_scope import resolve_access_scope
+
+logger = logging.getLogger(__name__)
+
+
+REPORT_JOBS_DIR = getattr(settings, 'REPORT_JOBS_DIR', os.path.join(settings.MEDIA_ROOT, 'report_jobs'))
+REPORT_JOBS_CACHE_TTL = getattr(settings, 'REPORT_JOBS_CACHE_TTL', 7 * 24 * 3600)
+REPORT_JOBS_LIVE_TTL = getattr(settings, 'REPORT_JOBS_LIVE_TTL', 300)
+REPORT_JOBS_MAX_WORKERS = getattr(settings, 'REPORT_JOBS_MAX_WORKERS', 2)
+
+# Segundos tras los cuales un trabajo pendiente o en ejecución se considera perdido
+REPORT_JOBS_STALE_AFTER = getattr(settings, 'REPORT_JOBS_STALE_AFTER', 1800)
+
+# Segundos sin reintentar el broker después de un fallo de publicación
+REPORT_JOBS_BROKER_RETRY = getattr(settings, 'REPORT_JOBS_BROKER_RETRY', 60)
+
+# Parámetros relevantes por tipo de reporte (el resto se descarta)
+REPORT_PARAMS = {
+    'daily-averages': ('date_from', 'date_to', 'station_id', 'measurement_type'),
+    'critical-events': ('date_from', 'date_to', 'station_id', 'level'),
+    'comparative': ('date_from', 'date_to', 'stations', 'measurement_type', 'aggregation'),
+}
+
+REPORT_DEFAULTS = {
+    'measurement_type': 'water_level',
+    'aggregation': 'daily',
+}
+
+FILE_FORMATS = {
+    'pdf': (build_report_pdf, 'pdf', 'application/pdf'),
+    'excel': (build_report_excel, 'xlsx', EXCEL_CONTENT_TYPE),
+}
+
+
+# ===================================================================
+# NORMALIZACIÓN Y HASH DE PARÁMETROS
+# ===================================================================
+
+def normalize_report_params(report_type, params):
+    """
+    Forma canónica de los parámetros: sólo los relevantes para el tipo de
+    reporte, como texto sin espacios, con valores por defecto explícitos y
+    la lista de estaciones ordenada y sin duplicados
+    """
+    normalized = {}
+    for name in REPORT_PARAMS[report_type]:
+        value = params.get(name, REPORT_DEFAULTS.get(name))
+        if isinstance(value, (list, tuple)):
+            value = ','.join(str(item) for item in value)
+        if value is None or str(value).strip() == '':
+            continue
+        value = str(value).strip()
+
+        if name == 'stations':
+            items = {item.strip() for item in value.split(',') if item.strip()}
+            value = ','.join(sorted(items, key=lambda item: (len(item), item)))
+
+        normalized[name] = value
+    return normalized
+
+
+def station_scope(user):
+    """Alcance de estaciones del usuario; define qué datos contiene el reporte"""
+    scope = resolve_access_scope(user)
+    if scope.is_admin:
+        return 'admin'
+    return 'stations:' + ','.join(str(station_id) for station_id in sorted(scope.station_ids))
+
+
+def params_hash(report_type, file_format, params, scope):
+    """Hash SHA-256 de la solicitud normalizada"""
+    payload = json.dumps(
+        {
+            'report_type': report_type,
+            'file_format': file_format,
+            'params': params,
+            'scope': scope,
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ===================================================================
+# ARCHIVOS GENERADOS
+# ===================================================================
+
+def artifact_path(job):
+    """Ruta en disco del archivo de un trabajo completado"""
+    return os.path.join(REPORT_JOBS_DIR, job.artifact_name)
+
+
+def artifact_filename(job):
+    """Nombre de descarga del archivo"""
+    extension = FILE_FORMATS[job.file_format][1]
+    return f'{job.report_type}_report_{timezone.localdate(job.finished_at)}.{extension}'
+
+
+def artifact_content_type(job):
+    return FILE_FORMATS[job.file_format][2]
+
+
+def _artifact_expiry(params, now):
+    """Vencimiento del archivo según si el rango incluye el día actual"""
+    try:
+        date_to = datetime.datetime.strptime(params.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        date_to = None
+
+    if date_to is None or date_to >= timezone.localdate(now):
+        return now + datetime.timedelta(seconds=REPORT_JOBS_LIVE_TTL)
+    return now + datetime.timedelta(seconds=REPORT_JOBS_CACHE_TTL)
+
+
+def find_cached_job(digest):
+    """Trabajo completado y vigente con el mismo hash cuyo archivo aún existe"""
+    jobs = ReportJob.objects.filter(
+        params_hash=digest,
+        status=ReportJobStatus.COMPLETED,
+        expires_at__gt=timezone.now(),
+    ).order_by('-finished_at')
+
+    for job in jobs[:5]:
+        if os.path.exists(artifact_path(job)):
+            return job
+    return None
+
+
+def purge_expired_artifacts():
+    """
+    Elimina los archivos cuyos trabajos expiraron todos. Retorna la cantidad
+    de archivos eliminados.
+    """
+    now = timezone.now()
+    live = set(
+        ReportJob.objects.filter(
+            status=ReportJobStatus.COMPLETED,
+            expires_at__gt=now,
+        ).values_list('artifact_name', flat=True)
+    )
+    expired = set(
+        ReportJob.objects.filter(
+            status=ReportJobStatus.COMPLETED,
+            expires_at__lte=now,
+        ).values_list('artifact_name', flat=True)
+    ) - live
+
+    removed = 0
+    for name in expired:
+        try:
+            os.remove(os.path.join(REPORT_JOBS_DIR, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+# ===================================================================
+# SOLICITUD Y DESPACHO
+# ===================================================================
+
+def submit_report_job(user, report_type, file_format, params):
+    """
+    Registra una solicitud de reporte y la encola si es necesario
+
+    - Archivo vigente con el mismo hash: se crea el trabajo ya completado
+    - Trabajo del mismo usuario con el mismo hash en curso: se retorna ése
+    - En otro caso: nuevo trabajo pendiente, encolado al confirmar la transacción
+    """
+    params = normalize_report_params(report_type, params)
+    digest = params_hash(report_type, file_format, params, station_scope(user))
+    job_fields = {
+        'user': user,
+        'report_type': report_type,
+        'file_format': file_format,
+        'params': params,
+        'params_hash': digest,
+    }
+
+    cached = find_cached_job(digest)
+    if cached:
+        now = timezone.now()
+        return ReportJob.objects.create(
+            status=ReportJobStatus.COMPLETED,
+            artifact_name=cached.artifact_name,
+            started_at=now,
+            finished_at=now,
+            expires_at=cached.expires_at,
+            **job_fields
+        )
+
+    same_request = ReportJob.objects.filter(user=user, params_hash=digest)
+    recover_stale_report_jobs(same_request)
+    in_progress = same_request.filter(
+        status__in=[ReportJobStatus.PENDING, ReportJobStatus.RUNNING],
+    ).first()
+    if in_progress:
+        return in_progress
+
+    job = ReportJob.objects.create(**job_fields)
+    job_id = str(job.id)
+    transaction.on_commit(lambda: dispatch_report_job(job_id))
+    return job
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_broker_retry_at = 0.0
+
+
+def dispatch_report_job(job_id):
+    """Envía el trabajo a Celery o, sin broker disponible, al pool local"""
+    global _broker_retry_at
+
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        run_report_job(job_id)
+        return
+
+    from .tasks import generate_report_task
+
+    if generate_report_task is not None and time.monotonic() >= _broker_retry_at:
+        try:
+            generate_report_task.apply_async(args=[job_id], retry=False)
+            return
+        except Exception as e:
+            _broker_retry_at = time.monotonic() + REPORT_JOBS_BROKER_RETRY
+            logger.warning(f"Broker de Celery no disponible, se usa el pool local: {e}")
+
+    _get_executor().submit(_run_in_thread, job_id)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=REPORT_JOBS_MAX_WORKERS,
+                thread_name_prefix='report-jobs',
+            )
+        return _executor
+
+
+def _run_in_thread(job_id):
+    try:
+        run_report_job(job_id)
+    finally:
+        # Cada hilo del pool abre sus propias conexiones
+        connections.close_all()
+
+
+# ===================================================================
+# EJECUCIÓN
+# ===================================================================
+
+def run_report_job(job_id):
+    """Genera el archivo de un trabajo pendiente (worker de Celery o pool local)"""
+    claimed = ReportJob.objects.filter(
+        pk=job_id,
+        status=ReportJobStatus.PENDING,
+    ).update(status=ReportJobStatus.RUNNING, started_at=timezone.now())
+    if not claimed:
+        # Inexistente o ya tomado por otro worker
+        return
+
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+
+    # Otro trabajo pudo generar el mismo archivo mientras éste esperaba en cola
+    cached = find_cached_job(job.params_hash)
+    if cached:
+        _complete(job, cached.artifact_name, cached.expires_at)
+        return
+
+    try:
+        artifact_name = _generate_artifact(job)
+    except ReportError as e:
+        _fail(job, e.message)
+        return
+    except Exception as e:
+        logger.exception(f"Error generando el reporte {job.id}: {e}")
+        _fail(job, 'Error interno al generar el reporte')
+        return
+
+    _complete(job, artifact_name, _artifact_expiry(job.params, timezone.now()))
+    logger.info(f"Reporte {job.report_type} ({job.file_format}) generado: {job.id}")
+
+
+def _generate_artifact(job):
+    """
+    Genera el archivo con el alcance de estaciones del usuario que lo
+    solicitó y lo escribe en disco
+    """
+    build, extension, _ = FILE_FORMATS[job.file_format]
+    document = build(job.user, {'report_type': job.report_type, **job.params})
+
+    os.makedirs(REPORT_JOBS_DIR, exist_ok=True)
+    artifact_name = f'{job.params_hash}.{extension}'
+    final_path = os.path.join(REPORT_JOBS_DIR, artifact_name)
+    temp_path = f'{final_path}.{uuid.uuid4().hex}.tmp'
+
+    # Escritura atómica: el archivo final nunca queda a medio escribir
+    try:
+        with open(temp_path, 'wb') as output:
+            shutil.copyfileobj(document, output)
+        os.replace(temp_path, final_path)
+    finally:
+        document.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return artifact_name
+
+
+def _complete(job, artifact_name, expires_at):
+    job.status = ReportJobStatus.COMPLETED
+    job.artifact_name = artifact_name
+    job.expires_at = expires_at
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'artifact_name', 'expires_at', 'finished_at'])
+
+
+def _fail(job, message):
+    job.status = ReportJobStatus.FAILED
+    job.error_message = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at'])
+
+
+# ===================================================================
+# RECUPERACIÓN
+# ===================================================================
+
+def recover_stale_report_jobs(jobs=None):
+    """
+    Recupera los trabajos perdidos (por ejemplo, en el pool local de un
+    proceso que se reinició) entre jobs, o entre todos si no se indica
+
+    - Pendientes creados hace más de REPORT_JOBS_STALE_AFTER segundos: se
+      vuelven a encolar; run_report_job ignora los que otro worker ya tomó
+    - En ejecución desde hace más de REPORT_JOBS_STALE_AFTER segundos: se
+      marcan como fallidos
+
+    Retorna (encolados, fallidos)
+    """
+    if jobs is None:
+        jobs = ReportJob.objects.all()
+    cutoff = timezone.now() - datetime.timedelta(seconds=REPORT_JOBS_STALE_AFTER)
+
+    failed = jobs.filter(
+        status=ReportJobStatus.RUNNING,
+        started_at__lt=cutoff,
+    ).update(
+        status=ReportJobStatus.FAILED,
+        error_message='El reporte se interrumpió antes de completarse',
+        finished_at=timezone.now(),
+    )
+
+    pending = [
+        str(job_id)
+        for job_id in jobs.filter(
+            status=ReportJobStatus.PENDING,
+            created_at__lt=cutoff,
+        ).values_list('id', flat=True)
+    ]
+    for job_id in pending:
+        transaction.on_commit(lambda job_id=job_id: dispatch_report_job(job_id))
+
+    if failed or pending:
+        logger.warning(
+            f"Trabajos de reportes recuperados: {len(pending)} encolados, {failed} fallidos"
+        )
+    return len(pending), failed
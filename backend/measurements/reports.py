@@ -0,0 +1,697 @@
+"""
+Construcción de reportes del Módulo 3 (RF3.1, RF3.2, RF3.3)
+
+Los datos de cada reporte y los documentos PDF/Excel se construyen a partir
+del alcance de estaciones del usuario y de un diccionario de parámetros
+(request.GET o los parámetros guardados de un ReportJob), sin depender de la
+petición HTTP. Las vistas JSON, las exportaciones síncronas y los trabajos
+asíncronos (report_jobs) usan estas mismas funciones:
+
+    report_info, results = daily_average_report_data(scope, params)
+    document = build_report_pdf(user, {'report_type': 'comparative', ...})
+
+Los parámetros inválidos o sin permisos se informan con ReportError, que
+lleva el mensaje y el código HTTP que la vista debe responder.
+"""
+
+import datetime
+import io
+
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from rioclaro_api.access_scope import resolve_access_scope
+from rioclaro_api.tracing import span
+from .exports import build_excel_report, round_or_none, EXPORT_CHUNK_SIZE
+from .models import Alert, Measurement, MeasurementType
+from .queries import iterate_keyset
+from .rollups import report_rows, day_start
+from .statistics import (
+    DEFAULT_PERCENTILES,
+    combine_partials,
+    comparison_matrix,
+    cross_station_comparison,
+    encode,
+    fetch_columns,
+    group_statistics,
+    to_python
+)
+
+
+REPORT_TITLES = {
+    'daily-averages': 'Reporte de Promedios Diarios',
+    'critical-events': 'Reporte de Eventos Críticos',
+    'comparative': 'Reporte Comparativo entre Estaciones'
+}
+
+
+class ReportError(Exception):
+    """Parámetros inválidos o sin permisos: mensaje y código HTTP de la respuesta"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# ===================================================================
+# PARÁMETROS
+# ===================================================================
+
+def parse_report_dates(params):
+    """Valida date_from y date_to (YYYY-MM-DD); retorna (date_from, date_to)"""
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+
+    if not date_from or not date_to:
+        raise ReportError('Los parámetros date_from y date_to son requeridos (formato: YYYY-MM-DD)')
+
+    try:
+        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
+        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
+    except ValueError:
+        raise ReportError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+    if date_from_obj > date_to_obj:
+        raise ReportError('La fecha_desde no puede ser mayor que fecha_hasta')
+
+    return date_from_obj, date_to_obj
+
+
+def report_stations_filter(scope, params):
+    """
+    Filtro de estaciones según el alcance del usuario y el parámetro
+    opcional station_id; retorna (filtro Q, station_id)
+    """
+    stations_filter = scope.q()
+
+    station_id = params.get('station_id')
+    if station_id:
+        try:
+            station_id = int(station_id)
+        except ValueError:
+            raise ReportError('station_id debe ser un número entero')
+        stations_filter &= Q(station__id=station_id)
+
+    return stations_filter, station_id
+
+
+def parse_percentiles(params):
+    """
+    Parámetro opcional percentiles: "true" para los percentiles por defecto
+    o una lista separada por comas (0-100). Retorna una tupla o None
+    """
+    value = (params.get('percentiles') or '').strip().lower()
+    if value in ('', 'false', '0'):
+        return None
+    if value == 'true':
+        return DEFAULT_PERCENTILES
+
+    try:
+        percentiles = tuple(sorted({float(item) for item in value.split(',') if item.strip()}))
+    except ValueError:
+        percentiles = ()
+
+    if not percentiles or any(q < 0 or q > 100 for q in percentiles):
+        raise ReportError('percentiles debe ser "true" o una lista de valores entre 0 y 100 (ej: 5,50,95)')
+    return percentiles
+
+
+def critical_events_queryset(stations_filter, date_from, date_to, level_filter=None):
+    """Alertas generadas en el período, ordenadas de la más reciente a la más antigua"""
+    alerts_queryset = Alert.objects.filter(
+        stations_filter,
+        triggered_at__date__gte=date_from,
+        triggered_at__date__lte=date_to
+    ).select_related(
+        'station', 'measurement', 'threshold'
+    )
+
+    if level_filter and level_filter in ['warning', 'critical', 'emergency']:
+        alerts_queryset = alerts_queryset.filter(level=level_filter)
+
+    return alerts_queryset.order_by('-triggered_at')
+
+
+def _measurement_type_display(measurement_type):
+    return dict(MeasurementType.choices).get(measurement_type, measurement_type)
+
+
+# ===================================================================
+# DATOS DE LOS REPORTES
+# ===================================================================
+
+def daily_average_report_data(scope, params):
+    """RF3.1: filas (día, estación) del período; retorna (report_info, filas)"""
+    measurement_type = params.get('measurement_type') or 'water_level'
+    date_from_obj, date_to_obj = parse_report_dates(params)
+    stations_filter, station_id = report_stations_filter(scope, params)
+
+    # Días cerrados desde los agregados diarios, el día en curso desde las
+    # mediciones crudas
+    daily_averages = report_rows(
+        stations_filter, measurement_type, date_from_obj, date_to_obj, aggregation='daily'
+    )
+
+    report_data = [
+        {
+            'date': daily_avg['period'],
+            'station_id': daily_avg['station__id'],
+            'station_name': daily_avg['station__name'],
+            'station_code': daily_avg['station__code'],
+            'measurement_type': measurement_type,
+            'measurement_type_display': _measurement_type_display(measurement_type),
+            'avg_value': daily_avg['avg_value'],
+            'min_value': daily_avg['min_value'],
+            'max_value': daily_avg['max_value'],
+            'count': daily_avg['count_measurements'],
+            'unit': daily_avg['unit'],
+            'first_measurement_time': daily_avg['first_measurement_time'],
+            'last_measurement_time': daily_avg['last_measurement_time']
+        }
+        for daily_avg in daily_averages
+    ]
+
+    report_info = {
+        'type': 'daily_averages',
+        'date_from': params.get('date_from'),
+        'date_to': params.get('date_to'),
+        'measurement_type': measurement_type,
+        'station_filter': station_id,
+        'total_records': len(report_data)
+    }
+    return report_info, report_data
+
+
+def critical_events_report_data(scope, params):
+    """RF3.2: alertas del período; retorna (report_info, eventos)"""
+    date_from_obj, date_to_obj = parse_report_dates(params)
+    stations_filter, station_id = report_stations_filter(scope, params)
+
+    level_filter = params.get('level')
+    alerts = critical_events_queryset(stations_filter, date_from_obj, date_to_obj, level_filter)
+
+    report_data = []
+    for alert in alerts:
+        measurement = alert.measurement
+        threshold = alert.threshold
+        measurement_type = measurement.measurement_type if measurement else threshold.measurement_type
+
+        report_data.append({
+            'event_id': alert.id,
+            'timestamp': alert.triggered_at,
+            'station_id': alert.station.id,
+            'station_name': alert.station.name,
+            'station_code': alert.station.code,
+            'measurement_type': measurement_type,
+            'measurement_type_display': _measurement_type_display(measurement_type),
+            'measured_value': str(measurement.value) if measurement else None,
+            'unit': measurement.unit if measurement else threshold.unit,
+            'threshold_level': alert.level,
+            'threshold_level_display': alert.get_level_display(),
+            'threshold_exceeded': {
+                'warning_min': str(threshold.warning_min) if threshold.warning_min else None,
+                'warning_max': str(threshold.warning_max) if threshold.warning_max else None,
+                'critical_min': str(threshold.critical_min) if threshold.critical_min else None,
+                'critical_max': str(threshold.critical_max) if threshold.critical_max else None,
+            },
+            'alert_status': alert.status,
+            'alert_status_display': alert.get_status_display(),
+            'alert_title': alert.title,
+            'alert_message': alert.message,
+            'duration_minutes': alert.duration.total_seconds() / 60 if alert.status in ['resolved', 'dismissed'] else None
+        })
+
+    report_info = {
+        'type': 'critical_events',
+        'date_from': params.get('date_from'),
+        'date_to': params.get('date_to'),
+        'station_filter': station_id,
+        'level_filter': level_filter,
+        'total_events': len(report_data)
+    }
+    return report_info, report_data
+
+
+def comparative_report_data(scope, params):
+    """
+    RF3.3: estadísticas por estación y comparación por período; retorna
+    (report_info, datos para ComparativeReportSerializer)
+    """
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    stations_param = params.get('stations')
+    measurement_type = params.get('measurement_type') or 'water_level'
+    aggregation = params.get('aggregation') or 'daily'
+
+    if not date_from or not date_to or not stations_param:
+        raise ReportError('Los parámetros date_from, date_to y stations son requeridos')
+
+    if aggregation not in ['daily', 'hourly']:
+        raise ReportError('aggregation debe ser "daily" o "hourly"')
+
+    percentiles = parse_percentiles(params)
+
+    try:
+        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
+        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
+        station_ids = [int(id.strip()) for id in stations_param.split(',') if id.strip()]
+    except ValueError:
+        raise ReportError('Formato inválido en parámetros de fecha o IDs de estaciones')
+
+    if date_from_obj > date_to_obj:
+        raise ReportError('La fecha_desde no puede ser mayor que fecha_hasta')
+
+    if len(station_ids) < 2:
+        raise ReportError('Se requieren al menos 2 estaciones para el reporte comparativo')
+
+    # Estaciones solicitadas dentro del alcance del usuario
+    accessible_stations = list(scope.stations().filter(id__in=station_ids, is_active=True))
+    accessible_station_ids = [station.id for station in accessible_stations]
+
+    if not accessible_station_ids:
+        raise ReportError('No tiene permisos para acceder a las estaciones solicitadas', status_code=403)
+
+    # Períodos cerrados desde los agregados horarios/diarios, el período en
+    # curso desde mediciones crudas
+    with span('report.rows'):
+        comparative_data = report_rows(
+            Q(station__id__in=accessible_station_ids),
+            measurement_type,
+            date_from_obj,
+            date_to_obj,
+            aggregation=aggregation
+        )
+
+    raw_queryset = Measurement.objects.filter(
+        station__id__in=accessible_station_ids,
+        measurement_type=measurement_type,
+        quality_flag='good',
+        timestamp__gte=day_start(date_from_obj),
+        timestamp__lt=day_start(date_to_obj + datetime.timedelta(days=1))
+    )
+    with span('report.statistics'):
+        stations_data, global_stats, comparison = comparative_statistics(
+            comparative_data, percentiles, raw_queryset
+        )
+
+    report_data = {
+        'measurement_type': measurement_type,
+        'measurement_type_display': _measurement_type_display(measurement_type),
+        'period_start': f"{date_from_obj}T00:00:00Z",
+        'period_end': f"{date_to_obj}T23:59:59Z",
+        'total_stations': len(accessible_stations),
+        'stations_data': stations_data,
+        'global_statistics': global_stats,
+        'comparison': comparison
+    }
+
+    report_info = {
+        'type': 'comparative',
+        'date_from': date_from,
+        'date_to': date_to,
+        'measurement_type': measurement_type,
+        'aggregation': aggregation,
+        'stations_included': [
+            {'id': s.id, 'name': s.name, 'code': s.code, 'location': s.location}
+            for s in accessible_stations
+        ],
+        'total_records': len(comparative_data)
+    }
+    return report_info, report_data
+
+
+def _period_datetime(period):
+    """Inicio del período como datetime (los períodos diarios son fechas locales)"""
+    if isinstance(period, datetime.datetime):
+        return period
+    return day_start(period)
+
+
+def comparative_statistics(rows, percentiles=None, raw_queryset=None):
+    """
+    Estadísticas del reporte comparativo, calculadas en forma vectorizada
+    sobre las filas (período, estación) de report_rows
+
+    - Por estación: conteo, promedio ponderado, mínimo, máximo, desviación
+      estándar y desviación media respecto de las demás estaciones
+    - Por período: comparación entre estaciones (media, mínimo, máximo,
+      desviación estándar y rango de los promedios)
+    - Con percentiles: se leen las mediciones crudas de raw_queryset en
+      forma columnar y se calculan los percentiles de cada estación
+
+    Retorna (stations_data, global_statistics, comparison)
+    """
+    global_stats = {
+        'total_measurements': 0,
+        'avg_value': 0,
+        'min_value': None,
+        'max_value': None
+    }
+    if not rows:
+        return [], global_stats, []
+
+    columns = {
+        field: np.array([row[field] for row in rows], dtype=dtype)
+        for field, dtype in (
+            ('station__id', np.int64),
+            ('count_measurements', np.float64),
+            ('avg_value', np.float64),
+            ('min_value', np.float64),
+            ('max_value', np.float64),
+        )
+    }
+    sum_squares = np.array([row['sum_squares'] or 0.0 for row in rows], dtype=np.float64)
+    station_ids, station_index = encode(columns['station__id'])
+    periods, period_index = encode(np.array([row['period'] for row in rows], dtype=object))
+
+    station_stats = combine_partials(
+        station_index,
+        columns['count_measurements'],
+        columns['avg_value'] * columns['count_measurements'],
+        sum_squares,
+        columns['min_value'],
+        columns['max_value'],
+        group_count=len(station_ids)
+    )
+    matrix = comparison_matrix(
+        station_index, period_index, columns['avg_value'], (len(station_ids), len(periods))
+    )
+    comparison = cross_station_comparison(matrix)
+
+    distribution = None
+    if percentiles:
+        raw = fetch_columns(raw_queryset, ('station_id', 'value'), (np.int64, np.float64), EXPORT_CHUNK_SIZE)
+        # Sólo las estaciones con filas agregadas: searchsorted ubicaría las
+        # demás en la posición de otra estación o fuera del arreglo
+        known = np.isin(raw['station_id'], station_ids)
+        raw_index = np.searchsorted(station_ids, raw['station_id'][known])
+        distribution = group_statistics(
+            raw_index, raw['value'][known], group_count=len(station_ids), percentiles=percentiles
+        )
+
+    # Filas de cada estación, en orden de período
+    order = np.lexsort((period_index, station_index))
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(station_index, minlength=len(station_ids)))))
+
+    stations_data = []
+    for i in range(len(station_ids)):
+        station_rows = [rows[k] for k in order[bounds[i]:bounds[i + 1]]]
+        first = station_rows[0]
+        statistics = {
+            'count': int(station_stats['count'][i]),
+            'avg': to_python(station_stats['mean'][i]) or 0,
+            'min': to_python(station_stats['min'][i]),
+            'max': to_python(station_stats['max'][i]),
+            'std': to_python(station_stats['std'][i]),
+            'mean_deviation': to_python(comparison['station_mean_deviation'][i]),
+        }
+        if distribution is not None:
+            statistics['percentiles'] = {
+                f'p{q:g}': to_python(value)
+                for q, value in zip(percentiles, distribution['percentiles'][i])
+            }
+
+        stations_data.append({
+            'station_id': first['station__id'],
+            'station_name': first['station__name'],
+            'station_code': first['station__code'],
+            'unit': first['unit'],
+            'data_points': [
+                {
+                    'timestamp': _period_datetime(row['period']),
+                    'value': row['avg_value'],
+                    'quality_flag': 'good'
+                }
+                for row in station_rows
+            ],
+            'statistics': statistics
+        })
+
+    global_stats['total_measurements'] = int(columns['count_measurements'].sum())
+    global_stats['avg_value'] = to_python(np.nanmean(station_stats['mean'])) or 0
+    global_stats['min_value'] = to_python(np.nanmin(station_stats['min']))
+    global_stats['max_value'] = to_python(np.nanmax(station_stats['max']))
+
+    comparison_data = [
+        {
+            'period': _period_datetime(period).isoformat(),
+            'stations_reporting': int(comparison['stations_reporting'][j]),
+            'mean': to_python(comparison['mean'][j]),
+            'min': to_python(comparison['min'][j]),
+            'max': to_python(comparison['max'][j]),
+            'std': to_python(comparison['std'][j]),
+            'spread': to_python(comparison['spread'][j]),
+        }
+        for j, period in enumerate(periods)
+    ]
+
+    return stations_data, global_stats, comparison_data
+
+
+# ===================================================================
+# DOCUMENTOS PDF / EXCEL
+# ===================================================================
+
+def _report_type(params):
+    report_type = params.get('report_type')
+    if not report_type:
+        raise ReportError('El parámetro report_type es requerido')
+    if report_type not in REPORT_TITLES:
+        raise ReportError('Tipo de reporte no válido. Use: daily-averages, critical-events, comparative')
+    return report_type
+
+
+def _number(value):
+    """Valor numérico con dos decimales para el PDF"""
+    rounded = round_or_none(value)
+    return 'N/A' if rounded is None else f"{rounded:.2f}"
+
+
+def build_report_pdf(user, params):
+    """
+    Genera el PDF de un reporte (params['report_type'] y los parámetros del
+    reporte) con el alcance de estaciones de user. Retorna un BytesIO
+    posicionado al inicio.
+    """
+    report_type = _report_type(params)
+    scope = resolve_access_scope(user)
+
+    if report_type == 'daily-averages':
+        report_info, report_data = daily_average_report_data(scope, params)
+    elif report_type == 'critical-events':
+        report_info, report_data = critical_events_report_data(scope, params)
+    else:
+        report_info, report_data = comparative_report_data(scope, params)
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Título del reporte
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1  # Center
+    )
+    elements.append(Paragraph(REPORT_TITLES[report_type], title_style))
+
+    # Información del reporte
+    total_records = report_info.get('total_records', report_info.get('total_events', 0))
+    info_text = f"""
+    <b>Período:</b> {report_info.get('date_from', 'N/A')} - {report_info.get('date_to', 'N/A')}<br/>
+    <b>Tipo de Medición:</b> {report_info.get('measurement_type', 'N/A')}<br/>
+    <b>Total de Registros:</b> {total_records}<br/>
+    """
+
+    if report_type == 'critical-events' and report_info.get('level_filter'):
+        info_text += f"<b>Nivel de Alerta:</b> {report_info['level_filter']}<br/>"
+
+    if report_info.get('station_filter'):
+        info_text += f"<b>Estación:</b> {report_info['station_filter']}<br/>"
+
+    elements.append(Paragraph(info_text, styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    # Tabla según el tipo de reporte
+    if report_type == 'daily-averages':
+        table_data = [['Fecha', 'Estación', 'Código', 'Promedio', 'Mínimo', 'Máximo', 'Conteo', 'Unidad']]
+        for item in report_data:
+            table_data.append([
+                str(item['date']),
+                item['station_name'],
+                item['station_code'],
+                _number(item['avg_value']),
+                _number(item['min_value']),
+                _number(item['max_value']),
+                str(item['count']),
+                item['unit']
+            ])
+
+    elif report_type == 'critical-events':
+        table_data = [['Fecha/Hora', 'Estación', 'Tipo', 'Valor', 'Unidad', 'Nivel', 'Estado', 'Mensaje']]
+        for item in report_data:
+            message = item['alert_message']
+            table_data.append([
+                timezone.localtime(item['timestamp']).strftime('%Y-%m-%d %H:%M'),
+                item['station_name'],
+                item['measurement_type_display'],
+                item['measured_value'] or 'N/A',
+                item['unit'],
+                item['threshold_level_display'],
+                item['alert_status_display'],
+                message[:50] + '...' if len(message) > 50 else message
+            ])
+
+    else:  # comparative: estadísticas por estación
+        table_data = [['Estación', 'Código', 'Conteo Total', 'Promedio', 'Mínimo', 'Máximo', 'Unidad']]
+        for station in report_data['stations_data']:
+            stats = station['statistics']
+            table_data.append([
+                station['station_name'],
+                station['station_code'],
+                str(stats['count']),
+                _number(stats['avg']),
+                _number(stats['min']),
+                _number(stats['max']),
+                station['unit']
+            ])
+
+    table = Table(table_data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ]))
+    elements.append(table)
+
+    with span('report.pdf_build'):
+        doc.build(elements)
+
+    buffer.seek(0)
+    return buffer
+
+
+def build_report_excel(user, params):
+    """
+    Genera el Excel de un reporte con el alcance de estaciones de user.
+
+    El libro se escribe en modo streaming y las filas de promedios diarios y
+    eventos críticos se leen por bloques desde la base de datos. Retorna un
+    archivo temporal posicionado al inicio.
+    """
+    report_type = _report_type(params)
+    scope = resolve_access_scope(user)
+    measurement_type = params.get('measurement_type') or 'water_level'
+    station_id = None
+    level_filter = None
+
+    if report_type == 'comparative':
+        # Reporte acotado por número de estaciones
+        report_info, report_data = comparative_report_data(scope, params)
+        total_records = report_info['total_records']
+
+        headers = ['Estación', 'Código', 'Conteo Total', 'Promedio', 'Mínimo', 'Máximo', 'Unidad']
+        rows = (
+            [
+                station['station_name'],
+                station['station_code'],
+                station['statistics']['count'],
+                round_or_none(station['statistics']['avg']),
+                round_or_none(station['statistics']['min']),
+                round_or_none(station['statistics']['max']),
+                station['unit'],
+            ]
+            for station in report_data['stations_data']
+        )
+
+    else:
+        date_from_obj, date_to_obj = parse_report_dates(params)
+        stations_filter, station_id = report_stations_filter(scope, params)
+
+        if report_type == 'daily-averages':
+            # Filas por (día, estación) desde los agregados diarios
+            daily_averages = report_rows(
+                stations_filter, measurement_type, date_from_obj, date_to_obj, aggregation='daily'
+            )
+            total_records = len(daily_averages)
+
+            headers = ['Fecha', 'Estación', 'Código', 'Promedio', 'Mínimo', 'Máximo', 'Conteo', 'Unidad']
+            rows = (
+                [
+                    str(item['period']),
+                    item['station__name'],
+                    item['station__code'],
+                    round_or_none(item['avg_value']),
+                    round_or_none(item['min_value']),
+                    round_or_none(item['max_value']),
+                    item['count_measurements'],
+                    item['unit'],
+                ]
+                for item in daily_averages
+            )
+
+        else:  # critical-events
+            level_filter = params.get('level')
+            alerts = critical_events_queryset(stations_filter, date_from_obj, date_to_obj, level_filter)
+            total_records = alerts.count()
+
+            headers = ['Fecha/Hora', 'Estación', 'Tipo', 'Valor', 'Unidad', 'Nivel', 'Estado', 'Mensaje']
+            rows = (
+                [
+                    timezone.localtime(alert.triggered_at).strftime('%Y-%m-%d %H:%M'),
+                    alert.station.name,
+                    (alert.measurement or alert.threshold).get_measurement_type_display(),
+                    str(alert.measurement.value) if alert.measurement else 'N/A',
+                    alert.measurement.unit if alert.measurement else alert.threshold.unit,
+                    alert.get_level_display(),
+                    alert.get_status_display(),
+                    alert.message,
+                ]
+                # Bloques keyset: las alertas no se cargan todas en memoria
+                for alert in iterate_keyset(
+                    alerts, ordering_field='triggered_at', chunk_size=EXPORT_CHUNK_SIZE, descending=True
+                )
+            )
+
+        report_info = {
+            'date_from': params.get('date_from'),
+            'date_to': params.get('date_to'),
+            'measurement_type': measurement_type if report_type == 'daily-averages' else None,
+        }
+
+    info_lines = [
+        f'Período: {report_info.get("date_from", "N/A")} - {report_info.get("date_to", "N/A")}',
+        f'Tipo de Medición: {report_info.get("measurement_type") or "N/A"}',
+        f'Total de Registros: {total_records}',
+    ]
+    if level_filter:
+        info_lines.append(f'Nivel de Alerta: {level_filter}')
+    if station_id:
+        info_lines.append(f'Estación: {station_id}')
+
+    return build_excel_report(
+        sheet_title=report_type.replace('-', '_').title(),
+        title=REPORT_TITLES[report_type],
+        info_lines=info_lines,
+        headers=headers,
+        rows=rows
+    )
+
+
+def report_filename(report_type, extension):
+    return f'{report_type}_report_{datetime.date.today()}.{extension}'
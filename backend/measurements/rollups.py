@@ -0,0 +1,363 @@
+"""
+Agregados horarios y diarios de mediciones (RF3.1, RF3.3)
+
+Los reportes leen los agregados de los períodos cerrados y sólo consultan
+mediciones crudas para el período en curso, por lo que su costo depende del
+número de períodos y no del número de lecturas.
+
+Mantenimiento:
+- Incremental: la ingesta por lotes llama a record_rollups() dentro de su
+  transacción; las mediciones guardadas de a una (API, admin) se suman desde
+  la señal post_save
+- Ediciones y eliminaciones de mediciones (incluido el cambio de
+  quality_flag) recalculan sus períodos con refresh_rollups() desde las
+  señales post_save / post_delete
+- Carga inicial: la migración 0007 reconstruye todo el historial
+- Recuperación: el comando rebuild_measurement_rollups recalcula un rango
+  desde las mediciones crudas. Es obligatorio tras cambios que no emiten
+  señales (QuerySet.update(), SQL directo, cargas por otras vías)
+
+Sólo se agregan mediciones con quality_flag='good', igual que en los reportes.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import Measurement, MeasurementHourlyRollup, MeasurementDailyRollup
+
+
+GOOD_QUALITY = 'good'
+
+ROLLUP_FIELDS = [
+    'unit', 'count', 'sum_value', 'sum_squares', 'min_value', 'max_value',
+    'first_timestamp', 'last_timestamp', 'updated_at',
+]
+
+
+def hour_bucket(timestamp):
+    """Inicio de la hora (UTC) que contiene el timestamp"""
+    return timestamp.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(timestamp):
+    """Fecha local que contiene el timestamp"""
+    return timezone.localtime(timestamp).date()
+
+
+def day_start(date):
+    """Inicio (aware) de una fecha local"""
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+# ===================================================================
+# MANTENIMIENTO INCREMENTAL
+# ===================================================================
+
+def record_rollups(measurements):
+    """Suma un lote de mediciones a los agregados horarios y diarios"""
+    measurements = [m for m in measurements if m.quality_flag == GOOD_QUALITY]
+    if not measurements:
+        return
+
+    _merge(MeasurementHourlyRollup, _aggregate(measurements, hour_bucket))
+    _merge(MeasurementDailyRollup, _aggregate(measurements, day_bucket))
+
+
+def _aggregate(measurements, bucket_for):
+    """Agrega el lote en memoria por (estación, tipo, período)"""
+    partials = {}
+    for measurement in measurements:
+        key = (measurement.station_id, measurement.measurement_type, bucket_for(measurement.timestamp))
+        value = Decimal(measurement.value)
+        partial = {
+            'unit': measurement.unit,
+            'count': 1,
+            'sum_value': value,
+            'sum_squares': float(value) ** 2,
+            'min_value': value,
+            'max_value': value,
+            'first_timestamp': measurement.timestamp,
+            'last_timestamp': measurement.timestamp,
+        }
+        if key in partials:
+            _combine(partials[key], partial)
+        else:
+            partials[key] = partial
+    return partials
+
+
+def _combine(target, partial):
+    """Combina un agregado parcial sobre otro"""
+    target['unit'] = partial['unit']
+    target['count'] += partial['count']
+    target['sum_value'] += partial['sum_value']
+    target['sum_squares'] += partial['sum_squares']
+    target['min_value'] = min(target['min_value'], partial['min_value'])
+    target['max_value'] = max(target['max_value'], partial['max_value'])
+    target['first_timestamp'] = min(target['first_timestamp'], partial['first_timestamp'])
+    target['last_timestamp'] = max(target['last_timestamp'], partial['last_timestamp'])
+
+
+def _merge(model, partials):
+    """
+    Aplica los agregados parciales a la tabla: bloquea las filas existentes,
+    actualiza en bloque y crea las que faltan
+    """
+    try:
+        with transaction.atomic():
+            _merge_once(model, partials)
+    except IntegrityError:
+        # Una ingesta concurrente creó alguna fila; reintentar sobre las existentes
+        with transaction.atomic():
+            _merge_once(model, partials)
+
+
+def _merge_once(model, partials):
+    existing = {
+        (row.station_id, row.measurement_type, row.bucket): row
+        for row in model.objects.select_for_update().filter(
+            station_id__in={key[0] for key in partials},
+            measurement_type__in={key[1] for key in partials},
+            bucket__in={key[2] for key in partials},
+        )
+    }
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for key, partial in partials.items():
+        row = existing.get(key)
+        if row is None:
+            station_id, measurement_type, bucket = key
+            to_create.append(model(
+                station_id=station_id,
+                measurement_type=measurement_type,
+                bucket=bucket,
+                updated_at=now,
+                **partial
+            ))
+        else:
+            current = {field: getattr(row, field) for field in ROLLUP_FIELDS if field != 'updated_at'}
+            _combine(current, partial)
+            for field, value in current.items():
+                setattr(row, field, value)
+            row.updated_at = now
+            to_update.append(row)
+
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, ROLLUP_FIELDS)
+
+
+def refresh_rollups(keys):
+    """
+    Recalcula desde las mediciones crudas los períodos horario y diario de
+    cada clave (estación, tipo, timestamp). Se usa cuando una medición se
+    edita o se elimina, donde no basta con sumar.
+    """
+    periods = (
+        (MeasurementHourlyRollup, hour_bucket, lambda bucket: (bucket, bucket + datetime.timedelta(hours=1))),
+        (MeasurementDailyRollup, day_bucket, lambda bucket: (day_start(bucket), day_start(bucket + datetime.timedelta(days=1)))),
+    )
+    now = timezone.now()
+    for model, bucket_for, bucket_bounds in periods:
+        buckets = {
+            (station_id, measurement_type, bucket_for(timestamp))
+            for station_id, measurement_type, timestamp in keys
+        }
+        for station_id, measurement_type, bucket in buckets:
+            start, end = bucket_bounds(bucket)
+            totals = Measurement.objects.filter(
+                station_id=station_id,
+                measurement_type=measurement_type,
+                quality_flag=GOOD_QUALITY,
+                timestamp__gte=start,
+                timestamp__lt=end,
+            ).aggregate(
+                unit=Max('unit'),
+                count=Count('id'),
+                sum_value=Sum('value'),
+                sum_squares=Sum(F('value') * F('value'), output_field=FloatField()),
+                min_value=Min('value'),
+                max_value=Max('value'),
+                first_timestamp=Min('timestamp'),
+                last_timestamp=Max('timestamp'),
+            )
+            key = {'station_id': station_id, 'measurement_type': measurement_type, 'bucket': bucket}
+            if totals['count']:
+                model.objects.update_or_create(**key, defaults={**totals, 'updated_at': now})
+            else:
+                model.objects.filter(**key).delete()
+
+
+# ===================================================================
+# RECONSTRUCCIÓN DESDE MEDICIONES CRUDAS
+# ===================================================================
+
+def rebuild_rollups(date_from=None, date_to=None, apps=global_apps):
+    """
+    Recalcula los agregados de un rango de fechas locales (ambas inclusive)
+    desde las mediciones crudas. Sin fechas recalcula todo el historial.
+
+    Recibe el registro de apps para poder usarse desde migraciones con los
+    modelos históricos. Retorna la cantidad de filas (horarias, diarias)
+    generadas.
+    """
+    Measurement = apps.get_model('measurements', 'Measurement')
+    MeasurementHourlyRollup = apps.get_model('measurements', 'MeasurementHourlyRollup')
+    MeasurementDailyRollup = apps.get_model('measurements', 'MeasurementDailyRollup')
+
+    measurements = Measurement.objects.filter(quality_flag=GOOD_QUALITY)
+    hourly = MeasurementHourlyRollup.objects.all()
+    daily = MeasurementDailyRollup.objects.all()
+
+    if date_from:
+        measurements = measurements.filter(timestamp__gte=day_start(date_from))
+        hourly = hourly.filter(bucket__gte=day_start(date_from))
+        daily = daily.filter(bucket__gte=date_from)
+    if date_to:
+        end = day_start(date_to + datetime.timedelta(days=1))
+        measurements = measurements.filter(timestamp__lt=end)
+        hourly = hourly.filter(bucket__lt=end)
+        daily = daily.filter(bucket__lte=date_to)
+
+    now = timezone.now()
+    hourly_rows = [
+        MeasurementHourlyRollup(updated_at=now, **row)
+        for row in _aggregate_queryset(measurements, TruncHour('timestamp', tzinfo=datetime.timezone.utc))
+    ]
+    daily_rows = [
+        MeasurementDailyRollup(updated_at=now, **row)
+        for row in _aggregate_queryset(measurements, TruncDate('timestamp', tzinfo=timezone.get_current_timezone()))
+    ]
+
+    with transaction.atomic():
+        hourly.delete()
+        daily.delete()
+        MeasurementHourlyRollup.objects.bulk_create(hourly_rows, batch_size=1000)
+        MeasurementDailyRollup.objects.bulk_create(daily_rows, batch_size=1000)
+
+    return len(hourly_rows), len(daily_rows)
+
+
+def _aggregate_queryset(queryset, bucket_expression):
+    """Agrega mediciones crudas en la base de datos por (estación, tipo, período)"""
+    rows = queryset.annotate(
+        rollup_bucket=bucket_expression
+    ).values(
+        'station_id', 'measurement_type', 'rollup_bucket'
+    ).annotate(
+        rollup_unit=Max('unit'),
+        rollup_count=Count('id'),
+        rollup_sum=Sum('value'),
+        rollup_sum_squares=Sum(F('value') * F('value'), output_field=FloatField()),
+        rollup_min=Min('value'),
+        rollup_max=Max('value'),
+        rollup_first=Min('timestamp'),
+        rollup_last=Max('timestamp'),
+    ).order_by()
+
+    for row in rows:
+        yield {
+            'station_id': row['station_id'],
+            'measurement_type': row['measurement_type'],
+            'bucket': row['rollup_bucket'],
+            'unit': row['rollup_unit'],
+            'count': row['rollup_count'],
+            'sum_value': row['rollup_sum'],
+            'sum_squares': row['rollup_sum_squares'],
+            'min_value': row['rollup_min'],
+            'max_value': row['rollup_max'],
+            'first_timestamp': row['rollup_first'],
+            'last_timestamp': row['rollup_last'],
+        }
+
+
+# ===================================================================
+# LECTURA PARA REPORTES
+# ===================================================================
+
+def report_rows(stations_filter, measurement_type, date_from, date_to, aggregation='daily'):
+    """
+    Filas agregadas por (período, estación) para los reportes.
+
+    Los períodos cerrados se leen de los agregados; el período en curso se
+    calcula desde las mediciones crudas. Cada fila contiene period,
+    station__id, station__name, station__code, unit, avg_value, min_value,
+    max_value, count_measurements, sum_squares, first_measurement_time y
+    last_measurement_time, ordenadas por período y nombre de estación.
+    """
+    now = timezone.now()
+    range_start = day_start(date_from)
+    range_end = day_start(date_to + datetime.timedelta(days=1))
+
+    if aggregation == 'daily':
+        model = MeasurementDailyRollup
+        current_bucket = day_bucket(now)
+        current_start = day_start(current_bucket)
+        bucket_range = Q(bucket__gte=date_from, bucket__lte=date_to)
+    else:  # hourly
+        model = MeasurementHourlyRollup
+        current_bucket = hour_bucket(now)
+        current_start = current_bucket
+        bucket_range = Q(bucket__gte=range_start, bucket__lt=range_end)
+
+    rollups = model.objects.filter(
+        stations_filter,
+        bucket_range,
+        measurement_type=measurement_type,
+        bucket__lt=current_bucket,
+    ).values(
+        'bucket', 'station__id', 'station__name', 'station__code', 'unit',
+        'count', 'sum_value', 'sum_squares', 'min_value', 'max_value',
+        'first_timestamp', 'last_timestamp'
+    )
+
+    rows = [
+        {
+            'period': rollup['bucket'],
+            'station__id': rollup['station__id'],
+            'station__name': rollup['station__name'],
+            'station__code': rollup['station__code'],
+            'unit': rollup['unit'],
+            'avg_value': rollup['sum_value'] / rollup['count'],
+            'min_value': rollup['min_value'],
+            'max_value': rollup['max_value'],
+            'count_measurements': rollup['count'],
+            'sum_squares': rollup['sum_squares'],
+            'first_measurement_time': rollup['first_timestamp'],
+            'last_measurement_time': rollup['last_timestamp'],
+        }
+        for rollup in rollups
+    ]
+
+    # Período en curso: todavía abierto, se agrega desde las mediciones crudas
+    if range_start <= current_start < range_end:
+        current = Measurement.objects.filter(
+            stations_filter,
+            measurement_type=measurement_type,
+            quality_flag=GOOD_QUALITY,
+            timestamp__gte=current_start,
+        ).values(
+            'station__id', 'station__name', 'station__code', 'unit'
+        ).annotate(
+            avg_value=Avg('value'),
+            min_value=Min('value'),
+            max_value=Max('value'),
+            count_measurements=Count('id'),
+            sum_squares=Sum(F('value') * F('value'), output_field=FloatField()),
+            first_measurement_time=Min('timestamp'),
+            last_measurement_time=Max('timestamp')
+        ).order_by()
+
+        rows.extend({'period': current_bucket, **row} for row in current)
+
+    rows.sort(key=lambda row: (row['period'], row['station__name']))
+    return rows
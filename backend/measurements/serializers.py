@@ -1,17 +1,23 @@
 from rest_framework import serializers
 from django.utils import timezone
-from django.db import transaction
+from django.urls import reverse
 from .models import (
     Measurement,
     Threshold,
     Alert,
     MeasurementConfiguration,
     MeasurementType,
-    AlertLevel,
-    AlertStatus
+    AlertStatus,
+    LatestReading,
+    ReportJob,
+    ReportJobStatus
 )
+from .ingest import MeasurementBatchIngestor, build_threshold_alert, ALERT_DEDUP_WINDOW
+from .threshold_index import threshold_index
+from .latest_readings import record_measurement
 from stations.models import Station
 from sensors.models import Sensor
+from rioclaro_api.tracing import span, traced_atomic
 
 
 class MeasurementListSerializer(serializers.ModelSerializer):
@@ -95,11 +101,13 @@ class MeasurementCreateSerializer(serializers.ModelSerializer):
             )
 
         # Validar que no existe una medición idéntica
-        if Measurement.objects.filter(
-            station=data['station'],
-            sensor=data['sensor'],
-            timestamp=data['timestamp']
-        ).exists():
+        with span('validate.duplicate_check'):
+            duplicate = Measurement.objects.filter(
+                station=data['station'],
+                sensor=data['sensor'],
+                timestamp=data['timestamp']
+            ).exists()
+        if duplicate:
             raise serializers.ValidationError(
                 "Ya existe una medición para este sensor en la fecha y hora especificada"
             )
@@ -110,62 +118,47 @@ class MeasurementCreateSerializer(serializers.ModelSerializer):
         """
         Crear medición y verificar umbrales para generar alertas automáticas
         """
-        with transaction.atomic():
-            measurement = super().create(validated_data)
+        with traced_atomic():
+            with span('measurement.insert'):
+                measurement = super().create(validated_data)
+
+            # Actualizar el estado actual del sensor (RF2.1); los agregados
+            # horarios y diarios se actualizan desde la señal post_save
+            with span('latest_readings'):
+                record_measurement(measurement)
 
             # Verificar umbrales y generar alertas si es necesario (RF2.5)
             self._check_thresholds_and_create_alerts(measurement)
 
-            return measurement
+        return measurement
 
     def _check_thresholds_and_create_alerts(self, measurement):
         """
         Verifica umbrales y crea alertas automáticas cuando es necesario
         """
-        try:
-            threshold = Threshold.objects.get(
+        # Umbral desde el índice en memoria (sin consulta a la base de datos)
+        with span('threshold.lookup'):
+            threshold = threshold_index.get(measurement.station_id, measurement.measurement_type)
+        if threshold is None:
+            # No hay umbral configurado para este tipo de medición
+            return
+
+        alert_level = threshold.get_alert_level_for_value(measurement.value)
+
+        if alert_level != 'normal':
+            # Verificar si ya existe una alerta activa reciente para evitar spam
+            recent_alerts = Alert.objects.filter(
                 station=measurement.station,
-                measurement_type=measurement.measurement_type,
-                is_active=True
+                threshold=threshold,
+                status=AlertStatus.ACTIVE,
+                triggered_at__gte=timezone.now() - ALERT_DEDUP_WINDOW
             )
 
-            alert_level = threshold.get_alert_level_for_value(measurement.value)
-
-            if alert_level != 'normal':
-                # Mapeo de niveles internos a AlertLevel
-                alert_level_mapping = {
-                    'warning': AlertLevel.WARNING,
-                    'critical': AlertLevel.CRITICAL
-                }
-
-                # Verificar si ya existe una alerta activa reciente para evitar spam
-                recent_alerts = Alert.objects.filter(
-                    station=measurement.station,
-                    threshold=threshold,
-                    status=AlertStatus.ACTIVE,
-                    triggered_at__gte=timezone.now() - timezone.timedelta(hours=1)
-                )
-
-                if not recent_alerts.exists():
-                    Alert.objects.create(
-                        station=measurement.station,
-                        measurement=measurement,
-                        threshold=threshold,
-                        level=alert_level_mapping.get(alert_level, AlertLevel.WARNING),
-                        title=f"Umbral {alert_level} superado en {measurement.station.name}",
-                        message=f"El valor {measurement.value} {measurement.unit} "
-                                f"de {measurement.get_measurement_type_display()} "
-                                f"ha superado el umbral {alert_level} configurado.",
-                        metadata={
-                            'value': str(measurement.value),
-                            'unit': measurement.unit,
-                            'threshold_level': alert_level,
-                            'auto_generated': True
-                        }
-                    )
-        except Threshold.DoesNotExist:
-            # No hay umbral configurado para este tipo de medición
-            pass
+            with span('alert.create') as current:
+                created = not recent_alerts.exists()
+                if created:
+                    build_threshold_alert(measurement, threshold, alert_level).save()
+                current.set_attribute('created', created)
 
 
 class LatestMeasurementSerializer(serializers.ModelSerializer):
@@ -202,6 +195,20 @@ class LatestMeasurementSerializer(serializers.ModelSerializer):
             return "Menos de 1 minuto"
 
 
+class LatestReadingSerializer(LatestMeasurementSerializer):
+    """
+    Serializer para la lectura actual de un sensor (RF2.1)
+
+    Mantiene el formato de LatestMeasurementSerializer; el id corresponde
+    a la medición de origen.
+    """
+    id = serializers.IntegerField(source='measurement_id', read_only=True)
+    value = serializers.DecimalField(max_digits=12, decimal_places=4, read_only=True)
+
+    class Meta(LatestMeasurementSerializer.Meta):
+        model = LatestReading
+
+
 class ThresholdSerializer(serializers.ModelSerializer):
     """
     Serializer para configuración de umbrales (RF2.4)
@@ -377,8 +384,15 @@ class MeasurementStatsSerializer(serializers.Serializer):
 class BatchMeasurementCreateSerializer(serializers.Serializer):
     """
     Serializer para crear múltiples mediciones en lote (optimización para PLC)
+
+    Las filas se validan y se insertan en bloque mediante
+    MeasurementBatchIngestor; las filas inválidas se rechazan
+    individualmente sin invalidar el resto del lote.
     """
-    measurements = MeasurementCreateSerializer(many=True)
+    measurements = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False
+    )
 
     def validate_measurements(self, value):
         """Validar que no haya más de 1000 mediciones por lote"""
@@ -390,19 +404,9 @@ class BatchMeasurementCreateSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         """
-        Crear mediciones en lote con optimización de rendimiento
+        Crear mediciones en lote con un número fijo de consultas
         """
-        measurements_data = validated_data['measurements']
-        measurements = []
-
-        with transaction.atomic():
-            for measurement_data in measurements_data:
-                serializer = MeasurementCreateSerializer(data=measurement_data)
-                serializer.is_valid(raise_exception=True)
-                measurement = serializer.save()
-                measurements.append(measurement)
-
-        return {'measurements': measurements, 'count': len(measurements)}
+        return MeasurementBatchIngestor(validated_data['measurements']).run()
 
 
 # ========================================
@@ -551,7 +555,7 @@ class ComparativeReportStationData(serializers.Serializer):
     unit = serializers.CharField()
     data_points = ComparativeReportDataPoint(many=True)
     statistics = serializers.DictField(
-        help_text="Estadísticas del período (count, avg, min, max)"
+        help_text="Estadísticas del período (count, avg, min, max, std, mean_deviation, percentiles)"
     )
 
 
@@ -583,6 +587,11 @@ class ComparativeReportSerializer(serializers.Serializer):
     global_statistics = serializers.DictField(
         help_text="Estadísticas globales del período"
     )
+    comparison = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        help_text="Comparación entre estaciones por período (media, mínimo, máximo, desviación, rango)"
+    )
 
 
 class ReportParametersSerializer(serializers.Serializer):
@@ -666,4 +675,60 @@ class ExportFormatSerializer(serializers.Serializer):
     include_charts = serializers.BooleanField(
         default=False,
         help_text="Incluir gráficos (solo para PDF/Excel)"
-    )
\ No newline at end of file
+    )
+
+
+# ===================================================================
+# TRABAJOS ASÍNCRONOS DE REPORTES
+# ===================================================================
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """
+    Solicitud de generación asíncrona de un reporte PDF/Excel
+    """
+    report_type = serializers.ChoiceField(
+        choices=[
+            ('daily-averages', 'Promedios Diarios'),
+            ('critical-events', 'Eventos Críticos'),
+            ('comparative', 'Comparativo entre Estaciones')
+        ],
+        help_text="Tipo de reporte"
+    )
+    file_format = serializers.ChoiceField(
+        choices=[
+            ('pdf', 'PDF'),
+            ('excel', 'Excel')
+        ],
+        default='pdf',
+        help_text="Formato del archivo"
+    )
+    params = serializers.DictField(
+        required=False,
+        default=dict,
+        help_text="Parámetros del reporte (date_from, date_to, station_id, level, stations, ...)"
+    )
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Estado de un trabajo de generación de reportes
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'file_format', 'params', 'status',
+            'status_display', 'error_message', 'created_at', 'started_at',
+            'finished_at', 'expires_at', 'download_url'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        """URL de descarga, disponible sólo cuando el trabajo terminó"""
+        if obj.status != ReportJobStatus.COMPLETED:
+            return None
+        request = self.context.get('request')
+        path = reverse('measurements:report-job-download', kwargs={'job_id': obj.id})
+        return request.build_absolute_uri(path) if request else path
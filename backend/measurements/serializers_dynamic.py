@@ -3,6 +3,8 @@ Serializers para el Módulo 4: Escalabilidad y Módulos Adicionales
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from rioclaro_api.metrics import MEASUREMENTS_INGESTED
+from rioclaro_api.tracing import span, traced_atomic
 from .models_dynamic import (
     SensorTypeCategory,
     DynamicSensorType,
@@ -10,6 +12,7 @@ from .models_dynamic import (
     ModuleAccess,
     ExtensibleMeasurement
 )
+from .latest_readings import record_extensible_measurements
 
 User = get_user_model()
 
@@ -211,7 +214,14 @@ class ExtensibleMeasurementCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['created_by'] = request.user
-        return super().create(validated_data)
+
+        with traced_atomic():
+            with span('extensible_measurement.insert'):
+                measurement = super().create(validated_data)
+            # Actualizar el estado actual del sensor dinámico (RF2.1)
+            with span('latest_readings'):
+                record_extensible_measurements([measurement])
+        return measurement
 
 
 class BatchExtensibleMeasurementSerializer(serializers.Serializer):
@@ -231,7 +241,15 @@ class BatchExtensibleMeasurementSerializer(serializers.Serializer):
                 measurement_data['created_by'] = request.user
             measurements.append(ExtensibleMeasurement(**measurement_data))
 
-        return ExtensibleMeasurement.objects.bulk_create(measurements)
+        with traced_atomic():
+            with span('extensible_measurement.insert') as current:
+                created = ExtensibleMeasurement.objects.bulk_create(measurements)
+                current.set_attribute('rows', len(created))
+            with span('latest_readings'):
+                record_extensible_measurements(created)
+            if created:
+                MEASUREMENTS_INGESTED.inc_on_commit(len(created), source='extensible_batch')
+            return created
 
 
 class SensorTypeUsageStatsSerializer(serializers.Serializer):
@@ -0,0 +1,122 @@
+"""
+Señales de la app measurements
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from rioclaro_api.cache_versions import (
+    THRESHOLDS_NAMESPACE,
+    ALERTS_NAMESPACE,
+    bump_versions_on_commit,
+    measurement_namespaces
+)
+from rioclaro_api.metrics import ALERTS_CREATED, MEASUREMENTS_INGESTED
+from rioclaro_api.tracing import span
+from .models import Measurement, Threshold, Alert
+from .models_dynamic import ExtensibleMeasurement
+from .rollups import record_rollups, refresh_rollups
+from .threshold_index import threshold_index
+
+
+@receiver(post_save, sender=Threshold)
+@receiver(post_delete, sender=Threshold)
+def invalidate_threshold_index(sender, instance, **kwargs):
+    """
+    Invalida el índice de umbrales al crear, modificar o eliminar un umbral.
+
+    Se invalida de inmediato (para el propio worker) y de nuevo al confirmar
+    la transacción, para que ningún worker conserve un índice construido
+    con datos previos al commit.
+    """
+    threshold_index.invalidate()
+    transaction.on_commit(threshold_index.invalidate)
+    bump_versions_on_commit(THRESHOLDS_NAMESPACE)
+
+
+@receiver(post_save, sender=Measurement)
+@receiver(post_delete, sender=Measurement)
+def invalidate_measurement_caches(sender, instance, **kwargs):
+    """
+    Invalida las respuestas en caché de la estación de la medición.
+
+    La ingesta en lote (bulk_create) no emite señales; MeasurementBatchIngestor
+    invalida las estaciones afectadas por su cuenta.
+    """
+    bump_versions_on_commit(*measurement_namespaces([instance.station_id]))
+
+
+def _rollup_key(measurement):
+    return (measurement.station_id, measurement.measurement_type, measurement.timestamp)
+
+
+@receiver(pre_save, sender=Measurement)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    """Guarda la clave de agregado que tenía una medición antes de editarla"""
+    instance._previous_rollup_key = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_rollup_key = Measurement.objects.filter(pk=instance.pk).values_list(
+        'station_id', 'measurement_type', 'timestamp'
+    ).first()
+
+
+@receiver(post_save, sender=Measurement)
+def update_measurement_rollups(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantiene los agregados horarios y diarios (RF3.1) de las mediciones
+    guardadas de a una: una medición nueva se suma; una edición (valor,
+    fecha o quality_flag) recalcula los períodos anterior y actual.
+
+    La ingesta en lote (bulk_create) no emite señales; MeasurementBatchIngestor
+    llama a record_rollups por su cuenta.
+    """
+    if raw:
+        return
+    with span('rollups'):
+        if created:
+            record_rollups([instance])
+        else:
+            keys = {_rollup_key(instance)}
+            if instance._previous_rollup_key:
+                keys.add(instance._previous_rollup_key)
+            refresh_rollups(keys)
+
+
+@receiver(post_delete, sender=Measurement)
+def remove_measurement_from_rollups(sender, instance, **kwargs):
+    """Recalcula los períodos de una medición eliminada"""
+    refresh_rollups({_rollup_key(instance)})
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_alert_caches(sender, instance, **kwargs):
+    """Invalida las respuestas de alertas en caché"""
+    bump_versions_on_commit(ALERTS_NAMESPACE)
+
+
+@receiver(post_save, sender=Measurement)
+def count_measurement(sender, instance, created, **kwargs):
+    """
+    Cuenta las mediciones guardadas de a una para /metrics/.
+
+    La ingesta en lote cuenta sus mediciones en MeasurementBatchIngestor.
+    """
+    if created:
+        MEASUREMENTS_INGESTED.inc_on_commit(source='single')
+
+
+@receiver(post_save, sender=ExtensibleMeasurement)
+def count_extensible_measurement(sender, instance, created, **kwargs):
+    """Cuenta las mediciones extensibles guardadas de a una para /metrics/"""
+    if created:
+        MEASUREMENTS_INGESTED.inc_on_commit(source='extensible')
+
+
+@receiver(post_save, sender=Alert)
+def count_alert(sender, instance, created, **kwargs):
+    """Cuenta las alertas creadas por nivel para /metrics/"""
+    if created:
+        ALERTS_CREATED.inc_on_commit(level=instance.level)
@@ -0,0 +1,212 @@
+"""
+Estadísticas vectorizadas para reportes (RF3.1, RF3.3)
+
+Las filas se leen de la base de datos en forma columnar (values_list a
+arreglos NumPy) y las estadísticas por grupo se calculan sobre los arreglos
+completos, sin bucles de Python por fila:
+
+- group_statistics: media, mínimo, máximo, desviación estándar y percentiles
+  por grupo a partir de valores crudos
+- combine_partials: combina agregados parciales (conteo, suma, suma de
+  cuadrados, mínimo, máximo), p.ej. filas de los agregados horarios/diarios
+- comparison_matrix / cross_station_comparison: matriz estación × período y
+  comparación entre estaciones en cada período
+
+Los grupos se identifican con claves enteras; np.unique(return_inverse=True)
+convierte cualquier columna (fechas, ids) en índices 0..n-1.
+"""
+
+import numpy as np
+
+from .queries import iterate_keyset
+
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def fetch_columns(queryset, fields, dtypes, chunk_size=2000, ordering_field='timestamp'):
+    """
+    Lee los campos del queryset en arreglos NumPy (uno por campo)
+
+    Las filas se consumen en bloques keyset sobre (ordering_field, id) y se
+    escriben directamente en un arreglo estructurado, sin listas
+    intermedias; sólo un bloque de filas de Python queda en memoria.
+    """
+    dtype = np.dtype([(field, field_dtype) for field, field_dtype in zip(fields, dtypes)])
+    rows = iterate_keyset(
+        queryset.values_list(ordering_field, 'id', *fields),
+        ordering_field=ordering_field,
+        chunk_size=chunk_size,
+        key=lambda row: row[:2]
+    )
+    data = np.fromiter((row[2:] for row in rows), dtype=dtype)
+    return {field: data[field] for field in fields}
+
+
+def encode(column):
+    """Convierte una columna en (valores únicos ordenados, índice de cada fila)"""
+    return np.unique(column, return_inverse=True)
+
+
+def group_statistics(group_index, values, group_count=None, percentiles=None):
+    """
+    Estadísticas por grupo sobre valores crudos
+
+    - group_index: índice de grupo (0..n-1) de cada valor
+    - values: arreglo de valores (float)
+    - percentiles: secuencia de percentiles (0-100) o None
+
+    Retorna un dict de arreglos de largo n: count, mean, min, max, std y,
+    si se pidieron, percentiles (matriz n × len(percentiles)). Los grupos sin
+    valores tienen count 0 y NaN en el resto.
+    """
+    group_index = np.asarray(group_index, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if group_count is None:
+        group_count = int(group_index.max()) + 1 if group_index.size else 0
+
+    count = np.bincount(group_index, minlength=group_count)
+    total = np.bincount(group_index, weights=values, minlength=group_count)
+    squares = np.bincount(group_index, weights=values * values, minlength=group_count)
+
+    result = _moments(count, total, squares)
+
+    # Orden por (grupo, valor): cada grupo queda contiguo y ordenado
+    order = np.lexsort((values, group_index))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1])) if group_count else count
+    present = count > 0
+
+    minimum = np.full(group_count, np.nan)
+    maximum = np.full(group_count, np.nan)
+    minimum[present] = sorted_values[starts[present]]
+    maximum[present] = sorted_values[starts[present] + count[present] - 1]
+    result['min'] = minimum
+    result['max'] = maximum
+
+    if percentiles:
+        result['percentiles'] = _sorted_percentiles(sorted_values, starts, count, percentiles)
+
+    return result
+
+
+def combine_partials(group_index, counts, sums, sum_squares, minimums, maximums, group_count=None):
+    """
+    Combina agregados parciales por grupo (ponderados por conteo)
+
+    Retorna un dict de arreglos: count, mean, min, max, std
+    """
+    group_index = np.asarray(group_index, dtype=np.int64)
+    if group_count is None:
+        group_count = int(group_index.max()) + 1 if group_index.size else 0
+
+    count = np.bincount(group_index, weights=np.asarray(counts, dtype=np.float64), minlength=group_count)
+    total = np.bincount(group_index, weights=np.asarray(sums, dtype=np.float64), minlength=group_count)
+    squares = np.bincount(group_index, weights=np.asarray(sum_squares, dtype=np.float64), minlength=group_count)
+
+    result = _moments(count.astype(np.int64), total, squares)
+
+    minimum = np.full(group_count, np.inf)
+    maximum = np.full(group_count, -np.inf)
+    np.minimum.at(minimum, group_index, np.asarray(minimums, dtype=np.float64))
+    np.maximum.at(maximum, group_index, np.asarray(maximums, dtype=np.float64))
+    minimum[~np.isfinite(minimum)] = np.nan
+    maximum[~np.isfinite(maximum)] = np.nan
+    result['min'] = minimum
+    result['max'] = maximum
+
+    return result
+
+
+def comparison_matrix(row_index, column_index, values, shape):
+    """
+    Matriz (filas × columnas) con el valor de cada par; NaN donde no hay datos.
+    Usada como estaciones × períodos con el promedio de cada período.
+    """
+    matrix = np.full(shape, np.nan)
+    matrix[np.asarray(row_index, dtype=np.int64), np.asarray(column_index, dtype=np.int64)] = values
+    return matrix
+
+
+def cross_station_comparison(matrix):
+    """
+    Comparación entre estaciones sobre una matriz estaciones × períodos
+
+    Por período (columnas): cantidad de estaciones con datos, media, mínimo,
+    máximo, desviación estándar y rango entre estaciones.
+    Por estación (filas): desviación media respecto de la media de las
+    estaciones en los mismos períodos.
+    """
+    present = ~np.isnan(matrix)
+    stations_reporting = present.sum(axis=0)
+    with_data = stations_reporting > 0
+
+    period_mean = np.full(matrix.shape[1], np.nan)
+    period_min = np.full(matrix.shape[1], np.nan)
+    period_max = np.full(matrix.shape[1], np.nan)
+    period_std = np.full(matrix.shape[1], np.nan)
+
+    if with_data.any():
+        columns = matrix[:, with_data]
+        period_mean[with_data] = np.nanmean(columns, axis=0)
+        period_min[with_data] = np.nanmin(columns, axis=0)
+        period_max[with_data] = np.nanmax(columns, axis=0)
+        period_std[with_data] = np.nanstd(columns, axis=0)
+
+    deviation = matrix - period_mean
+    deviation_count = present.sum(axis=1)
+    mean_deviation = np.full(matrix.shape[0], np.nan)
+    rows_with_data = deviation_count > 0
+    mean_deviation[rows_with_data] = np.nansum(deviation[rows_with_data], axis=1) / deviation_count[rows_with_data]
+
+    return {
+        'stations_reporting': stations_reporting,
+        'mean': period_mean,
+        'min': period_min,
+        'max': period_max,
+        'std': period_std,
+        'spread': period_max - period_min,
+        'station_mean_deviation': mean_deviation,
+    }
+
+
+def to_python(value, digits=4):
+    """Convierte un escalar NumPy a float redondeado (None si es NaN)"""
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return round(value, digits)
+
+
+def _moments(count, total, squares):
+    """Media y desviación estándar poblacional desde conteo, suma y suma de cuadrados"""
+    present = count > 0
+    mean = np.full(count.shape, np.nan)
+    std = np.full(count.shape, np.nan)
+    mean[present] = total[present] / count[present]
+    variance = squares[present] / count[present] - mean[present] ** 2
+    std[present] = np.sqrt(np.maximum(variance, 0.0))
+    return {'count': count, 'mean': mean, 'std': std}
+
+
+def _sorted_percentiles(sorted_values, starts, count, percentiles):
+    """
+    Percentiles por grupo con interpolación lineal (igual que np.percentile)
+    sobre valores ya ordenados dentro de cada grupo
+    """
+    q = np.asarray(percentiles, dtype=np.float64) / 100.0
+    result = np.full((count.size, q.size), np.nan)
+    present = count > 0
+    if not present.any():
+        return result
+
+    group_starts = starts[present][:, None]
+    positions = (count[present][:, None] - 1) * q[None, :]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+
+    low_values = sorted_values[group_starts + lower]
+    high_values = sorted_values[group_starts + upper]
+    result[present] = low_values + (high_values - low_values) * fraction
+    return result
@@ -0,0 +1,22 @@
+"""
+Tareas Celery de la app measurements
+
+Celery es opcional: si no está instalado generate_report_task es None y los
+trabajos de reportes se ejecutan en el pool local (ver report_jobs).
+"""
+
+try:
+    from celery import shared_task
+except ImportError:
+    shared_task = None
+
+from .report_jobs import run_report_job
+
+
+if shared_task is not None:
+    @shared_task(name='measurements.generate_report', ignore_result=True)
+    def generate_report_task(job_id):
+        """Genera el archivo de un trabajo de reporte (ReportJob)"""
+        run_report_job(job_id)
+else:
+    generate_report_task = None
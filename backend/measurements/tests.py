@@ -1,3 +1,504 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sensors.models import Sensor
+from stations.models import Station, StationAssignment
+from users.models import CustomUser, UserRole
+
+from . import report_jobs
+from .ingest import MeasurementBatchIngestor
+from .latest_readings import rebuild_latest_readings, record_measurements
+from .models_dynamic import DynamicSensorType, ExtensibleMeasurement, SensorTypeCategory
+from .models import (
+    Alert,
+    LatestReading,
+    Measurement,
+    MeasurementDailyRollup,
+    MeasurementHourlyRollup,
+    ReportJob,
+    ReportJobStatus,
+    Threshold,
+)
+from .rollups import day_start, rebuild_rollups
+
+
+class MeasurementFixturesMixin:
+    """Estaciones con sensor de nivel, un umbral y usuarios admin / observador"""
+
+    station_count = 3
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@rioclaro.test', password='clave-segura',
+            role=UserRole.ADMIN, first_name='Ana', last_name='Admin'
+        )
+        self.observer = CustomUser.objects.create_user(
+            username='observer', email='observer@rioclaro.test', password='clave-segura',
+            role=UserRole.OBSERVER, first_name='Oscar', last_name='Observador'
+        )
+        self.stations, self.sensors = [], []
+        for number in range(self.station_count):
+            station = Station.objects.create(
+                name=f'Estación {number}', code=f'EST_{number}', latitude=-39.8, longitude=-73.2
+            )
+            self.stations.append(station)
+            self.sensors.append(Sensor.objects.create(
+                station=station, name=f'Nivel {number}', sensor_type='water_level', unit='cm'
+            ))
+        StationAssignment.objects.create(user=self.observer, station=self.stations[0])
+        Threshold.objects.create(
+            station=self.stations[0], measurement_type='water_level', unit='cm',
+            warning_max=Decimal('100'), critical_max=Decimal('200')
+        )
+
+        self.client = APIClient(HTTP_USER_AGENT='Mozilla/5.0')
+        self.client.force_authenticate(self.admin)
+
+    def measurement_row(self, sensor, timestamp, value='10'):
+        return {
+            'station': sensor.station_id,
+            'sensor': sensor.pk,
+            'measurement_type': 'water_level',
+            'value': value,
+            'unit': 'cm',
+            'timestamp': timestamp.isoformat(),
+        }
+
+
+class BatchCreateMeasurementsTests(MeasurementFixturesMixin, TestCase):
+    """RF2.2: ingesta por lotes con resultado por fila"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('measurements:measurement-batch-create')
+        self.start = timezone.now() - timedelta(hours=2)
+
+    def test_rows_are_accepted_or_rejected_individually(self):
+        sensor = self.sensors[0]
+        rows = [self.measurement_row(sensor, self.start + timedelta(minutes=i)) for i in range(5)]
+        rows.append(self.measurement_row(self.sensors[1], self.start) | {'station': self.stations[0].pk})
+        rows.append({'sensor': sensor.pk})
+        rows.append(dict(rows[0]))
+
+        response = self.client.post(self.url, {'measurements': rows}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['rejected_count'], 3)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['accepted'] * 5 + ['rejected'] * 3)
+        self.assertEqual(Measurement.objects.count(), 5)
+
+    def test_existing_measurements_are_rejected(self):
+        rows = [self.measurement_row(self.sensors[0], self.start)]
+        self.client.post(self.url, {'measurements': rows}, format='json')
+
+        response = self.client.post(self.url, {'measurements': rows}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['rejected_count'], 1)
+        self.assertEqual(Measurement.objects.count(), 1)
+
+    def test_threshold_creates_one_alert_per_window(self):
+        rows = [
+            self.measurement_row(self.sensors[0], self.start + timedelta(minutes=i), value='250')
+            for i in range(3)
+        ]
+
+        response = self.client.post(self.url, {'measurements': rows}, format='json')
+
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(Alert.objects.get().level, 'critical')
+
+    def test_concurrent_duplicate_only_rejects_conflicting_row(self):
+        """Una fila insertada por otra ingesta tras la verificación de duplicados"""
+        sensor = self.sensors[0]
+        rows = [self.measurement_row(sensor, self.start + timedelta(minutes=i)) for i in range(3)]
+        Measurement.objects.create(
+            station=self.stations[0], sensor=sensor, measurement_type='water_level',
+            value=Decimal('10'), unit='cm', timestamp=self.start + timedelta(minutes=1)
+        )
+
+        with mock.patch.object(MeasurementBatchIngestor, '_reject_duplicates', lambda self, rows: rows):
+            response = self.client.post(self.url, {'measurements': rows}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['accepted', 'rejected', 'accepted']
+        )
+        self.assertEqual(Measurement.objects.count(), 3)
+
+
+class LatestReadingTests(MeasurementFixturesMixin, TestCase):
+    """RF2.1: tabla de estado actual por sensor"""
+
+    def create_measurement(self, sensor, timestamp, value):
+        return Measurement.objects.create(
+            station=sensor.station, sensor=sensor, measurement_type='water_level',
+            value=Decimal(value), unit='cm', timestamp=timestamp
+        )
+
+    def test_older_reading_does_not_replace_newer(self):
+        sensor = self.sensors[0]
+        now = timezone.now()
+        newer = self.create_measurement(sensor, now - timedelta(minutes=5), '20')
+        older = self.create_measurement(sensor, now - timedelta(hours=1), '10')
+
+        record_measurements([newer])
+        record_measurements([older])
+
+        reading = LatestReading.objects.get(sensor=sensor)
+        self.assertEqual(reading.measurement_id, newer.pk)
+        self.assertEqual(reading.value, Decimal('20'))
+
+    def test_new_sensors_are_inserted_without_updates(self):
+        now = timezone.now()
+        measurements = [self.create_measurement(sensor, now, '10') for sensor in self.sensors]
+
+        # Lectura bloqueada y una inserción (con su savepoint), sin UPDATE por fila
+        with self.assertNumQueries(4):
+            record_measurements(measurements)
+
+        self.assertEqual(LatestReading.objects.count(), len(self.sensors))
+
+    def test_row_created_concurrently_is_replaced_only_by_newer(self):
+        sensor = self.sensors[0]
+        now = timezone.now()
+        older = self.create_measurement(sensor, now - timedelta(hours=1), '10')
+        newer = self.create_measurement(sensor, now, '20')
+        record_measurements([older])
+
+        # La lectura previa no ve la fila creada por la otra ingesta
+        with mock.patch('measurements.latest_readings._locked', lambda queryset: queryset.none()):
+            record_measurements([newer])
+
+        self.assertEqual(LatestReading.objects.get(sensor=sensor).measurement_id, newer.pk)
+
+    def test_rebuild_fills_latest_endpoint(self):
+        now = timezone.now()
+        for sensor in self.sensors:
+            self.create_measurement(sensor, now - timedelta(hours=2), '10')
+            self.create_measurement(sensor, now - timedelta(hours=1), '30')
+        LatestReading.objects.all().delete()
+
+        self.assertEqual(rebuild_latest_readings(), (len(self.sensors), 0))
+
+        response = self.client.get(reverse('measurements:dashboard-latest'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {float(reading.value) for reading in LatestReading.objects.all()}, {30.0}
+        )
+
+
+class MeasurementRollupTests(MeasurementFixturesMixin, TestCase):
+    """RF3.1: agregados horarios y diarios que leen los reportes"""
+
+    def setUp(self):
+        super().setUp()
+        self.sensor = self.sensors[0]
+        self.day = timezone.localdate() - timedelta(days=2)
+        self.noon = day_start(self.day) + timedelta(hours=12)
+
+    def create_measurement(self, value, minutes=0, **fields):
+        return Measurement.objects.create(
+            station=self.sensor.station, sensor=self.sensor, measurement_type='water_level',
+            value=Decimal(value), unit='cm', timestamp=self.noon + timedelta(minutes=minutes), **fields
+        )
+
+    def daily_rollup(self):
+        return MeasurementDailyRollup.objects.filter(station=self.stations[0], bucket=self.day).first()
+
+    def test_saved_measurement_is_counted_once(self):
+        self.create_measurement('10')
+        self.create_measurement('30', minutes=10)
+
+        rollup = self.daily_rollup()
+        self.assertEqual(rollup.count, 2)
+        self.assertEqual(rollup.sum_value, Decimal('40'))
+
+    def test_edit_and_quality_flag_change_recompute_period(self):
+        first = self.create_measurement('10')
+        self.create_measurement('30', minutes=10)
+
+        first.value = Decimal('50')
+        first.save()
+        self.assertEqual(self.daily_rollup().max_value, Decimal('50'))
+
+        first.quality_flag = 'suspect'
+        first.save()
+        rollup = self.daily_rollup()
+        self.assertEqual((rollup.count, rollup.min_value, rollup.max_value), (1, Decimal('30'), Decimal('30')))
+
+        first.timestamp = first.timestamp - timedelta(days=1)
+        first.quality_flag = 'good'
+        first.save()
+        self.assertEqual(self.daily_rollup().count, 1)
+        self.assertTrue(MeasurementDailyRollup.objects.filter(bucket=self.day - timedelta(days=1)).exists())
+
+    def test_delete_recomputes_period(self):
+        first = self.create_measurement('10')
+        second = self.create_measurement('30', minutes=10)
+
+        first.delete()
+        self.assertEqual(self.daily_rollup().count, 1)
+        second.delete()
+        self.assertIsNone(self.daily_rollup())
+        self.assertFalse(MeasurementHourlyRollup.objects.exists())
+
+    def test_rebuild_restores_report_history(self):
+        for station_number, sensor in enumerate(self.sensors):
+            for minutes in (0, 30):
+                Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal(10 + station_number), unit='cm',
+                    timestamp=self.noon + timedelta(minutes=minutes)
+                )
+        MeasurementDailyRollup.objects.all().delete()
+        MeasurementHourlyRollup.objects.all().delete()
+
+        rebuild_rollups()
+
+        response = self.client.get(reverse('measurements:daily-average-report'), {
+            'date_from': self.day.isoformat(), 'date_to': self.day.isoformat()
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['report_info']['total_records'], len(self.sensors))
+        self.assertEqual([row['count'] for row in response.data['results']], [2] * len(self.sensors))
+
+
+class ReportJobTests(MeasurementFixturesMixin, TestCase):
+    """Módulo 3: reportes PDF/Excel asíncronos"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        patcher = mock.patch.object(report_jobs, 'REPORT_JOBS_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.day = timezone.localdate() - timedelta(days=2)
+        for sensor in self.sensors:
+            for hour in (10, 14):
+                Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal('12.5'), unit='cm', timestamp=day_start(self.day) + timedelta(hours=hour)
+                )
+
+    def submit(self, report_type, file_format, **params):
+        params.setdefault('date_from', self.day.isoformat())
+        params.setdefault('date_to', self.day.isoformat())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('measurements:report-jobs'), {
+                'report_type': report_type, 'file_format': file_format, 'params': params
+            }, format='json')
+        self.assertIn(response.status_code, (200, 202), response.data)
+        return ReportJob.objects.get(pk=response.data['id'])
+
+    def download(self, job):
+        response = self.client.get(reverse('measurements:report-job-download', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_jobs_build_pdf_and_excel_for_every_report(self):
+        stations = ','.join(str(station.pk) for station in self.stations)
+        for report_type, params in (
+            ('daily-averages', {}),
+            ('critical-events', {}),
+            ('comparative', {'stations': stations}),
+        ):
+            pdf = self.submit(report_type, 'pdf', **params)
+            excel = self.submit(report_type, 'excel', **params)
+
+            self.assertEqual(pdf.status, ReportJobStatus.COMPLETED, pdf.error_message)
+            self.assertEqual(excel.status, ReportJobStatus.COMPLETED, excel.error_message)
+            self.assertTrue(self.download(pdf).startswith(b'%PDF'))
+            self.assertTrue(self.download(excel).startswith(b'PK'))
+
+    def test_invalid_params_fail_the_job(self):
+        job = self.submit('comparative', 'pdf', stations=str(self.stations[0].pk))
+
+        self.assertEqual(job.status, ReportJobStatus.FAILED)
+        self.assertIn('al menos 2 estaciones', job.error_message)
+
+    def test_observer_job_uses_observer_scope(self):
+        self.client.force_authenticate(self.observer)
+        stations = ','.join(str(station.pk) for station in self.stations[1:])
+
+        job = self.submit('comparative', 'excel', stations=stations)
+
+        self.assertEqual(job.status, ReportJobStatus.FAILED)
+        self.assertIn('permisos', job.error_message)
+
+    def test_stale_jobs_are_recovered(self):
+        stale = timezone.now() - timedelta(seconds=report_jobs.REPORT_JOBS_STALE_AFTER + 60)
+        params = {'date_from': self.day.isoformat(), 'date_to': self.day.isoformat()}
+        pending = ReportJob.objects.create(
+            user=self.admin, report_type='daily-averages', file_format='pdf',
+            params=params, params_hash='a' * 64
+        )
+        running = ReportJob.objects.create(
+            user=self.admin, report_type='daily-averages', file_format='excel',
+            params=params, params_hash='b' * 64, status=ReportJobStatus.RUNNING, started_at=stale
+        )
+        recent = ReportJob.objects.create(
+            user=self.admin, report_type='daily-averages', file_format='excel',
+            params=params, params_hash='c' * 64, status=ReportJobStatus.RUNNING,
+            started_at=timezone.now()
+        )
+        ReportJob.objects.filter(pk=pending.pk).update(created_at=stale)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('measurements:report-job-detail', args=[pending.pk]))
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, ReportJobStatus.COMPLETED)
+
+        self.assertEqual(report_jobs.recover_stale_report_jobs(), (0, 1))
+        running.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(running.status, ReportJobStatus.FAILED)
+        self.assertEqual(recent.status, ReportJobStatus.RUNNING)
+
+
+class ComparativeReportTests(MeasurementFixturesMixin, TestCase):
+    """RF3.3: estadísticas del reporte comparativo"""
+
+    def setUp(self):
+        super().setUp()
+        self.day = timezone.localdate() - timedelta(days=2)
+        for sensor, value in zip(self.sensors, ('100', '20', '30')):
+            for hour in (10, 11, 12):
+                Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal(value), unit='cm', timestamp=day_start(self.day) + timedelta(hours=hour)
+                )
+
+    def test_percentiles_ignore_stations_without_rollups(self):
+        missing = [self.stations[0], self.stations[2]]
+        MeasurementDailyRollup.objects.filter(station__in=missing).delete()
+        MeasurementHourlyRollup.objects.filter(station__in=missing).delete()
+
+        response = self.client.get(reverse('measurements:comparative-report'), {
+            'date_from': self.day.isoformat(),
+            'date_to': self.day.isoformat(),
+            'stations': ','.join(str(station.pk) for station in self.stations),
+            'percentiles': '50',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        stations_data = response.data['results']['stations_data']
+        self.assertEqual([station['station_id'] for station in stations_data], [self.stations[1].pk])
+        self.assertEqual(stations_data[0]['statistics']['percentiles'], {'p50': 20.0})
+
+
+class QueryBudgetTests(MeasurementFixturesMixin, TestCase):
+    """Los endpoints del dashboard, reportes y Módulo 4 no superan su presupuesto de consultas"""
+
+    station_count = 6
+
+    def setUp(self):
+        super().setUp()
+        for station in self.stations[1:]:
+            StationAssignment.objects.create(user=self.observer, station=station)
+
+        self.day = timezone.localdate() - timedelta(days=2)
+        now = timezone.now()
+        for sensor in self.sensors:
+            threshold = Threshold.objects.get_or_create(
+                station=sensor.station, measurement_type='water_level',
+                defaults={'unit': 'cm', 'warning_max': Decimal('100'), 'critical_max': Decimal('200')}
+            )[0]
+            for hour in (8, 12, 16):
+                Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal(hour), unit='cm', timestamp=day_start(self.day) + timedelta(hours=hour)
+                )
+            for level, value in (('warning', '150'), ('critical', '250')):
+                measurement = Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal(value), unit='cm', timestamp=now - timedelta(minutes=len(level))
+                )
+                Alert.objects.create(
+                    station=sensor.station, measurement=measurement, threshold=threshold,
+                    level=level, title=f'Nivel {level}', message=f'Nivel del agua {value} cm'
+                )
+        record_measurements(Measurement.objects.all())
+
+        for number in range(3):
+            category = SensorTypeCategory.objects.create(name=f'Categoría {number}', code=f'cat-{number}')
+            for kind in range(2):
+                sensor_type = DynamicSensorType.objects.create(
+                    name=f'Sensor {number}-{kind}', code=f'sensor-{number}-{kind}',
+                    category=category, measurement_unit='mg/L'
+                )
+                for station in self.stations:
+                    ExtensibleMeasurement.objects.create(
+                        sensor_type=sensor_type, station=station, value=Decimal('7.5'), timestamp=now
+                    )
+
+    def get(self, url_name, **params):
+        for user in (self.admin, self.observer):
+            self.client.force_authenticate(user)
+            response = self.client.get(reverse(url_name), params)
+            self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_dashboard(self):
+        response = self.get('measurements:dashboard-latest')
+        self.assertEqual(len(response.data), self.station_count)
+
+        response = self.get('measurements:active-alerts-summary')
+        self.assertEqual(len(response.data), self.station_count)
+        self.assertEqual(response.data[0]['total_alerts'], 2)
+
+    def test_reports(self):
+        dates = {'date_from': self.day.isoformat(), 'date_to': timezone.localdate().isoformat()}
+
+        response = self.get('measurements:daily-average-report', **dates)
+        self.assertEqual(response.data['report_info']['total_records'], self.station_count * 2)
+
+        response = self.get(
+            'measurements:comparative-report', percentiles='true',
+            stations=','.join(str(station.pk) for station in self.stations), **dates
+        )
+        self.assertEqual(response.data['results']['total_stations'], self.station_count)
+
+    def test_module4_overviews(self):
+        response = self.get('measurements:dynamic-sensors-usage-stats')
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual({row['active_stations'] for row in response.data}, {self.station_count})
+
+        response = self.get('measurements:sensor-ecosystem-overview')
+        self.assertEqual(response.data['total_measurements'], 6 * self.station_count)
+        self.assertEqual(len(response.data['categories_breakdown']), 3)
+
+
+class MeasurementExportStreamTests(MeasurementFixturesMixin, TestCase):
+    """RF2.3: exportación del historial en bloques keyset"""
+
+    def test_chunks_cover_every_row_once_in_order(self):
+        start = timezone.now() - timedelta(hours=1)
+        for minute in range(3):
+            # Mismo timestamp en las tres estaciones: empates resueltos por id
+            for sensor in self.sensors:
+                Measurement.objects.create(
+                    station=sensor.station, sensor=sensor, measurement_type='water_level',
+                    value=Decimal(minute), unit='cm', timestamp=start + timedelta(minutes=minute)
+                )
+        expected = list(Measurement.objects.order_by('timestamp', 'id').values_list('id', flat=True))
+
+        with mock.patch('measurements.views.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get(reverse('measurements:measurement-export-stream'))
 
-# Create your tests here.
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], expected)
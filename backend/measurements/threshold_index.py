@@ -0,0 +1,115 @@
+"""
+Índice en memoria de umbrales activos (RF2.4 / RF2.5)
+
+Cada worker mantiene un diccionario (station_id, measurement_type) -> Threshold
+que se construye una sola vez y se consulta sin acceso a la base de datos
+durante la ingesta de mediciones.
+
+Invalidación:
+- Local: señales post_save/post_delete de Threshold (ver signals.py)
+- Entre workers: contador de versión en el cache compartido; cada worker
+  compara su versión con la compartida como máximo cada
+  THRESHOLD_INDEX_VERSION_CHECK_INTERVAL segundos.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdIndex:
+    """
+    Índice de umbrales activos por (estación, tipo de medición)
+    """
+    version_cache_key = 'threshold_index:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._last_version_check = 0.0
+
+    def get(self, station_id, measurement_type):
+        """Retorna el umbral activo o None si no hay umbral configurado"""
+        return self._get_index().get((station_id, measurement_type))
+
+    def get_many(self, station_ids=None):
+        """
+        Retorna el índice completo (o filtrado por estaciones) como diccionario
+        """
+        index = self._get_index()
+        if station_ids is None:
+            return dict(index)
+        station_ids = set(station_ids)
+        return {key: threshold for key, threshold in index.items() if key[0] in station_ids}
+
+    def invalidate(self, broadcast=True):
+        """
+        Descarta el índice local y, si broadcast, incrementa la versión
+        compartida para que el resto de workers lo reconstruya
+        """
+        with self._lock:
+            self._index = None
+
+        if broadcast:
+            try:
+                cache.add(self.version_cache_key, 0, None)
+                cache.incr(self.version_cache_key)
+            except Exception as e:
+                logger.error(f"Failed to bump threshold index version: {e}")
+
+    def _get_index(self):
+        shared_version = self._check_shared_version()
+
+        index = self._index
+        if index is not None:
+            return index
+
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+                self._version = shared_version
+            return self._index
+
+    def _check_shared_version(self):
+        """
+        Compara la versión local con la compartida (a lo sumo una vez por
+        intervalo) y descarta el índice si otro worker lo invalidó
+        """
+        interval = getattr(settings, 'THRESHOLD_INDEX_VERSION_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        if self._index is not None and now - self._last_version_check < interval:
+            return self._version
+
+        self._last_version_check = now
+        try:
+            shared_version = cache.get(self.version_cache_key, 0)
+        except Exception as e:
+            logger.error(f"Failed to read threshold index version: {e}")
+            return self._version
+
+        if self._index is not None and shared_version != self._version:
+            with self._lock:
+                self._index = None
+
+        return shared_version
+
+    def _build(self):
+        """Carga todos los umbrales activos en una sola consulta"""
+        from .models import Threshold
+
+        index = {
+            (threshold.station_id, threshold.measurement_type): threshold
+            for threshold in Threshold.objects.filter(is_active=True)
+        }
+        logger.debug(f"Threshold index built with {len(index)} entries")
+        return index
+
+
+# Instancia por proceso
+threshold_index = ThresholdIndex()
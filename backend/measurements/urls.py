@@ -44,6 +44,10 @@ from .views import (
     # Export Reports
     export_report_pdf,
     export_report_excel,
+    export_measurements_stream,
+    report_jobs,
+    report_job_detail,
+    report_job_download,
 
     # Configuraciones
     MeasurementConfigurationListCreateView,
@@ -100,6 +104,13 @@ urlpatterns = [
         name='measurement-list'
     ),
 
+    # Exportación completa del historial en streaming (CSV / NDJSON)
+    path(
+        'export/stream/',
+        export_measurements_stream,
+        name='measurement-export-stream'
+    ),
+
     # Detalle de una medición específica
     path(
         '<int:pk>/',
@@ -203,6 +214,23 @@ urlpatterns = [
         name='export-report-excel'
     ),
 
+    # Exportación asíncrona - solicitud, estado y descarga
+    path(
+        'reports/jobs/',
+        report_jobs,
+        name='report-jobs'
+    ),
+    path(
+        'reports/jobs/<uuid:job_id>/',
+        report_job_detail,
+        name='report-job-detail'
+    ),
+    path(
+        'reports/jobs/<uuid:job_id>/download/',
+        report_job_download,
+        name='report-job-download'
+    ),
+
     # ========================================
     # CONFIGURACIÓN DE MEDICIONES
     # ========================================
@@ -1,24 +1,16 @@
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q, Avg, Min, Max, Count
+from django.db.models import Avg, Min, Max, Count
 from django.db import transaction
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as filters_rf
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 import datetime
-import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import os
 
 from .models import (
     Measurement,
@@ -26,13 +18,17 @@ from .models import (
     Alert,
     MeasurementConfiguration,
     MeasurementType,
-    AlertStatus
+    AlertStatus,
+    LatestReading,
+    ReportJob,
+    ReportJobStatus
 )
 from .serializers import (
     MeasurementListSerializer,
     MeasurementDetailSerializer,
     MeasurementCreateSerializer,
     LatestMeasurementSerializer,
+    LatestReadingSerializer,
     ThresholdSerializer,
     AlertSerializer,
     AlertActionSerializer,
@@ -42,19 +38,59 @@ from .serializers import (
     # Módulo 3: Reportes - Serializers
     DailyAverageReportSerializer,
     CriticalEventsReportSerializer,
-    ComparativeReportSerializer
+    ComparativeReportSerializer,
+    ReportJobCreateSerializer,
+    ReportJobSerializer
+)
+from .queries import iterate_keyset, latest_per_group
+from .pagination import SelectablePagination
+from .exports import (
+    excel_report_response,
+    stream_csv,
+    stream_ndjson,
+    EXPORT_CHUNK_SIZE
+)
+from .report_jobs import (
+    submit_report_job,
+    recover_stale_report_jobs,
+    artifact_path,
+    artifact_filename,
+    artifact_content_type
+)
+from .reports import (
+    ReportError,
+    build_report_excel,
+    build_report_pdf,
+    comparative_report_data,
+    critical_events_report_data,
+    daily_average_report_data,
+    report_filename
 )
 from stations.models import Station
+from rioclaro_api.access_scope import get_access_scope
+from rioclaro_api.admission import admission_controlled, ingest_admission
+from rioclaro_api.coalescing import coalesce_requests
+from rioclaro_api.query_budget import query_budget
+from rioclaro_api.tracing import span, traced
 from users.models import UserRole
 
 
-class MeasurementPagination(PageNumberPagination):
-    """Paginación personalizada para mediciones"""
+class MeasurementPagination(SelectablePagination):
+    """
+    Paginación personalizada para mediciones
+
+    Admite ?pagination=cursor para paginación keyset sobre (timestamp, id)
+    """
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
 
+class AlertPagination(MeasurementPagination):
+    """Paginación de alertas (modo cursor sobre (triggered_at, id))"""
+    keyset_field = 'triggered_at'
+
+
 class MeasurementFilter(filters_rf.FilterSet):
     """Filtros para mediciones (RF2.3)"""
     date_from = filters_rf.DateTimeFilter(field_name='timestamp', lookup_expr='gte')
@@ -88,12 +124,11 @@ def latest_measurement_by_station(request, station_id):
         station = get_object_or_404(Station, id=station_id, is_active=True)
 
         # Verificar permisos: usuarios solo pueden ver estaciones asignadas (excepto admins)
-        if request.user.role != UserRole.ADMIN:
-            if not station.assigned_users.filter(id=request.user.id).exists():
-                return Response(
-                    {'error': 'No tiene permisos para acceder a esta estación'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+        if not get_access_scope(request).can_access(station.id):
+            return Response(
+                {'error': 'No tiene permisos para acceder a esta estación'},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
         # Obtener la última medición
         latest_measurement = Measurement.objects.filter(
@@ -120,6 +155,7 @@ def latest_measurement_by_station(request, station_id):
         )
 
 
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def latest_measurements_all_stations(request):
@@ -129,22 +165,18 @@ def latest_measurements_all_stations(request):
     Endpoint: GET /api/measurements/latest/
     """
     # Filtrar estaciones según permisos del usuario
-    if request.user.role == UserRole.ADMIN:
-        stations = Station.objects.filter(is_active=True)
-    else:
-        stations = request.user.assigned_stations.filter(is_active=True)
-
-    latest_measurements = []
-
-    for station in stations:
-        latest = Measurement.objects.filter(
-            station=station
-        ).select_related('station', 'sensor').order_by('-timestamp').first()
-
-        if latest:
-            latest_measurements.append(latest)
+    stations = get_access_scope(request).stations().filter(is_active=True)
+
+    # Última lectura de cada estación desde la tabla de estado actual
+    latest_readings = latest_per_group(
+        LatestReading.objects.filter(
+            station__in=stations,
+            sensor__isnull=False
+        ).select_related('station', 'sensor'),
+        group_by=('station',)
+    )
 
-    serializer = LatestMeasurementSerializer(latest_measurements, many=True)
+    serializer = LatestReadingSerializer(latest_readings, many=True)
     return Response(serializer.data)
 
 
@@ -158,15 +190,22 @@ class MeasurementCreateView(generics.CreateAPIView):
     serializer_class = MeasurementCreateSerializer
     permission_classes = [IsAuthenticated]
 
+    @traced('measurement.create')
+    @admission_controlled(ingest_admission)
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        with span('parse'):
+            data = request.data
+        serializer = self.get_serializer(data=data)
+        with span('validate'):
+            serializer.is_valid(raise_exception=True)
 
         try:
-            measurement = serializer.save()
-            response_serializer = MeasurementDetailSerializer(measurement)
+            with span('save'):
+                measurement = serializer.save()
+            with span('serialize'):
+                response_data = MeasurementDetailSerializer(measurement).data
             return Response(
-                response_serializer.data,
+                response_data,
                 status=status.HTTP_201_CREATED
             )
         except ValueError as e:
@@ -178,23 +217,34 @@ class MeasurementCreateView(generics.CreateAPIView):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@traced('measurement.batch_create')
+@admission_controlled(ingest_admission)
 def batch_create_measurements(request):
     """
     RF2.2: Endpoint para crear múltiples mediciones en lote (optimización para PLC)
 
     Endpoint: POST /api/measurements/batch/
+
+    Las filas inválidas o duplicadas se rechazan individualmente; la
+    respuesta incluye el resultado de cada fila en `results`.
     """
-    serializer = BatchMeasurementCreateSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
+    with span('parse'):
+        data = request.data
+    serializer = BatchMeasurementCreateSerializer(data=data)
+    with span('validate'):
+        serializer.is_valid(raise_exception=True)
 
     try:
-        result = serializer.save()
+        with span('save'):
+            result = serializer.save()
         return Response(
             {
                 'message': f'Se crearon {result["count"]} mediciones exitosamente',
-                'count': result['count']
+                'count': result['count'],
+                'rejected_count': result['rejected_count'],
+                'results': result['results']
             },
-            status=status.HTTP_201_CREATED
+            status=status.HTTP_201_CREATED if result['count'] > 0 else status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
         return Response(
@@ -223,14 +273,86 @@ class MeasurementListView(generics.ListAPIView):
         queryset = Measurement.objects.select_related('station', 'sensor')
 
         # Filtrar por permisos
-        if self.request.user.role != UserRole.ADMIN:
-            # Usuarios no admin solo ven mediciones de estaciones asignadas
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset
 
 
+# Columnas de la exportación de historial (campo del modelo, nombre de columna)
+MEASUREMENT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('station_id', 'station_id'),
+    ('station__code', 'station_code'),
+    ('sensor_id', 'sensor_id'),
+    ('measurement_type', 'measurement_type'),
+    ('value', 'value'),
+    ('raw_value', 'raw_value'),
+    ('unit', 'unit'),
+    ('quality_flag', 'quality_flag'),
+    ('timestamp', 'timestamp'),
+    ('received_at', 'received_at'),
+]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_measurements_stream(request):
+    """
+    RF2.3: Exporta el historial completo de mediciones en streaming
+
+    Endpoint: GET /api/measurements/export/stream/
+
+    Parámetros:
+    - export_format: csv (por defecto) o ndjson
+    - Mismos filtros que el historial (MeasurementFilter): date_from, date_to,
+      measurement_type, station, sensor, quality_flag
+
+    Las filas se leen en bloques keyset sobre (timestamp, id), una consulta
+    por bloque, y se envían a medida que se generan: la memoria del servidor
+    no depende del tamaño del historial, también en MySQL.
+    """
+    export_format = request.GET.get('export_format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return Response(
+            {'error': 'export_format debe ser "csv" o "ndjson"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = Measurement.objects.all()
+
+    # Filtrar por permisos
+    queryset = get_access_scope(request).filter(queryset)
+
+    filterset = MeasurementFilter(request.GET, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return Response(
+            {'error': 'Parámetros de filtro inválidos', 'details': filterset.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fields = [field for field, _ in MEASUREMENT_EXPORT_COLUMNS]
+    columns = [column for _, column in MEASUREMENT_EXPORT_COLUMNS]
+    key_columns = (fields.index('timestamp'), fields.index('id'))
+    rows = iterate_keyset(
+        filterset.qs.values_list(*fields),
+        chunk_size=EXPORT_CHUNK_SIZE,
+        key=lambda row: (row[key_columns[0]], row[key_columns[1]])
+    )
+
+    if export_format == 'csv':
+        content = stream_csv(columns, rows)
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        content = stream_ndjson(columns, rows)
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="measurements_{datetime.date.today()}.{export_format}"'
+    )
+    return response
+
+
 class MeasurementDetailView(generics.RetrieveAPIView):
     """
     Detalle de una medición específica
@@ -244,15 +366,15 @@ class MeasurementDetailView(generics.RetrieveAPIView):
         """Filtrar mediciones según permisos del usuario"""
         queryset = Measurement.objects.select_related('station', 'sensor')
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.statistics')
+@coalesce_requests()
 def measurement_statistics(request):
     """
     RF2.3: Estadísticas de mediciones por estación y tipo
@@ -260,11 +382,7 @@ def measurement_statistics(request):
     Endpoint: GET /api/measurements/statistics/
     """
     # Filtrar por permisos
-    if request.user.role == UserRole.ADMIN:
-        stations_filter = Q()
-    else:
-        assigned_stations = request.user.assigned_stations.values_list('id', flat=True)
-        stations_filter = Q(station__id__in=assigned_stations)
+    stations_filter = get_access_scope(request).q()
 
     # Parámetros de filtro opcionales
     date_from = request.GET.get('date_from')
@@ -315,9 +433,7 @@ class ThresholdListCreateView(generics.ListCreateAPIView):
         """Filtrar umbrales según permisos del usuario"""
         queryset = Threshold.objects.select_related('station', 'created_by', 'updated_by')
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         # Filtro opcional por estación
         station_id = self.request.query_params.get('station_id')
@@ -333,8 +449,7 @@ class ThresholdListCreateView(generics.ListCreateAPIView):
 
         # Verificar que puede administrar la estación
         station = serializer.validated_data['station']
-        if (self.request.user.role != UserRole.ADMIN and
-                not station.assigned_users.filter(id=self.request.user.id).exists()):
+        if not get_access_scope(self.request).can_access(station.id):
             raise PermissionError("No tiene permisos para configurar umbrales en esta estación")
 
         serializer.save()
@@ -353,9 +468,7 @@ class ThresholdDetailView(generics.RetrieveUpdateDestroyAPIView):
         """Filtrar umbrales según permisos del usuario"""
         queryset = Threshold.objects.select_related('station', 'created_by', 'updated_by')
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset
 
@@ -383,7 +496,7 @@ class AlertListView(generics.ListAPIView):
     """
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = MeasurementPagination
+    pagination_class = AlertPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['triggered_at', 'level']
     ordering = ['-triggered_at']
@@ -395,9 +508,7 @@ class AlertListView(generics.ListAPIView):
             'acknowledged_by', 'resolved_by'
         )
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         # Filtros opcionales
         status_filter = self.request.query_params.get('status')
@@ -431,9 +542,7 @@ class AlertDetailView(generics.RetrieveAPIView):
             'acknowledged_by', 'resolved_by'
         )
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset
 
@@ -450,8 +559,7 @@ def alert_action(request, alert_id):
         alert = get_object_or_404(Alert, id=alert_id)
 
         # Verificar permisos
-        if (request.user.role != UserRole.ADMIN and
-                not alert.station.assigned_users.filter(id=request.user.id).exists()):
+        if not get_access_scope(request).can_access(alert.station_id):
             return Response(
                 {'error': 'No tiene permisos para gestionar esta alerta'},
                 status=status.HTTP_403_FORBIDDEN
@@ -482,8 +590,10 @@ def alert_action(request, alert_id):
         )
 
 
+@query_budget(5)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@coalesce_requests()
 def active_alerts_summary(request):
     """
     RF2.5: Resumen de alertas activas por estación
@@ -491,11 +601,7 @@ def active_alerts_summary(request):
     Endpoint: GET /api/alerts/active-summary/
     """
     # Filtrar por permisos
-    if request.user.role == UserRole.ADMIN:
-        stations_filter = Q()
-    else:
-        assigned_stations = request.user.assigned_stations.values_list('id', flat=True)
-        stations_filter = Q(station__id__in=assigned_stations)
+    stations_filter = get_access_scope(request).q()
 
     # Contar alertas activas por nivel y estación
     active_alerts = Alert.objects.filter(
@@ -548,9 +654,7 @@ class MeasurementConfigurationListCreateView(generics.ListCreateAPIView):
         """Filtrar configuraciones según permisos del usuario"""
         queryset = MeasurementConfiguration.objects.select_related('station')
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset.order_by('station__name')
 
@@ -575,9 +679,7 @@ class MeasurementConfigurationDetailView(generics.RetrieveUpdateAPIView):
         """Filtrar configuraciones según permisos del usuario"""
         queryset = MeasurementConfiguration.objects.select_related('station')
 
-        if self.request.user.role != UserRole.ADMIN:
-            assigned_stations = self.request.user.assigned_stations.values_list('id', flat=True)
-            queryset = queryset.filter(station__id__in=assigned_stations)
+        queryset = get_access_scope(self.request).filter(queryset)
 
         return queryset
 
@@ -593,8 +695,14 @@ class MeasurementConfigurationDetailView(generics.RetrieveUpdateAPIView):
 # MÓDULO 3: REPORTES (RF3.1, RF3.2, RF3.3)
 # ===================================================================
 
+def _report_error_response(error):
+    return Response({'error': error.message}, status=error.status_code)
+
+
+@query_budget(5)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.daily_averages')
 def daily_average_report(request):
     """
     RF3.1: Reporte de Promedios Diarios
@@ -610,112 +718,22 @@ def daily_average_report(request):
     - station_id: ID de estación (opcional, si no se especifica incluye todas)
     - measurement_type: Tipo de medición (water_level, flow_rate, temperature, ph)
     """
-    # Validar parámetros requeridos
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    measurement_type = request.GET.get('measurement_type', 'water_level')
-
-    if not date_from or not date_to:
-        return Response(
-            {'error': 'Los parámetros date_from y date_to son requeridos (formato: YYYY-MM-DD)'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
     try:
-        # Convertir fechas
-        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
-        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
-
-        if date_from_obj > date_to_obj:
-            return Response(
-                {'error': 'La fecha_desde no puede ser mayor que fecha_hasta'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    except ValueError:
-        return Response(
-            {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Filtrar por permisos del usuario
-    if request.user.role == UserRole.ADMIN:
-        stations_filter = Q()
-    else:
-        assigned_stations = request.user.assigned_stations.values_list('id', flat=True)
-        stations_filter = Q(station__id__in=assigned_stations)
-
-    # Construir consulta base
-    queryset = Measurement.objects.filter(
-        stations_filter,
-        measurement_type=measurement_type,
-        timestamp__date__gte=date_from_obj,
-        timestamp__date__lte=date_to_obj,
-        quality_flag='good'  # Solo mediciones de buena calidad
-    )
-
-    # Filtro opcional por estación
-    station_id = request.GET.get('station_id')
-    if station_id:
-        try:
-            station_id = int(station_id)
-            queryset = queryset.filter(station__id=station_id)
-        except ValueError:
-            return Response(
-                {'error': 'station_id debe ser un número entero'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    # Agregar por día y estación
-    daily_averages = queryset.extra(
-        select={'date': 'DATE(timestamp)'}
-    ).values(
-        'date', 'station__id', 'station__name', 'station__code', 'unit'
-    ).annotate(
-        avg_value=Avg('value'),
-        min_value=Min('value'),
-        max_value=Max('value'),
-        count_measurements=Count('id'),
-        first_measurement_time=Min('timestamp'),
-        last_measurement_time=Max('timestamp')
-    ).order_by('date', 'station__name')
-
-    # Formatear datos para el serializer
-    report_data = []
-    for daily_avg in daily_averages:
-        report_data.append({
-            'date': daily_avg['date'],
-            'station_id': daily_avg['station__id'],
-            'station_name': daily_avg['station__name'],
-            'station_code': daily_avg['station__code'],
-            'measurement_type': measurement_type,
-            'measurement_type_display': dict(MeasurementType.choices).get(measurement_type, measurement_type),
-            'avg_value': daily_avg['avg_value'],
-            'min_value': daily_avg['min_value'],
-            'max_value': daily_avg['max_value'],
-            'count': daily_avg['count_measurements'],
-            'unit': daily_avg['unit'],
-            'first_measurement_time': daily_avg['first_measurement_time'],
-            'last_measurement_time': daily_avg['last_measurement_time']
-        })
+        report_info, report_data = daily_average_report_data(get_access_scope(request), request.GET)
+    except ReportError as e:
+        return _report_error_response(e)
 
     serializer = DailyAverageReportSerializer(report_data, many=True)
 
     return Response({
-        'report_info': {
-            'type': 'daily_averages',
-            'date_from': date_from,
-            'date_to': date_to,
-            'measurement_type': measurement_type,
-            'station_filter': station_id,
-            'total_records': len(report_data)
-        },
+        'report_info': report_info,
         'results': serializer.data
     })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.critical_events')
 def critical_events_report(request):
     """
     RF3.2: Reporte de Eventos Críticos
@@ -731,119 +749,24 @@ def critical_events_report(request):
     - station_id: ID de estación (opcional)
     - level: Nivel de umbral (warning, critical, emergency - opcional)
     """
-    # Validar parámetros requeridos
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-
-    if not date_from or not date_to:
-        return Response(
-            {'error': 'Los parámetros date_from y date_to son requeridos (formato: YYYY-MM-DD)'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
     try:
-        # Convertir fechas
-        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
-        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
-
-        if date_from_obj > date_to_obj:
-            return Response(
-                {'error': 'La fecha_desde no puede ser mayor que fecha_hasta'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    except ValueError:
-        return Response(
-            {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Filtrar por permisos del usuario
-    if request.user.role == UserRole.ADMIN:
-        stations_filter = Q()
-    else:
-        assigned_stations = request.user.assigned_stations.values_list('id', flat=True)
-        stations_filter = Q(station__id__in=assigned_stations)
-
-    # Construir consulta base para alertas generadas en el período
-    alerts_queryset = Alert.objects.filter(
-        stations_filter,
-        triggered_at__date__gte=date_from_obj,
-        triggered_at__date__lte=date_to_obj
-    ).select_related(
-        'station', 'measurement', 'threshold'
-    )
-
-    # Filtros opcionales
-    station_id = request.GET.get('station_id')
-    if station_id:
-        try:
-            station_id = int(station_id)
-            alerts_queryset = alerts_queryset.filter(station__id=station_id)
-        except ValueError:
-            return Response(
-                {'error': 'station_id debe ser un número entero'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    level_filter = request.GET.get('level')
-    if level_filter and level_filter in ['warning', 'critical', 'emergency']:
-        alerts_queryset = alerts_queryset.filter(level=level_filter)
-
-    # Obtener alertas ordenadas por fecha
-    alerts = alerts_queryset.order_by('-triggered_at')
-
-    # Formatear datos para el serializer
-    report_data = []
-    for alert in alerts:
-        measurement = alert.measurement
-        threshold = alert.threshold
-
-        report_data.append({
-            'event_id': alert.id,
-            'timestamp': alert.triggered_at,
-            'station_id': alert.station.id,
-            'station_name': alert.station.name,
-            'station_code': alert.station.code,
-            'measurement_type': measurement.measurement_type if measurement else threshold.measurement_type,
-            'measurement_type_display': dict(MeasurementType.choices).get(
-                measurement.measurement_type if measurement else threshold.measurement_type,
-                measurement.measurement_type if measurement else threshold.measurement_type
-            ),
-            'measured_value': str(measurement.value) if measurement else None,
-            'unit': measurement.unit if measurement else threshold.unit,
-            'threshold_level': alert.level,
-            'threshold_level_display': alert.get_level_display(),
-            'threshold_exceeded': {
-                'warning_min': str(threshold.warning_min) if threshold.warning_min else None,
-                'warning_max': str(threshold.warning_max) if threshold.warning_max else None,
-                'critical_min': str(threshold.critical_min) if threshold.critical_min else None,
-                'critical_max': str(threshold.critical_max) if threshold.critical_max else None,
-            },
-            'alert_status': alert.status,
-            'alert_status_display': alert.get_status_display(),
-            'alert_title': alert.title,
-            'alert_message': alert.message,
-            'duration_minutes': alert.duration.total_seconds() / 60 if alert.status in ['resolved', 'dismissed'] else None
-        })
+        report_info, report_data = critical_events_report_data(get_access_scope(request), request.GET)
+    except ReportError as e:
+        return _report_error_response(e)
 
     serializer = CriticalEventsReportSerializer(report_data, many=True)
 
     return Response({
-        'report_info': {
-            'type': 'critical_events',
-            'date_from': date_from,
-            'date_to': date_to,
-            'station_filter': station_id,
-            'level_filter': level_filter,
-            'total_events': len(report_data)
-        },
+        'report_info': report_info,
         'results': serializer.data
     })
 
 
+@query_budget(8)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.comparative')
+@coalesce_requests()
 def comparative_report(request):
     """
     RF3.3: Reporte Comparativo entre Estaciones
@@ -859,178 +782,20 @@ def comparative_report(request):
     - stations: IDs de estaciones separados por coma (ej: 1,2,3)
     - measurement_type: Tipo de medición (water_level, flow_rate, temperature, ph)
     - aggregation: Tipo de agregación (daily, hourly - por defecto daily)
+    - percentiles: "true" o lista de percentiles (ej: 5,50,95) calculados
+      sobre las mediciones del período (opcional)
     """
-    # Validar parámetros requeridos
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    stations_param = request.GET.get('stations')
-    measurement_type = request.GET.get('measurement_type', 'water_level')
-    aggregation = request.GET.get('aggregation', 'daily')
-
-    if not date_from or not date_to or not stations_param:
-        return Response(
-            {'error': 'Los parámetros date_from, date_to y stations son requeridos'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    if aggregation not in ['daily', 'hourly']:
-        return Response(
-            {'error': 'aggregation debe ser "daily" o "hourly"'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
     try:
-        # Convertir fechas
-        date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
-        date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
+        report_info, report_data = comparative_report_data(get_access_scope(request), request.GET)
+    except ReportError as e:
+        return _report_error_response(e)
 
-        if date_from_obj > date_to_obj:
-            return Response(
-                {'error': 'La fecha_desde no puede ser mayor que fecha_hasta'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Parsear IDs de estaciones
-        station_ids = [int(id.strip()) for id in stations_param.split(',') if id.strip()]
-
-        if len(station_ids) < 2:
-            return Response(
-                {'error': 'Se requieren al menos 2 estaciones para el reporte comparativo'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-    except ValueError:
-        return Response(
-            {'error': 'Formato inválido en parámetros de fecha o IDs de estaciones'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Verificar permisos del usuario para las estaciones solicitadas
-    if request.user.role == UserRole.ADMIN:
-        accessible_stations = Station.objects.filter(id__in=station_ids, is_active=True)
-    else:
-        accessible_stations = request.user.assigned_stations.filter(
-            id__in=station_ids, is_active=True
-        )
-
-    accessible_station_ids = list(accessible_stations.values_list('id', flat=True))
-
-    if not accessible_station_ids:
-        return Response(
-            {'error': 'No tiene permisos para acceder a las estaciones solicitadas'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-
-    # Construir consulta base
-    queryset = Measurement.objects.filter(
-        station__id__in=accessible_station_ids,
-        measurement_type=measurement_type,
-        timestamp__date__gte=date_from_obj,
-        timestamp__date__lte=date_to_obj,
-        quality_flag='good'  # Solo mediciones de buena calidad
-    )
-
-    # Agregar según el tipo de agregación
-    if aggregation == 'daily':
-        date_trunc_sql = 'DATE(timestamp)'
-        time_format = '%Y-%m-%d'
-    else:  # hourly
-        date_trunc_sql = 'DATE_FORMAT(timestamp, "%Y-%m-%d %H:00:00")'
-        time_format = '%Y-%m-%d %H:00:00'
-
-    # Realizar agregación
-    comparative_data = queryset.extra(
-        select={'time_period': date_trunc_sql}
-    ).values(
-        'time_period', 'station__id', 'station__name', 'station__code', 'unit'
-    ).annotate(
-        avg_value=Avg('value'),
-        min_value=Min('value'),
-        max_value=Max('value'),
-        count_measurements=Count('id')
-    ).order_by('time_period', 'station__name')
-
-    # Formatear datos para el serializer ComparativeReportSerializer
-    # El serializer espera una estructura específica, creamos un objeto único con todos los datos
-
-    # Crear datos por estación
-    stations_data = []
-    global_stats = {
-        'total_measurements': 0,
-        'avg_value': 0,
-        'min_value': None,
-        'max_value': None
-    }
-
-    # Agrupar por estación
-    station_groups = {}
-    for data in comparative_data:
-        station_id = data['station__id']
-        if station_id not in station_groups:
-            station_groups[station_id] = {
-                'station_id': station_id,
-                'station_name': data['station__name'],
-                'station_code': data['station__code'],
-                'unit': data['unit'],
-                'data_points': [],
-                'statistics': {
-                    'count': 0,
-                    'avg': 0,
-                    'min': None,
-                    'max': None
-                }
-            }
-
-        # Agregar estadísticas de esta estación
-        station_stats = station_groups[station_id]['statistics']
-        station_stats['count'] += data['count_measurements']
-        if station_stats['avg'] == 0:
-            station_stats['avg'] = float(data['avg_value']) if data['avg_value'] else 0
-        if station_stats['min'] is None or (data['min_value'] and float(data['min_value']) < station_stats['min']):
-            station_stats['min'] = float(data['min_value']) if data['min_value'] else 0
-        if station_stats['max'] is None or (data['max_value'] and float(data['max_value']) > station_stats['max']):
-            station_stats['max'] = float(data['max_value']) if data['max_value'] else 0
-
-        # Actualizar estadísticas globales
-        global_stats['total_measurements'] += data['count_measurements']
-        if global_stats['min_value'] is None or (data['min_value'] and float(data['min_value']) < global_stats['min_value']):
-            global_stats['min_value'] = float(data['min_value']) if data['min_value'] else 0
-        if global_stats['max_value'] is None or (data['max_value'] and float(data['max_value']) > global_stats['max_value']):
-            global_stats['max_value'] = float(data['max_value']) if data['max_value'] else 0
-
-    # Convertir grupos a lista
-    for station_data in station_groups.values():
-        stations_data.append(station_data)
-
-    # Calcular promedio global
-    if stations_data:
-        total_avg = sum(station['statistics']['avg'] for station in stations_data)
-        global_stats['avg_value'] = total_avg / len(stations_data)
-
-    # Crear datos para el serializer
-    report_data = {
-        'measurement_type': measurement_type,
-        'measurement_type_display': dict(MeasurementType.choices).get(measurement_type, measurement_type),
-        'period_start': f"{date_from_obj}T00:00:00Z",
-        'period_end': f"{date_to_obj}T23:59:59Z",
-        'total_stations': len(accessible_stations),
-        'stations_data': stations_data,
-        'global_statistics': global_stats
-    }
-
-    serializer = ComparativeReportSerializer(report_data)
+    with span('serialize'):
+        results = ComparativeReportSerializer(report_data).data
 
     return Response({
-        'report_info': {
-            'type': 'comparative',
-            'date_from': date_from,
-            'date_to': date_to,
-            'measurement_type': measurement_type,
-            'aggregation': aggregation,
-            'stations_included': [{'id': s.id, 'name': s.name, 'code': s.code, 'location': s.location} for s in accessible_stations],
-            'total_records': len(comparative_data)
-        },
-        'results': serializer.data
+        'report_info': report_info,
+        'results': results
     })
 
 
@@ -1040,6 +805,7 @@ def comparative_report(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.export_pdf')
 def export_report_pdf(request):
     """
     Exporta reportes a PDF
@@ -1056,167 +822,21 @@ def export_report_pdf(request):
     - stations: IDs separados por coma (para comparative)
     - aggregation: daily/hourly (para comparative, opcional)
     """
-    report_type = request.GET.get('report_type')
-    if not report_type:
-        return Response(
-            {'error': 'El parámetro report_type es requerido'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Obtener datos del reporte según el tipo
-    if report_type == 'daily-averages':
-        response = daily_average_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    elif report_type == 'critical-events':
-        response = critical_events_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    elif report_type == 'comparative':
-        response = comparative_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    else:
-        return Response(
-            {'error': 'Tipo de reporte no válido. Use: daily-averages, critical-events, comparative'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Crear buffer para el PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Título del reporte
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1  # Center
-    )
-
-    report_titles = {
-        'daily-averages': 'Reporte de Promedios Diarios',
-        'critical-events': 'Reporte de Eventos Críticos',
-        'comparative': 'Reporte Comparativo entre Estaciones'
-    }
-
-    title = Paragraph(report_titles.get(report_type, 'Reporte'), title_style)
-    elements.append(title)
-
-    # Información del reporte
-    info_style = styles['Normal']
-    info_text = f"""
-    <b>Período:</b> {report_info.get('date_from', 'N/A')} - {report_info.get('date_to', 'N/A')}<br/>
-    <b>Tipo de Medición:</b> {report_info.get('measurement_type', 'N/A')}<br/>
-    <b>Total de Registros:</b> {report_info.get('total_records', 0)}<br/>
-    """
+    try:
+        buffer = build_report_pdf(request.user, request.GET)
+    except ReportError as e:
+        return _report_error_response(e)
 
-    if report_type == 'critical-events' and report_info.get('level_filter'):
-        info_text += f"<b>Nivel de Alerta:</b> {report_info['level_filter']}<br/>"
-
-    if report_info.get('station_filter'):
-        info_text += f"<b>Estación:</b> {report_info['station_filter']}<br/>"
-
-    elements.append(Paragraph(info_text, info_style))
-    elements.append(Spacer(1, 20))
-
-    # Crear tabla según el tipo de reporte
-    if report_type == 'daily-averages':
-        headers = ['Fecha', 'Estación', 'Código', 'Promedio', 'Mínimo', 'Máximo', 'Conteo', 'Unidad']
-        table_data = [headers]
-
-        for item in report_data:
-            row = [
-                str(item['date']),
-                item['station_name'],
-                item['station_code'],
-                f"{item['avg_value']:.2f}" if item['avg_value'] else 'N/A',
-                f"{item['min_value']:.2f}" if item['min_value'] else 'N/A',
-                f"{item['max_value']:.2f}" if item['max_value'] else 'N/A',
-                str(item['count']),
-                item['unit']
-            ]
-            table_data.append(row)
-
-    elif report_type == 'critical-events':
-        headers = ['Fecha/Hora', 'Estación', 'Tipo', 'Valor', 'Unidad', 'Nivel', 'Estado', 'Mensaje']
-        table_data = [headers]
-
-        for item in report_data:
-            row = [
-                item['timestamp'].strftime('%Y-%m-%d %H:%M') if hasattr(item['timestamp'], 'strftime') else str(item['timestamp']),
-                item['station_name'],
-                item['measurement_type_display'],
-                item['measured_value'] or 'N/A',
-                item['unit'],
-                item['threshold_level_display'],
-                item['alert_status_display'],
-                item['alert_message'][:50] + '...' if len(item['alert_message']) > 50 else item['alert_message']
-            ]
-            table_data.append(row)
-
-    elif report_type == 'comparative':
-        # Para reporte comparativo, mostrar estadísticas por estación
-        headers = ['Estación', 'Código', 'Conteo Total', 'Promedio', 'Mínimo', 'Máximo', 'Unidad']
-        table_data = [headers]
-
-        for station in report_data['stations_data']:
-            stats = station['statistics']
-            row = [
-                station['station_name'],
-                station['station_code'],
-                str(stats['count']),
-                f"{stats['avg']:.2f}" if stats['avg'] else 'N/A',
-                f"{stats['min']:.2f}" if stats['min'] is not None else 'N/A',
-                f"{stats['max']:.2f}" if stats['max'] is not None else 'N/A',
-                station['unit']
-            ]
-            table_data.append(row)
-
-    # Crear tabla
-    table = Table(table_data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-    ]))
-
-    elements.append(table)
-
-    # Generar PDF
-    doc.build(elements)
-
-    # Preparar respuesta
-    buffer.seek(0)
     response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{datetime.date.today()}.pdf"'
-
+    response['Content-Disposition'] = (
+        f'attachment; filename="{report_filename(request.GET["report_type"], "pdf")}"'
+    )
     return response
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@traced('report.export_excel')
 def export_report_excel(request):
     """
     Exporta reportes a Excel
@@ -1224,172 +844,109 @@ def export_report_excel(request):
     Endpoint: GET /api/measurements/reports/export/excel/
 
     Parámetros: Mismos que export_report_pdf
+
+    El libro se genera en modo streaming (openpyxl write-only) y las filas se
+    leen por bloques desde la base de datos, de modo que la memoria usada no
+    crece con el tamaño del reporte.
+    """
+    try:
+        output = build_report_excel(request.user, request.GET)
+    except ReportError as e:
+        return _report_error_response(e)
+
+    return excel_report_response(report_filename(request.GET['report_type'], 'xlsx'), output)
+
+
+# ===================================================================
+# TRABAJOS ASÍNCRONOS DE REPORTES (PDF/Excel)
+# ===================================================================
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def report_jobs(request):
+    """
+    Solicitud asíncrona de reportes PDF/Excel
+
+    Endpoint: /api/measurements/reports/jobs/
+
+    GET: últimos trabajos del usuario
+
+    POST: registra un trabajo de generación
+    - report_type: daily-averages, critical-events, comparative
+    - file_format: pdf (por defecto) o excel
+    - params: mismos parámetros que reports/export/pdf/
+
+    Si ya existe un archivo vigente para los mismos parámetros la respuesta
+    es inmediata (200, status=completed); en otro caso se retorna 202 y el
+    estado se consulta en reports/jobs/<id>/.
     """
-    report_type = request.GET.get('report_type')
-    if not report_type:
+    if request.method == 'GET':
+        jobs = ReportJob.objects.filter(user=request.user)[:50]
+        serializer = ReportJobSerializer(jobs, many=True, context={'request': request})
+        return Response({'results': serializer.data})
+
+    serializer = ReportJobCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    job = submit_report_job(
+        request.user,
+        serializer.validated_data['report_type'],
+        serializer.validated_data['file_format'],
+        serializer.validated_data['params']
+    )
+
+    job.refresh_from_db()
+    response_status = status.HTTP_200_OK if job.status == ReportJobStatus.COMPLETED else status.HTTP_202_ACCEPTED
+    return Response(
+        ReportJobSerializer(job, context={'request': request}).data,
+        status=response_status
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_detail(request, job_id):
+    """
+    Estado de un trabajo de reporte
+
+    Endpoint: GET /api/measurements/reports/jobs/<id>/
+
+    Un trabajo sin avance durante REPORT_JOBS_STALE_AFTER segundos se
+    recupera antes de responder (se vuelve a encolar o se marca fallido).
+    """
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+    if job.status in (ReportJobStatus.PENDING, ReportJobStatus.RUNNING):
+        recover_stale_report_jobs(ReportJob.objects.filter(pk=job.pk))
+        job.refresh_from_db()
+    return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_download(request, job_id):
+    """
+    Descarga del archivo de un trabajo completado
+
+    Endpoint: GET /api/measurements/reports/jobs/<id>/download/
+    """
+    job = get_object_or_404(ReportJob, pk=job_id, user=request.user)
+
+    if job.status != ReportJobStatus.COMPLETED:
         return Response(
-            {'error': 'El parámetro report_type es requerido'},
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': f'El reporte no está disponible (estado: {job.get_status_display()})'},
+            status=status.HTTP_409_CONFLICT
         )
 
-    # Obtener datos del reporte según el tipo (mismo código que PDF)
-    if report_type == 'daily-averages':
-        response = daily_average_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    elif report_type == 'critical-events':
-        response = critical_events_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    elif report_type == 'comparative':
-        response = comparative_report(request._request)
-        if response.status_code != 200:
-            return response
-        data = response.data
-        report_data = data['results']
-        report_info = data['report_info']
-
-    else:
+    path = artifact_path(job)
+    if not os.path.exists(path):
         return Response(
-            {'error': 'Tipo de reporte no válido. Use: daily-averages, critical-events, comparative'},
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': 'El archivo del reporte expiró. Solicite el reporte nuevamente'},
+            status=status.HTTP_410_GONE
         )
 
-    # Crear workbook de Excel
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = report_type.replace('-', '_').title()
-
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Título del reporte
-    report_titles = {
-        'daily-averages': 'Reporte de Promedios Diarios',
-        'critical-events': 'Reporte de Eventos Críticos',
-        'comparative': 'Reporte Comparativo entre Estaciones'
-    }
-
-    ws['A1'] = report_titles.get(report_type, 'Reporte')
-    ws['A1'].font = Font(size=14, bold=True)
-    ws.merge_cells('A1:H1')
-
-    # Información del reporte
-    row = 3
-    ws[f'A{row}'] = f'Período: {report_info.get("date_from", "N/A")} - {report_info.get("date_to", "N/A")}'
-    row += 1
-    ws[f'A{row}'] = f'Tipo de Medición: {report_info.get("measurement_type", "N/A")}'
-    row += 1
-    ws[f'A{row}'] = f'Total de Registros: {report_info.get("total_records", 0)}'
-    row += 1
-
-    if report_type == 'critical-events' and report_info.get('level_filter'):
-        ws[f'A{row}'] = f'Nivel de Alerta: {report_info["level_filter"]}'
-        row += 1
-
-    if report_info.get('station_filter'):
-        ws[f'A{row}'] = f'Estación: {report_info["station_filter"]}'
-        row += 1
-
-    # Espacio
-    row += 2
-
-    # Headers y datos según tipo de reporte
-    if report_type == 'daily-averages':
-        headers = ['Fecha', 'Estación', 'Código', 'Promedio', 'Mínimo', 'Máximo', 'Conteo', 'Unidad']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center')
-
-        row += 1
-
-        for item in report_data:
-            ws.cell(row=row, column=1, value=str(item['date']))
-            ws.cell(row=row, column=2, value=item['station_name'])
-            ws.cell(row=row, column=3, value=item['station_code'])
-            ws.cell(row=row, column=4, value=round(item['avg_value'], 2) if item['avg_value'] else None)
-            ws.cell(row=row, column=5, value=round(item['min_value'], 2) if item['min_value'] else None)
-            ws.cell(row=row, column=6, value=round(item['max_value'], 2) if item['max_value'] else None)
-            ws.cell(row=row, column=7, value=item['count'])
-            ws.cell(row=row, column=8, value=item['unit'])
-            row += 1
-
-    elif report_type == 'critical-events':
-        headers = ['Fecha/Hora', 'Estación', 'Tipo', 'Valor', 'Unidad', 'Nivel', 'Estado', 'Mensaje']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center')
-
-        row += 1
-
-        for item in report_data:
-            timestamp = item['timestamp']
-            if hasattr(timestamp, 'strftime'):
-                timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M')
-            else:
-                timestamp_str = str(timestamp)
-
-            ws.cell(row=row, column=1, value=timestamp_str)
-            ws.cell(row=row, column=2, value=item['station_name'])
-            ws.cell(row=row, column=3, value=item['measurement_type_display'])
-            ws.cell(row=row, column=4, value=item['measured_value'] or 'N/A')
-            ws.cell(row=row, column=5, value=item['unit'])
-            ws.cell(row=row, column=6, value=item['threshold_level_display'])
-            ws.cell(row=row, column=7, value=item['alert_status_display'])
-            ws.cell(row=row, column=8, value=item['alert_message'])
-            row += 1
-
-    elif report_type == 'comparative':
-        headers = ['Estación', 'Código', 'Conteo Total', 'Promedio', 'Mínimo', 'Máximo', 'Unidad']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center')
-
-        row += 1
-
-        for station in report_data['stations_data']:
-            stats = station['statistics']
-            ws.cell(row=row, column=1, value=station['station_name'])
-            ws.cell(row=row, column=2, value=station['station_code'])
-            ws.cell(row=row, column=3, value=stats['count'])
-            ws.cell(row=row, column=4, value=round(stats['avg'], 2) if stats['avg'] else None)
-            ws.cell(row=row, column=5, value=round(stats['min'], 2) if stats['min'] is not None else None)
-            ws.cell(row=row, column=6, value=round(stats['max'], 2) if stats['max'] is not None else None)
-            ws.cell(row=row, column=7, value=station['unit'])
-            row += 1
-
-    # Ajustar ancho de columnas
-    for col in range(1, 9):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
-
-    # Crear respuesta
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=artifact_filename(job),
+        content_type=artifact_content_type(job)
     )
-    response['Content-Disposition'] = f'attachment; filename="{report_type}_report_{datetime.date.today()}.xlsx"'
-
-    return response
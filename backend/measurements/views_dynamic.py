@@ -5,7 +5,6 @@ Implementación de arquitectura escalable y gestión modular
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Q, Avg, Max
 from django.utils import timezone
-from django.db import transaction
 from datetime import timedelta
 
 from rest_framework import generics, status, filters
@@ -16,6 +15,9 @@ from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 import django_filters
 
+from rioclaro_api.admission import admission_controlled, ingest_admission
+from rioclaro_api.query_budget import query_budget
+from rioclaro_api.tracing import span, traced
 from .models_dynamic import (
     SensorTypeCategory,
     DynamicSensorType,
@@ -23,6 +25,8 @@ from .models_dynamic import (
     ModuleAccess,
     ExtensibleMeasurement
 )
+from .queries import latest_per_group
+from .pagination import SelectablePagination
 from .serializers_dynamic import (
     SensorTypeCategorySerializer,
     DynamicSensorTypeSerializer,
@@ -92,6 +96,7 @@ class DynamicSensorTypeViewSet(ModelViewSet):
     Permite crear, modificar y gestionar nuevos tipos de sensores
     """
     queryset = DynamicSensorType.objects.select_related('category').all()
+    query_budget = {'usage_stats': 5}
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = DynamicSensorTypeFilter
@@ -159,24 +164,34 @@ class DynamicSensorTypeViewSet(ModelViewSet):
         """Estadísticas de uso de tipos de sensores"""
         stats_data = []
         sensor_types = DynamicSensorType.objects.filter(is_active=True)
+        thirty_days_ago = timezone.now() - timedelta(days=30)
+
+        # Una sola consulta agrupada por tipo en lugar de cinco por tipo
+        usage = {
+            row['sensor_type']: row
+            for row in ExtensibleMeasurement.objects.filter(
+                sensor_type__in=sensor_types
+            ).order_by().values('sensor_type').annotate(
+                total=Count('id'),
+                stations=Count('station', distinct=True),
+                last_timestamp=Max('timestamp'),
+                recent=Count('id', filter=Q(timestamp__gte=thirty_days_ago))
+            )
+        }
 
         for sensor_type in sensor_types:
-            measurements = ExtensibleMeasurement.objects.filter(sensor_type=sensor_type)
-            total_measurements = measurements.count()
-            active_stations = measurements.values('station').distinct().count()
-            last_measurement = measurements.order_by('-timestamp').first()
+            row = usage.get(sensor_type.id, {})
 
             # Calcular promedio diario (últimos 30 días)
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            recent_measurements = measurements.filter(timestamp__gte=thirty_days_ago).count()
+            recent_measurements = row.get('recent', 0)
             avg_daily = recent_measurements / 30.0 if recent_measurements > 0 else 0
 
             stats_data.append({
                 'sensor_type_id': sensor_type.id,
                 'sensor_type_name': sensor_type.name,
-                'total_measurements': total_measurements,
-                'active_stations': active_stations,
-                'last_measurement': last_measurement.timestamp if last_measurement else None,
+                'total_measurements': row.get('total', 0),
+                'active_stations': row.get('stations', 0),
+                'last_measurement': row.get('last_timestamp'),
                 'avg_daily_measurements': round(avg_daily, 2)
             })
 
@@ -304,6 +319,15 @@ class ExtensibleMeasurementFilter(django_filters.FilterSet):
         fields = ['sensor_type', 'station', 'quality_flag']
 
 
+class ExtensibleMeasurementPagination(SelectablePagination):
+    """
+    Paginación de mediciones extensibles
+
+    Admite ?pagination=cursor para paginación keyset sobre (timestamp, id)
+    """
+    page_size = 20
+
+
 class ExtensibleMeasurementViewSet(ModelViewSet):
     """
     RF4.1 - ViewSet para mediciones de sensores dinámicos
@@ -317,6 +341,7 @@ class ExtensibleMeasurementViewSet(ModelViewSet):
     filterset_class = ExtensibleMeasurementFilter
     ordering_fields = ['timestamp', 'value']
     ordering = ['-timestamp']
+    pagination_class = ExtensibleMeasurementPagination
 
     def get_serializer_class(self):
         """Usa serializers diferentes según la acción"""
@@ -324,16 +349,37 @@ class ExtensibleMeasurementViewSet(ModelViewSet):
             return ExtensibleMeasurementCreateSerializer
         return ExtensibleMeasurementSerializer
 
+    @traced('extensible_measurement.create')
+    @admission_controlled(ingest_admission)
+    def create(self, request, *args, **kwargs):
+        """Ingesta de una medición, sujeta al control de admisión"""
+        with span('parse'):
+            data = request.data
+        serializer = self.get_serializer(data=data)
+        with span('validate'):
+            serializer.is_valid(raise_exception=True)
+        with span('save'):
+            self.perform_create(serializer)
+        with span('serialize'):
+            response_data = serializer.data
+        headers = self.get_success_headers(response_data)
+        return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
+
     @action(detail=False, methods=['post'])
+    @traced('extensible_measurement.bulk_create')
+    @admission_controlled(ingest_admission)
     def bulk_create(self, request):
         """Crear múltiples mediciones en lote"""
+        with span('parse'):
+            data = request.data
         serializer = BatchExtensibleMeasurementSerializer(
-            data=request.data,
+            data=data,
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
+        with span('validate'):
+            serializer.is_valid(raise_exception=True)
 
-        with transaction.atomic():
+        with span('save'):
             measurements = serializer.save()
 
         return Response({
@@ -375,17 +421,14 @@ class ExtensibleMeasurementViewSet(ModelViewSet):
             )
 
         # Obtener la última medición de cada tipo de sensor para la estación
-        latest_measurements = []
-        sensor_types = DynamicSensorType.objects.filter(is_active=True)
-
-        for sensor_type in sensor_types:
-            latest = ExtensibleMeasurement.objects.filter(
-                sensor_type=sensor_type,
-                station_id=station_id
-            ).order_by('-timestamp').first()
-
-            if latest:
-                latest_measurements.append(latest)
+        # (una sola consulta para todos los tipos)
+        latest_measurements = latest_per_group(
+            self.get_queryset().filter(
+                station_id=station_id,
+                sensor_type__is_active=True
+            ),
+            group_by=('sensor_type',)
+        )
 
         serializer = self.get_serializer(latest_measurements, many=True)
         return Response(serializer.data)
@@ -423,18 +466,28 @@ def system_modules_overview(request):
     return Response(overview)
 
 
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sensor_ecosystem_overview(request):
     """
     RF4.1 - Vista general del ecosistema de sensores
     """
-    categories = SensorTypeCategory.objects.filter(is_active=True)
-    sensor_types = DynamicSensorType.objects.filter(is_active=True)
+    categories = list(SensorTypeCategory.objects.filter(is_active=True))
+    sensor_types = list(DynamicSensorType.objects.filter(is_active=True))
+
+    # Conteo de mediciones por tipo activo en una consulta agrupada
+    counts_by_type = dict(
+        ExtensibleMeasurement.objects.filter(
+            sensor_type__is_active=True
+        ).order_by().values('sensor_type').annotate(
+            count=Count('id')
+        ).values_list('sensor_type', 'count')
+    )
 
     overview = {
-        'total_categories': categories.count(),
-        'total_sensor_types': sensor_types.count(),
+        'total_categories': len(categories),
+        'total_sensor_types': len(sensor_types),
         'total_measurements': ExtensibleMeasurement.objects.count(),
         'categories_breakdown': [],
         'measurement_distribution': {}
@@ -442,22 +495,19 @@ def sensor_ecosystem_overview(request):
 
     # Desglose por categorías
     for category in categories:
-        category_sensors = sensor_types.filter(category=category)
-        category_measurements = ExtensibleMeasurement.objects.filter(
-            sensor_type__in=category_sensors
-        ).count()
+        category_sensors = [
+            sensor_type for sensor_type in sensor_types
+            if sensor_type.category_id == category.id
+        ]
 
         overview['categories_breakdown'].append({
             'category': category.name,
-            'sensor_types': category_sensors.count(),
-            'measurements': category_measurements
+            'sensor_types': len(category_sensors),
+            'measurements': sum(counts_by_type.get(sensor_type.id, 0) for sensor_type in category_sensors)
         })
 
     # Distribución de mediciones por tipo de sensor
     for sensor_type in sensor_types:
-        measurement_count = ExtensibleMeasurement.objects.filter(
-            sensor_type=sensor_type
-        ).count()
-        overview['measurement_distribution'][sensor_type.name] = measurement_count
+        overview['measurement_distribution'][sensor_type.name] = counts_by_type.get(sensor_type.id, 0)
 
     return Response(overview)
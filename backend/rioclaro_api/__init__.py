@@ -12,3 +12,11 @@ try:
 except Exception:
     # PyMySQL is optional and not needed when using sqlite (e.g. tests/dev).
     pass
+
+try:
+    from .celery import app as celery_app
+
+    __all__ = ('celery_app',)
+except ImportError:
+    # Celery is optional: without it report jobs run in an in-process pool.
+    pass
@@ -0,0 +1,145 @@
+"""
+Accessible-station scope of a user, resolved once per request.
+
+Administrators may read every station; everyone else only the stations
+assigned to them (StationAssignment). get_access_scope(request) resolves that
+set once and memoizes it on the request, so views, serializers and cache keys
+share the result instead of querying the assignments again:
+
+    scope = get_access_scope(request)
+    queryset = scope.filter(Alert.objects.all())            # station__in=...
+    queryset = scope.filter(Alert.objects.all(), 'measurement__station')
+    if not scope.can_access(station.id): ...
+
+The assigned station ids are also kept in the shared cache per user
+(ACCESS_SCOPE_CACHE_TTL seconds, default 600) and invalidated when a
+StationAssignment is saved or deleted (stations.signals).
+
+Cached responses of permission-filtered endpoints depend on the station set,
+not on who the caller is, so AccessScope.key identifies the set:
+
+- admin            administrators (all stations)
+- anon             anonymous requests
+- stations:<hash>  everyone else, hashed from the sorted assigned station ids
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from users.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+
+ADMIN_SCOPE = 'admin'
+ANONYMOUS_SCOPE = 'anon'
+
+_REQUEST_ATTRIBUTE = '_access_scope'
+
+
+class AccessScope:
+    """Set of stations a user may read."""
+
+    def __init__(self, is_admin=False, station_ids=(), authenticated=True):
+        self.is_admin = is_admin
+        self.station_ids = frozenset(station_ids)
+        self.authenticated = authenticated
+
+    @property
+    def key(self):
+        """Short key identifying the station set, for cache keys."""
+        if not self.authenticated:
+            return ANONYMOUS_SCOPE
+        if self.is_admin:
+            return ADMIN_SCOPE
+        station_ids = ','.join(str(station_id) for station_id in sorted(self.station_ids))
+        return f"stations:{hashlib.sha256(station_ids.encode()).hexdigest()[:16]}"
+
+    def can_access(self, station_id):
+        if self.is_admin:
+            return True
+        try:
+            return int(station_id) in self.station_ids
+        except (TypeError, ValueError):
+            return False
+
+    def q(self, field='station'):
+        """Q object restricting field (a station foreign key path) to the scope."""
+        if self.is_admin:
+            return Q()
+        return Q(**{f'{field}__in': sorted(self.station_ids)})
+
+    def filter(self, queryset, field='station'):
+        """Restrict a queryset to the scope through the given station field."""
+        if self.is_admin:
+            return queryset
+        return queryset.filter(self.q(field))
+
+    def stations(self, queryset=None):
+        """Stations in the scope (Station.objects by default)."""
+        if queryset is None:
+            from stations.models import Station
+            queryset = Station.objects.all()
+        if self.is_admin:
+            return queryset
+        return queryset.filter(id__in=sorted(self.station_ids))
+
+
+def scope_cache_key(user_id):
+    return f'access_scope:user:{user_id}'
+
+
+def resolve_access_scope(user):
+    """Resolve the scope of a user (shared cache, then database)."""
+    if not user.is_authenticated:
+        return AccessScope(authenticated=False)
+    if user.role == UserRole.ADMIN:
+        return AccessScope(is_admin=True)
+
+    key = scope_cache_key(user.pk)
+    try:
+        station_ids = cache.get(key)
+    except Exception as e:
+        logger.error(f"Failed to read access scope of user {user.pk}: {e}")
+        station_ids = None
+
+    if station_ids is None:
+        station_ids = sorted(user.assigned_stations.values_list('id', flat=True))
+        try:
+            cache.set(key, station_ids, getattr(settings, 'ACCESS_SCOPE_CACHE_TTL', 600))
+        except Exception as e:
+            logger.error(f"Failed to cache access scope of user {user.pk}: {e}")
+
+    return AccessScope(station_ids=station_ids)
+
+
+def get_access_scope(request):
+    """Scope of request.user, resolved once per request."""
+    # Stored on the Django request so DRF and plain requests share it
+    http_request = getattr(request, '_request', request)
+    user = request.user
+
+    memo = getattr(http_request, _REQUEST_ATTRIBUTE, None)
+    if memo is not None and memo[0] == user.pk:
+        return memo[1]
+
+    scope = resolve_access_scope(user)
+    setattr(http_request, _REQUEST_ATTRIBUTE, (user.pk, scope))
+    return scope
+
+
+def station_scope_key(request):
+    """AccessScope.key of the request's user."""
+    return get_access_scope(request).key
+
+
+def invalidate_access_scope(user_id):
+    """Drop the cached station ids of a user (after assignment changes)."""
+    try:
+        cache.delete(scope_cache_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to invalidate access scope of user {user_id}: {e}")
@@ -0,0 +1,156 @@
+"""
+Admission control for ingest endpoints.
+
+Rate limits cap what a client may send; admission control caps what the
+backend accepts at once, based on its own capacity. Each worker process runs
+at most INGEST_MAX_IN_FLIGHT ingest requests concurrently (default 4). Up to
+INGEST_MAX_QUEUE further requests (default 16) wait up to
+INGEST_QUEUE_TIMEOUT seconds (default 2.0) for a slot. When the queue is full
+or the wait times out, the request is rejected with 429 and a Retry-After
+estimated from the queue depth and the recent service time, so devices back
+off for about as long as the backlog needs to drain.
+
+    @api_view(['POST'])
+    @permission_classes([IsAuthenticated])
+    @admission_controlled(ingest_admission)
+    def batch_create_measurements(request):
+        ...
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+from .metrics import ADMISSION_REJECTED, ADMISSION_SERVICE_TIME
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, time-limited wait queue."""
+
+    def __init__(self, name, capacity=None, max_queue=None, queue_timeout=None, initial_service_time=0.5):
+        self.name = name
+        self._capacity = capacity
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Exponentially weighted moving average of the service time (seconds)
+        self.service_time = initial_service_time
+
+    @property
+    def capacity(self):
+        if self._capacity is not None:
+            return self._capacity
+        return getattr(settings, 'INGEST_MAX_IN_FLIGHT', 4)
+
+    @property
+    def max_queue(self):
+        if self._max_queue is not None:
+            return self._max_queue
+        return getattr(settings, 'INGEST_MAX_QUEUE', 16)
+
+    @property
+    def queue_timeout(self):
+        if self._queue_timeout is not None:
+            return self._queue_timeout
+        return getattr(settings, 'INGEST_QUEUE_TIMEOUT', 2.0)
+
+    def acquire(self):
+        """Take a slot; return None when admitted or the Retry-After in seconds."""
+        with self._condition:
+            if self.in_flight < self.capacity:
+                return self._admit()
+
+            if self.waiting >= self.max_queue:
+                return self._reject()
+
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.in_flight >= self.capacity:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._reject()
+                    self._condition.wait(remaining)
+                return self._admit()
+            finally:
+                self.waiting -= 1
+
+    def release(self, duration):
+        with self._condition:
+            self.in_flight -= 1
+            self.service_time = 0.8 * self.service_time + 0.2 * duration
+            self._condition.notify()
+        ADMISSION_SERVICE_TIME.observe(duration, controller=self.name)
+
+    @contextmanager
+    def admit(self):
+        """Run the block inside a slot; raise Throttled (429) when overloaded."""
+        with span('admission.wait') as current:
+            retry_after = self.acquire()
+            current.set_attribute('admitted', retry_after is None)
+        if retry_after is not None:
+            raise Throttled(wait=retry_after, detail='Servidor con carga máxima de ingesta, reintente más tarde')
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def retry_after(self):
+        """Seconds for the current backlog to drain at the current service time."""
+        backlog = self.in_flight + self.waiting + 1
+        return max(1, math.ceil(backlog / max(self.capacity, 1) * self.service_time))
+
+    def stats(self):
+        with self._condition:
+            return {
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'service_time': round(self.service_time, 4),
+            }
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        return None
+
+    def _reject(self):
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(controller=self.name)
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Admission rejected for {self.name}: {self.in_flight} in flight, "
+            f"{self.waiting} waiting, retry after {retry_after}s"
+        )
+        return retry_after
+
+
+def admission_controlled(controller):
+    """Decorator running a view (function or method) inside controller.admit()."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with controller.admit():
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+ingest_admission = AdmissionController('ingest')
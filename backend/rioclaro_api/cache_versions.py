@@ -0,0 +1,127 @@
+"""
+Generation counters for cache namespace invalidation.
+
+Cached entries fold the current version of the namespaces they depend on
+into their key. A write bumps the namespace version with a single atomic
+incr, so every key built from the previous version becomes unreachable and
+the old entries just age out. No key scanning is needed, which keeps this
+working on every cache backend (locmem, Redis, memcached).
+
+Namespaces:
+- measurements              any measurement write
+- measurements:station:<id> measurement writes for one station
+- thresholds
+- alerts
+
+Versions are bumped after the transaction commits; bumping earlier would let
+a concurrent reader cache pre-commit data under the new version.
+
+Each process keeps the versions it read for CACHE_VERSION_LOCAL_TTL seconds
+(default 1), so polling requests do not pay a shared-cache round trip per
+request. A write in another worker becomes visible after at most that delay;
+writes in the same process are visible immediately.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .request_timing import timed_stage
+from .tiered_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+
+VERSION_KEY_PREFIX = 'cache_version'
+
+MEASUREMENTS_NAMESPACE = 'measurements'
+THRESHOLDS_NAMESPACE = 'thresholds'
+ALERTS_NAMESPACE = 'alerts'
+
+_local_versions = LocalCache(max_entries=getattr(settings, 'CACHE_VERSION_LOCAL_MAX_ENTRIES', 1000))
+
+
+def station_namespace(station_id):
+    """Namespace of the measurements of one station."""
+    return f'{MEASUREMENTS_NAMESPACE}:station:{station_id}'
+
+
+def measurement_namespaces(station_ids):
+    """Namespaces touched by measurement writes on the given stations."""
+    return [MEASUREMENTS_NAMESPACE] + [station_namespace(station_id) for station_id in sorted(set(station_ids))]
+
+
+def version_key(namespace):
+    return f'{VERSION_KEY_PREFIX}:{namespace}'
+
+
+def _initial_version():
+    # A counter lost to eviction restarts above any value it is likely to
+    # have reached, so keys from the old generation are not reused.
+    return time.time_ns() // 1_000_000
+
+
+def get_versions(namespaces):
+    """
+    Return {namespace: version}.
+
+    Versions come from the process-local copy or from one get_many round
+    trip. A namespace with no version yet costs one more add; a get follows
+    only when another process created that version first.
+    """
+    keys = {version_key(namespace): namespace for namespace in namespaces}
+    if not keys:
+        return {}
+
+    found = {}
+    for key in keys:
+        hit, version = _local_versions.get(key)
+        if hit:
+            found[key] = version
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        try:
+            with timed_stage('cache'):
+                shared = cache.get_many(missing)
+                for key in missing:
+                    if key not in shared:
+                        version = _initial_version()
+                        if cache.add(key, version, None):
+                            shared[key] = version
+                        else:
+                            shared[key] = cache.get(key, 0)
+        except Exception as e:
+            logger.error(f"Failed to read cache versions: {e}")
+            return {namespace: 0 for namespace in namespaces}
+
+        local_ttl = getattr(settings, 'CACHE_VERSION_LOCAL_TTL', 1)
+        for key in missing:
+            _local_versions.set(key, shared[key], local_ttl)
+            found[key] = shared[key]
+
+    return {namespace: found[key] for key, namespace in keys.items()}
+
+
+def bump_versions(*namespaces):
+    """Invalidate every cached entry built from these namespaces."""
+    for namespace in namespaces:
+        key = version_key(namespace)
+        _local_versions.delete(key)
+        try:
+            with timed_stage('cache'):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    # Counter not set yet (or evicted): start a new generation
+                    cache.add(key, _initial_version(), None)
+        except Exception as e:
+            logger.error(f"Failed to bump cache version {namespace}: {e}")
+
+
+def bump_versions_on_commit(*namespaces):
+    """Bump the namespace versions once the current transaction commits."""
+    transaction.on_commit(lambda: bump_versions(*namespaces))
@@ -0,0 +1,18 @@
+"""
+Celery application for background jobs (report generation).
+
+Configuration is read from the Django settings (CELERY_* keys).
+Start a worker with:
+
+    celery -A rioclaro_api worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rioclaro_api.settings')
+
+app = Celery('rioclaro_api')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,142 @@
+"""
+Single-flight request coalescing for expensive read-only function views.
+
+Concurrent identical requests (same view, same normalized query parameters
+and same station permission scope) share one computation: the first request
+runs the view, the others wait for it and answer with a copy of its result.
+
+- In-process: followers wait on a threading.Event of the in-flight call
+  (COALESCE_WAIT_TIMEOUT seconds, then they run the view themselves).
+- Cross-process (optional, cross_process=True or COALESCE_CROSS_PROCESS):
+  the in-process leader goes through the two-tier cache lock, so only one
+  worker in the deployment computes the result; it is kept for
+  COALESCE_RESULT_TTL seconds so requests arriving during the computation
+  in other workers pick it up.
+
+Usage (below the DRF decorators, so it wraps the plain view function):
+
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticated])
+    @coalesce_requests()
+    def measurement_statistics(request):
+        ...
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .access_scope import station_scope_key
+from .tiered_cache import tiered_cache
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight computation and its outcome."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time inside this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, compute, timeout):
+        """
+        Return (result, shared). Followers get the leader's result; if the
+        leader fails or takes longer than timeout they compute on their own.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.event.wait(timeout) and not call.failed:
+                return call.result, True
+            return compute(), False
+
+        try:
+            call.result = compute()
+            return call.result, False
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+_single_flight = SingleFlight()
+
+
+def coalescing_key(view_name, request, scope):
+    """Hash of the view, the normalized query parameters and the permission scope."""
+    query = request.GET
+    # RequestSanitizationMiddleware replaces the QueryDict with a plain dict
+    if hasattr(query, 'getlist'):
+        params = sorted((name, query.getlist(name)) for name in query)
+    else:
+        params = sorted((name, [value]) for name, value in query.items())
+    payload = json.dumps([view_name, request.method, params, scope], separators=(',', ':'), default=str)
+    return f"coalesce:{view_name}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def coalesce_requests(cross_process=None, scope=station_scope_key):
+    """
+    Decorator for read-only function views. Only GET/HEAD requests of
+    authenticated users are coalesced; everything else runs normally.
+    """
+    def decorator(view):
+        view_name = f"{view.__module__}.{view.__name__}"
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            # A profiled request must do the work itself (rioclaro_api.profiling)
+            if getattr(request, '_profiling', False):
+                return view(request, *args, **kwargs)
+
+            key = coalescing_key(view_name, request, scope(request) if scope else None)
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                return {'status': response.status_code, 'data': response.data}
+
+            use_cache = cross_process
+            if use_cache is None:
+                use_cache = getattr(settings, 'COALESCE_CROSS_PROCESS', False)
+
+            if use_cache:
+                def run():
+                    return tiered_cache.get_or_set(
+                        key, compute,
+                        getattr(settings, 'COALESCE_RESULT_TTL', 2),
+                        namespace='coalesce',
+                    )
+            else:
+                run = compute
+
+            result, shared = _single_flight.do(key, run, getattr(settings, 'COALESCE_WAIT_TIMEOUT', 30))
+            if shared:
+                logger.debug(f"Coalesced request to {view_name}")
+            return Response(result['data'], status=result['status'])
+
+        return wrapper
+
+    return decorator
@@ -11,6 +11,7 @@ from datetime import timedelta
 
 from stations.models import Station
 from measurements.models import Measurement, Alert
+from measurements.queries import latest_per_group
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -76,20 +77,22 @@ class Command(BaseCommand):
 
         stations = Station.objects.filter(is_active=True)
 
-        for station in stations:
-            latest_measurement = Measurement.objects.filter(
-                station=station
-            ).select_related('station', 'sensor').order_by('-timestamp').first()
-
-            if latest_measurement:
-                cache_key = f"latest_measurement_station_{station.id}"
-                cache.set(cache_key, {
-                    'id': latest_measurement.id,
-                    'value': str(latest_measurement.value),
-                    'timestamp': latest_measurement.timestamp.isoformat(),
-                    'measurement_type': latest_measurement.measurement_type,
-                    'station_name': station.name,
-                }, 120)  # 2 minutes
+        # Single query: latest row per station
+        latest_measurements = latest_per_group(
+            Measurement.objects.filter(station__in=stations).select_related('station'),
+            group_by=('station',)
+        )
+
+        cache.set_many({
+            f"latest_measurement_station_{latest_measurement.station_id}": {
+                'id': latest_measurement.id,
+                'value': str(latest_measurement.value),
+                'timestamp': latest_measurement.timestamp.isoformat(),
+                'measurement_type': latest_measurement.measurement_type,
+                'station_name': latest_measurement.station.name,
+            }
+            for latest_measurement in latest_measurements
+        }, 120)  # 2 minutes
 
         if verbose:
             self.stdout.write(f'  Cached latest measurements for {stations.count()} stations')
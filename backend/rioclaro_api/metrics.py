@@ -0,0 +1,312 @@
+"""
+Application metrics with Prometheus text exposition.
+
+Counters and histograms live in process memory: recording a value is a dict
+update under a lock, with no database or cache round trip. GET /metrics/
+renders them in the Prometheus text format (version 0.0.4), so a 15 second
+scrape interval costs one pass over the registry instead of table counts.
+
+Each gunicorn worker has its own registry. When METRICS_MULTIPROCESS_DIR is
+set, every process writes its snapshot to a JSON file in that directory at
+most every METRICS_FLUSH_INTERVAL seconds (default 5) and at exit, and the
+scrape sums the files of all workers. Files of exited workers are kept so
+counters never go backwards; clear the directory when the service starts,
+as with prometheus_client's multiprocess mode.
+
+    from rioclaro_api.metrics import MEASUREMENTS_INGESTED
+
+    MEASUREMENTS_INGESTED.inc(len(created), source='batch')
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """Base class: one named family of series keyed by label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or registry_default
+        self.registry.register(self)
+
+    def _series(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """Monotonic counter."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('counters can only increase')
+        series = self._series(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            values[series] = values.get(series, 0) + amount
+        self.registry.maybe_flush()
+
+    def inc_on_commit(self, amount=1, **labels):
+        """Increment once the current transaction commits (immediately outside one)."""
+        transaction.on_commit(lambda: self.inc(amount, **labels))
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed upper bounds."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        series = self._series(labels)
+        # Per-bucket (non cumulative) counts, then sum and count
+        position = len(self.buckets)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                position = index
+                break
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            state = values.get(series)
+            if state is None:
+                state = values[series] = [0] * (len(self.buckets) + 3)
+            state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+        self.registry.maybe_flush()
+
+    @property
+    def size(self):
+        return len(self.buckets) + 3
+
+
+class MetricsRegistry:
+    """Metric families of this process plus the multiprocess snapshot files."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        self._process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+
+    # Multiprocess snapshots
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    def snapshot(self):
+        """Copy of this process' values, JSON serializable."""
+        with self.lock:
+            return {
+                name: [
+                    [list(series), list(value) if isinstance(value, list) else value]
+                    for series, value in values.items()
+                ]
+                for name, values in self.values.items()
+            }
+
+    def maybe_flush(self):
+        if not self.directory:
+            return
+        current = time.monotonic()
+        if current - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        self._last_flush = current
+        self.flush()
+
+    def flush(self):
+        """Write this process' snapshot atomically to the multiprocess directory."""
+        directory = self.directory
+        if not directory:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{self._process_id}.json')
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w') as handle:
+                json.dump(self.snapshot(), handle)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Metrics flush failed: {e}")
+
+    def collect(self):
+        """Values of every process: this one from memory, the rest from their files."""
+        merged = {name: {} for name in self.metrics}
+        snapshots = [self.snapshot()]
+
+        directory = self.directory
+        if directory and os.path.isdir(directory):
+            own_file = f'{self._process_id}.json'
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json') or filename == own_file:
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as handle:
+                        snapshots.append(json.load(handle))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable metrics file {filename}: {e}")
+
+        for snapshot in snapshots:
+            for name, entries in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                target = merged[name]
+                for series, value in entries:
+                    series = tuple(series)
+                    if metric.kind == 'histogram':
+                        if len(value) != metric.size:
+                            continue  # buckets changed between deploys
+                        current = target.setdefault(series, [0] * metric.size)
+                        for index, amount in enumerate(value):
+                            current[index] += amount
+                    else:
+                        target[series] = target.get(series, 0) + value
+        return merged
+
+    # Exposition
+
+    def render(self):
+        """All metric families in the Prometheus text format."""
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for series in sorted(values):
+                value = values[series]
+                labels = list(zip(metric.labelnames, series))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, amount in zip(metric.buckets + (float('inf'),), value):
+                        cumulative += amount
+                        bucket_labels = labels + [('le', _format_value(bound))]
+                        lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {_format_value(value[-1])}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def totals(self, name):
+        """Sum of a counter, or [sum, count] of a histogram, over all series and processes."""
+        metric = self.metrics[name]
+        values = self.collect()[name].values()
+        if metric.kind == 'histogram':
+            return [sum(value[-2] for value in values), sum(value[-1] for value in values)]
+        return sum(values)
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry_default = MetricsRegistry()
+atexit.register(registry_default.flush)
+
+
+# Application metrics
+
+HTTP_REQUESTS = Counter(
+    'rioclaro_http_requests_total',
+    'HTTP requests handled, by method, URL name and status code.',
+    ['method', 'view', 'status'],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'rioclaro_http_request_duration_seconds',
+    'Time to produce the HTTP response, by method and URL name.',
+    ['method', 'view'],
+)
+HTTP_STAGE_DURATION = Histogram(
+    'rioclaro_http_stage_duration_seconds',
+    'Time per request stage (db, cache, view, render, middleware), by URL name.',
+    ['view', 'stage'],
+)
+HTTP_DB_QUERIES = Histogram(
+    'rioclaro_http_db_queries',
+    'Database queries per request, by URL name.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+MEASUREMENTS_INGESTED = Counter(
+    'rioclaro_measurements_ingested_total',
+    'Measurements stored, by ingest path.',
+    ['source'],
+)
+ALERTS_CREATED = Counter(
+    'rioclaro_alerts_created_total',
+    'Alerts created, by level.',
+    ['level'],
+)
+ADMISSION_REJECTED = Counter(
+    'rioclaro_admission_rejected_total',
+    'Requests rejected by admission control, by controller.',
+    ['controller'],
+)
+ADMISSION_SERVICE_TIME = Histogram(
+    'rioclaro_admission_service_seconds',
+    'Time admitted requests hold a slot, by controller.',
+    ['controller'],
+)
+
+# Bounded label values: anything else is reported as "other"
+HTTP_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """Prometheus scrape endpoint."""
+    return HttpResponse(registry_default.render(), content_type=CONTENT_TYPE)
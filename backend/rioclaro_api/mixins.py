@@ -4,35 +4,49 @@ Performance optimization mixins for Django REST Framework ViewSets.
 
 import hashlib
 import logging
-from django.core.cache import cache
 from django.conf import settings
 from django.db.models import Prefetch
 from rest_framework.response import Response
 from rest_framework import status
 
+from .access_scope import station_scope_key
+from .cache_versions import get_versions, bump_versions_on_commit
+from .rate_limiter import RateLimit, rate_limiter
+from .tiered_cache import tiered_cache
+
 logger = logging.getLogger(__name__)
 
 
 class CacheMixin:
     """
     Mixin to add caching capabilities to ViewSets.
+
+    Cache keys include the current version of every namespace returned by
+    get_cache_namespaces(); bumping a namespace (see rioclaro_api.cache_versions)
+    invalidates all entries built from it.
     """
     cache_timeout = 300  # 5 minutes default
     cache_key_prefix = 'api_cache'
+    cache_namespaces = ()
+
+    def get_cache_namespaces(self, request, *args, **kwargs):
+        """Namespaces whose writes invalidate this view's cached responses."""
+        return list(self.cache_namespaces)
 
     def get_cache_key(self, request, *args, **kwargs):
         """Generate a cache key based on the request parameters."""
-        # Include user id for user-specific caching
-        user_id = request.user.id if request.user.is_authenticated else 'anon'
+        # Users with the same accessible stations share cached responses
+        scope = station_scope_key(request)
 
         # Include relevant parameters
         params = {
             'view': self.__class__.__name__,
             'action': getattr(self, 'action', 'unknown'),
-            'user_id': user_id,
+            'scope': scope,
             'args': str(args),
             'kwargs': str(kwargs),
-            'query_params': dict(request.query_params)
+            'query_params': dict(request.query_params),
+            'versions': get_versions(self.get_cache_namespaces(request, *args, **kwargs)),
         }
 
         # Create a hash of the parameters
@@ -41,16 +55,21 @@ class CacheMixin:
 
         return f"{self.cache_key_prefix}:{cache_hash}"
 
+    def get_versioned_cache_key(self, base_key, namespaces):
+        """Append the current namespace versions to a hand-built cache key."""
+        versions = get_versions(namespaces)
+        return f"{base_key}:v" + '.'.join(str(versions[namespace]) for namespace in namespaces)
+
     def get_cached_response(self, request, *args, **kwargs):
         """Get response from cache if available."""
         if not getattr(settings, 'USE_CACHE', True):
             return None
 
         cache_key = self.get_cache_key(request, *args, **kwargs)
-        cached_data = cache.get(cache_key)
+        cached_data = tiered_cache.get(cache_key, namespace=self.cache_key_prefix)
 
         if cached_data:
-            logger.info(f"Cache hit for key: {cache_key}")
+            logger.debug(f"Cache hit for key: {cache_key}")
             return Response(cached_data)
 
         return None
@@ -63,20 +82,37 @@ class CacheMixin:
         cache_key = self.get_cache_key(request, *args, **kwargs)
         timeout = getattr(self, 'cache_timeout', 300)
 
-        try:
-            cache.set(cache_key, response_data, timeout)
-            logger.info(f"Cached response for key: {cache_key}")
-        except Exception as e:
-            logger.error(f"Failed to cache response: {e}")
+        # Versioned keys never go stale, so the local tier keeps them for the full timeout
+        tiered_cache.set(cache_key, response_data, timeout, namespace=self.cache_key_prefix, local_timeout=timeout)
+
+    def get_or_set_cached(self, request, compute, *args, **kwargs):
+        """
+        Return compute() through the two-tier cache. When the entry is missing
+        or about to expire only one worker recomputes it.
+        """
+        if not getattr(settings, 'USE_CACHE', True):
+            return compute()
+
+        return self.get_or_set_cached_key(
+            self.get_cache_key(request, *args, **kwargs),
+            compute,
+            getattr(self, 'cache_timeout', 300)
+        )
+
+    def get_or_set_cached_key(self, cache_key, compute, timeout):
+        """get_or_set_cached() for a hand-built (versioned) key."""
+        if not getattr(settings, 'USE_CACHE', True):
+            return compute()
+
+        return tiered_cache.get_or_set(
+            cache_key, compute, timeout,
+            namespace=self.cache_key_prefix,
+            local_timeout=timeout
+        )
 
-    def invalidate_cache_pattern(self, pattern):
-        """Invalidate cache keys matching a pattern."""
-        try:
-            # This is a simplified implementation
-            # In production, you might want to use Redis's pattern deletion
-            cache.delete_many([f"{self.cache_key_prefix}:{pattern}"])
-        except Exception as e:
-            logger.error(f"Failed to invalidate cache pattern {pattern}: {e}")
+    def invalidate_cache_namespaces(self, *namespaces):
+        """Invalidate every cached entry built from these namespaces (after commit)."""
+        bump_versions_on_commit(*namespaces)
 
 
 class OptimizedQueryMixin:
@@ -182,24 +218,16 @@ class RateLimitMixin:
     rate_limit_requests = 100
     rate_limit_window = 3600  # 1 hour
 
+    def get_rate_limit(self):
+        return RateLimit(self.rate_limit_key, self.rate_limit_requests, self.rate_limit_window)
+
     def check_rate_limit(self, request):
         """Check if the request exceeds rate limits."""
         if not self.rate_limit_key:
             return True
 
-        # Generate rate limit key
-        user_id = request.user.id if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
-        limit_key = f"rate_limit:{self.rate_limit_key}:{user_id}"
-
-        # Get current count
-        current_count = cache.get(limit_key, 0)
-
-        if current_count >= self.rate_limit_requests:
-            return False
-
-        # Increment counter
-        cache.set(limit_key, current_count + 1, self.rate_limit_window)
-        return True
+        identifier = request.user.id if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
+        return rate_limiter.check([(self.get_rate_limit(), identifier)]) is None
 
     def dispatch(self, request, *args, **kwargs):
         """Override dispatch to check rate limits."""
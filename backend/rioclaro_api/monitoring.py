@@ -1,19 +1,29 @@
 """
 Monitoring and metrics endpoints for application observability.
+
+Prometheus scrapes /metrics/ (rioclaro_api.metrics), which is served from
+in-process counters. The JSON summary below counts database tables, so it is
+cached for METRICS_SUMMARY_CACHE_TTL seconds (default 60) and is meant for
+dashboards opened by people, not for scrapers.
 """
 
 import time
 import logging
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.db import connection
-from django.core.cache import cache
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Count, Avg
 from django.contrib.auth import get_user_model
 
+from .admission import ingest_admission
+from .metrics import registry_default
+from .tiered_cache import tiered_cache
+
 # Import models
 from stations.models import Station
 from measurements.models import Measurement, Alert
@@ -22,12 +32,19 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+SUMMARY_CACHE_KEY = 'monitoring:metrics_summary'
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def metrics(request):
     """
-    Application metrics endpoint for monitoring dashboards.
+    Application metrics summary for monitoring dashboards.
     """
+    summary = cache.get(SUMMARY_CACHE_KEY)
+    if summary is not None:
+        return JsonResponse(summary)
+
     try:
         # Get time ranges
         now = timezone.now()
@@ -67,15 +84,21 @@ def metrics(request):
         performance_metrics = {
             'database_query_time_ms': _time_database_query(),
             'cache_hit_rate': _get_cache_hit_rate(),
-            'response_time_ms': _get_avg_response_time()
+            'response_time_ms': _get_avg_response_time(),
+            # Two-tier cache counters of the process serving this request
+            'cache': tiered_cache.stats(),
+            # Ingest admission control of this process
+            'ingest_admission': ingest_admission.stats()
         }
 
-        return JsonResponse({
+        summary = {
             'timestamp': now.isoformat(),
             'database': db_metrics,
             'application': app_metrics,
             'performance': performance_metrics
-        })
+        }
+        cache.set(SUMMARY_CACHE_KEY, summary, getattr(settings, 'METRICS_SUMMARY_CACHE_TTL', 60))
+        return JsonResponse(summary)
 
     except Exception as e:
         logger.error(f"Metrics endpoint error: {e}")
@@ -173,23 +196,14 @@ def _time_database_query():
 
 
 def _get_cache_hit_rate():
-    """Calculate cache hit rate (simplified metric)."""
-    try:
-        # This is a simplified implementation
-        # In production, you might want to use Redis INFO command
-        test_key = 'cache_hit_test'
-        cache.set(test_key, 'test', 60)
-        hit = cache.get(test_key) is not None
-        return 100.0 if hit else 0.0
-    except Exception:
-        return None
+    """Hit rate (%) of the two-tier cache in this process, None before any lookup."""
+    return tiered_cache.stats()['totals']['hit_rate']
 
 
 def _get_avg_response_time():
-    """Get average response time (placeholder - would need middleware to track)."""
-    # This would require implementing a middleware to track response times
-    # For now, return a placeholder
-    return None
+    """Mean response time in milliseconds across all workers, None before any request."""
+    total_seconds, count = registry_default.totals('rioclaro_http_request_duration_seconds')
+    return round(total_seconds / count * 1000, 2) if count else None
 
 
 def _get_django_version():
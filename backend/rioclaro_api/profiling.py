@@ -0,0 +1,292 @@
+"""
+On-demand request profiling for administrators.
+
+A request carrying the header "X-Profile: 1" or the query flag "?_profile=1"
+from a user with role UserRole.ADMIN (session or token authentication) runs
+under cProfile, while a sampler thread records the request thread's stacks
+every PROFILING_SAMPLE_INTERVAL seconds (default 0.001). Two files are kept
+per profile:
+
+- <id>.pstats: cProfile statistics, for `python -m pstats` or snakeviz
+- <id>.collapsed: sampled stacks in the collapsed format ("a;b;c 12"), for
+  flamegraph.pl or speedscope
+
+The response carries the profile id in an X-Profile-Id header. Profiles are
+written to PROFILING_DIR (default logs/profiles); only the newest
+PROFILING_MAX_PROFILES (default 50) are kept. Admins list them at
+GET /profiles/ and download them at GET /profiles/<id>/<pstats|collapsed>/.
+
+Only the value "1" turns profiling on ("X-Profile: 0" or "?_profile=0" do
+not). Requests without the flag cost one header lookup and one substring
+test.
+The flag of a non-admin is ignored. One request per process is profiled at a
+time; a concurrent flagged request runs normally with "X-Profile: busy".
+Profiled requests bypass request coalescing, so they always do the work
+themselves. Streaming responses are profiled up to the first byte only.
+
+PROFILING_ENABLED = False turns the trigger off entirely.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.response import Response
+
+from users.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_FLAG = '1'
+
+PROFILE_KINDS = {
+    'pstats': 'application/octet-stream',
+    'collapsed': 'text/plain; charset=utf-8',
+}
+
+_PROFILE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# cProfile and the sampler only handle one profiled request at a time
+_profiling_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread, below root_code, into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval, root_code=None):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._finished = threading.Event()
+
+    def run(self):
+        while not self._finished.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None and frame.f_code is not self.root_code:
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(frames))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._finished.set()
+        self.join()
+
+    def collapsed(self):
+        """Sampled stacks in the collapsed format, one "frames count" per line."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for prefix in (str(settings.BASE_DIR) + os.sep, sys.prefix + os.sep):
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    # ';' separates frames in the collapsed format
+    return f'{code.co_qualname} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+
+
+class ProfileStore:
+    """Bounded directory of captured profiles: <id>.pstats, <id>.collapsed, <id>.json."""
+
+    @property
+    def directory(self):
+        return str(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+
+    @property
+    def max_profiles(self):
+        return getattr(settings, 'PROFILING_MAX_PROFILES', 50)
+
+    def path(self, profile_id, kind):
+        if not _PROFILE_ID.match(profile_id) or (kind not in PROFILE_KINDS and kind != 'json'):
+            return None
+        return os.path.join(self.directory, f'{profile_id}.{kind}')
+
+    def save(self, profiler, sampler, metadata):
+        """Write a profile and drop the oldest ones beyond max_profiles; returns its id."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{secrets.token_hex(4)}"
+
+        profiler.dump_stats(self.path(profile_id, 'pstats'))
+        with open(self.path(profile_id, 'collapsed'), 'w') as handle:
+            handle.write(sampler.collapsed())
+        # Metadata last: listing only shows profiles whose files are complete
+        with open(self.path(profile_id, 'json'), 'w') as handle:
+            json.dump({'id': profile_id, 'samples': sampler.samples, **metadata}, handle)
+
+        self.prune()
+        return profile_id
+
+    def list(self):
+        """Metadata of stored profiles, newest first."""
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for filename in sorted(filenames, reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as handle:
+                    profiles.append(json.load(handle))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable profile {filename}: {e}")
+        return profiles
+
+    def prune(self):
+        ids = sorted(
+            filename[:-len('.json')]
+            for filename in os.listdir(self.directory)
+            if filename.endswith('.json')
+        )
+        for profile_id in ids[:max(0, len(ids) - self.max_profiles)]:
+            for kind in ('json', *PROFILE_KINDS):
+                try:
+                    os.remove(self.path(profile_id, kind))
+                except FileNotFoundError:
+                    pass
+
+
+profile_store = ProfileStore()
+
+
+def _profiling_requested(request):
+    """True for "X-Profile: 1" or "?_profile=1"; other values do not profile."""
+    if request.META.get(PROFILE_HEADER, '').strip() == PROFILE_FLAG:
+        return True
+    # Substring test first: the query string is only parsed when it mentions the flag
+    return (
+        PROFILE_QUERY_PARAM in request.META.get('QUERY_STRING', '')
+        and request.GET.get(PROFILE_QUERY_PARAM) == PROFILE_FLAG
+    )
+
+
+def _admin_user(request):
+    """The admin making the request (session or token), or None."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = authenticated[0] if authenticated else None
+    if user is not None and getattr(user, 'role', None) == UserRole.ADMIN:
+        return user
+    return None
+
+
+class ProfilingMiddleware:
+    """Profile requests flagged by an admin and store the result."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _profiling_requested(request) or not getattr(settings, 'PROFILING_ENABLED', True):
+            return self.get_response(request)
+
+        user = _admin_user(request)
+        if user is None:
+            logger.warning(f"Ignoring profiling flag from non-admin request to {request.path}")
+            return self.get_response(request)
+
+        if not _profiling_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile'] = 'busy'
+            return response
+
+        try:
+            return self._profile(request, user)
+        finally:
+            _profiling_lock.release()
+
+    def _profile(self, request, user):
+        request._profiling = True
+        sampler = StackSampler(
+            threading.get_ident(),
+            getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.001),
+            root_code=sys._getframe().f_code,
+        )
+        profiler = cProfile.Profile()
+
+        started = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            sampler.stop()
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        try:
+            profile_id = profile_store.save(profiler, sampler, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'user': user.email,
+                'created': datetime.now(timezone.utc).isoformat(),
+            })
+        except OSError as e:
+            logger.error(f"Could not store profile of {request.path}: {e}")
+            return response
+
+        logger.info(f"Profiled {request.method} {request.path} for {user.email}: {profile_id}")
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class IsAdminRole(BasePermission):
+    """Only users with role UserRole.ADMIN."""
+
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.role == UserRole.ADMIN
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def profile_list(request):
+    """Stored profiles, newest first."""
+    return Response({'results': profile_store.list()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def profile_download(request, profile_id, kind):
+    """A stored profile as a pstats dump or collapsed-stack text."""
+    path = profile_store.path(profile_id, kind) if kind in PROFILE_KINDS else None
+    if path is None or not os.path.exists(path):
+        raise Http404('Profile not found')
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'{profile_id}.{kind}',
+        content_type=PROFILE_KINDS[kind],
+    )
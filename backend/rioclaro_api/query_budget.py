@@ -0,0 +1,150 @@
+"""
+Per-request query inspection: query budgets and repeated-query (N+1) detection.
+
+QueryInspectionMiddleware records every query of a request and groups them
+by normalized SQL (literals and parameter lists replaced by placeholders),
+so the same statement run once per row shows up as one shape with a high
+count. It is active when QUERY_INSPECTION is true (default: DEBUG); in
+production it adds no per-query work.
+
+Budgets are declared on views:
+
+    @query_budget(6)
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticated])
+    def comparative_report(request):
+        ...
+
+    class StationViewSet(viewsets.ModelViewSet):
+        query_budget = {'list': 4, 'retrieve': 4}
+
+For function views the decorator goes above @api_view, where it sees the
+view Django actually resolves. An int applies to every method or action; a
+dict maps viewset actions (or lowercase HTTP methods) to budgets.
+
+When a request runs more queries than its budget, the QUERY_BUDGET_ACTION
+setting decides what happens:
+- 'log' (default): log a warning with the most repeated shapes
+- 'raise': raise QueryBudgetExceeded
+
+The testing settings use 'raise', so a test that hits an endpoint fails as
+soon as the endpoint's query count regresses past its budget. A shape that
+repeats QUERY_REPEAT_THRESHOLD times or more (default 5) is logged as a
+likely N+1 whether or not the view has a budget.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than the budget declared on its view."""
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """SQL shape: literals become ?, IN lists of any length become (...)."""
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER.sub('?', shape).replace('%s', '?')
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def query_budget(budget):
+    """Declare the maximum number of queries a view may run per request."""
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+class QueryRecorder:
+    """execute_wrapper counting queries by normalized shape."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.shapes[normalize_sql(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """[(shape, count)] of shapes run at least threshold times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self, limit=3):
+        return '; '.join(f'{count}x {shape[:200]}' for shape, count in self.shapes.most_common(limit))
+
+
+def budget_for(view_func, method):
+    """Budget declared on a resolved view for the given HTTP method, or None."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        method = method.lower()
+        action = (getattr(view_func, 'actions', None) or {}).get(method)
+        return budget.get(action, budget.get(method))
+    return budget
+
+
+class QueryInspectionMiddleware:
+    """Record queries per request, flag repeated shapes and enforce view budgets."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_INSPECTION', settings.DEBUG):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._query_budget = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        self._check(request, recorder)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = budget_for(view_func, request.method)
+        return None
+
+    def _check(self, request, recorder):
+        view = getattr(getattr(request, 'resolver_match', None), 'view_name', request.path)
+
+        threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+        for shape, count in recorder.repeated(threshold):
+            logger.warning(f"Possible N+1 in {request.method} {view}: {count}x {shape[:200]}")
+
+        budget = request._query_budget
+        if budget is None or recorder.count <= budget:
+            return
+
+        message = (
+            f"{request.method} {view} ran {recorder.count} queries, budget is {budget}. "
+            f"Most repeated: {recorder.summary()}"
+        )
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
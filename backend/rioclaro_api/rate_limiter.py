@@ -0,0 +1,190 @@
+"""
+Shared rate-limiting engine: sliding-window counters over atomic increments.
+
+Each limit counts hits in fixed windows (<prefix>:<name>:<identifier>:<window
+index>) and estimates the sliding-window rate as
+
+    current + previous * (1 - elapsed fraction of the current window)
+
+which smooths the burst a plain fixed window allows at window boundaries.
+
+Costs per check:
+- the current window counter is bumped with an atomic incr: no lost updates
+  under concurrency and the TTL is set once per window, never extended;
+- the previous window is closed, so its count is read once per process and
+  window (one get_many for every limit of the request) and kept locally;
+- with a Redis cache (Django's backend or django-redis) every counter of the
+  request goes in a single pipeline: SET NX EX creates the window key with
+  its TTL and INCR bumps it; other backends do one incr per limit.
+
+All limits that apply to a request are evaluated in one hit() call. Denied
+requests are counted too, so a client that keeps retrying stays limited.
+If the cache is unavailable requests are allowed (fail open).
+"""
+
+import logging
+import math
+import time
+
+from django.core.cache import cache
+
+from .request_timing import timed_stage
+from .tiered_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    """At most `limit` hits per `window` seconds for each identifier."""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def __repr__(self):
+        return f"RateLimit({self.name!r}, {self.limit}/{self.window}s)"
+
+
+class RateLimitDecision:
+    """Outcome of one limit for one request."""
+
+    def __init__(self, rate_limit, identifier, count, retry_after=0):
+        self.rate_limit = rate_limit
+        self.identifier = identifier
+        self.count = count
+        self.retry_after = retry_after
+
+    @property
+    def allowed(self):
+        return self.count <= self.rate_limit.limit
+
+    @property
+    def remaining(self):
+        return max(0, int(self.rate_limit.limit - self.count))
+
+
+class RateLimiter:
+    """Evaluates RateLimit checks against the shared cache."""
+
+    def __init__(self, shared=None, prefix='rl', local_max_entries=5000):
+        self.shared = shared or cache
+        self.prefix = prefix
+        # Counts of closed windows; they no longer change
+        self._closed_windows = LocalCache(max_entries=local_max_entries)
+
+    def hit(self, checks, now=None):
+        """
+        Count one hit on every (RateLimit, identifier) pair and return a
+        RateLimitDecision per pair, in the same order.
+        """
+        checks = list(checks)
+        if not checks:
+            return []
+        now = time.time() if now is None else now
+
+        plan = []
+        for rate_limit, identifier in checks:
+            index, offset = divmod(now, rate_limit.window)
+            base = f"{self.prefix}:{rate_limit.name}:{identifier}"
+            plan.append((
+                f"{base}:{int(index)}",
+                f"{base}:{int(index) - 1}",
+                offset / rate_limit.window,
+                rate_limit.window - offset,
+            ))
+
+        try:
+            with timed_stage('cache'):
+                previous = self._previous_counts([(key, remaining) for _, key, _, remaining in plan])
+                current = self._incr_many([(key, rate_limit.window * 2) for (key, _, _, _), (rate_limit, _) in zip(plan, checks)])
+        except Exception as e:
+            logger.error(f"Rate limiter unavailable, allowing request: {e}")
+            return [RateLimitDecision(rate_limit, identifier, 0) for rate_limit, identifier in checks]
+
+        decisions = []
+        for (rate_limit, identifier), (current_key, previous_key, elapsed, remaining) in zip(checks, plan):
+            current_count = current[current_key]
+            previous_count = previous.get(previous_key, 0)
+            count = current_count + previous_count * (1.0 - elapsed)
+
+            decision = RateLimitDecision(rate_limit, identifier, count)
+            if not decision.allowed:
+                decision.retry_after = self._retry_after(rate_limit, current_count, previous_count, elapsed, remaining)
+            decisions.append(decision)
+        return decisions
+
+    def check(self, checks, now=None):
+        """hit(), returning the first denied decision or None when all pass."""
+        for decision in self.hit(checks, now):
+            if not decision.allowed:
+                return decision
+        return None
+
+    def _previous_counts(self, keys):
+        counts = {}
+        missing = []
+        for key, remaining in keys:
+            found, value = self._closed_windows.get(key)
+            if found:
+                counts[key] = value
+            else:
+                missing.append((key, remaining))
+
+        if missing:
+            stored = self.shared.get_many([key for key, _ in missing])
+            for key, remaining in missing:
+                counts[key] = int(stored.get(key) or 0)
+                # Valid until the current window closes as well
+                self._closed_windows.set(key, counts[key], remaining)
+        return counts
+
+    def _incr_many(self, keys):
+        """Atomically add 1 to every key; return {key: new value}."""
+        client = self._redis_client()
+        if client is not None:
+            pipeline = client.pipeline(transaction=False)
+            raw_keys = [self.shared.make_and_validate_key(key) for key, _ in keys]
+            for raw_key, (_, ttl) in zip(raw_keys, keys):
+                # TTL only when the window key is created; INCR keeps it
+                pipeline.set(raw_key, 0, ex=ttl, nx=True)
+                pipeline.incr(raw_key)
+            results = pipeline.execute()
+            return {key: int(results[position * 2 + 1]) for position, (key, _) in enumerate(keys)}
+
+        counts = {}
+        for key, ttl in keys:
+            try:
+                counts[key] = self.shared.incr(key)
+            except ValueError:
+                # First hit of the window; add() loses if another worker won the race
+                if self.shared.add(key, 1, ttl):
+                    counts[key] = 1
+                else:
+                    counts[key] = self.shared.incr(key)
+        return counts
+
+    def _redis_client(self):
+        """Raw Redis client behind the shared cache, or None for other backends."""
+        try:
+            from django_redis.cache import RedisCache as DjangoRedisCache
+        except ImportError:
+            DjangoRedisCache = None
+        if DjangoRedisCache is not None and isinstance(self.shared, DjangoRedisCache):
+            return self.shared.client.get_client(write=True)
+
+        from django.core.cache.backends.redis import RedisCache
+        if isinstance(self.shared, RedisCache):
+            return self.shared._cache.get_client(write=True)
+        return None
+
+    @staticmethod
+    def _retry_after(rate_limit, current_count, previous_count, elapsed, remaining):
+        """Seconds until the estimated rate drops back to the limit."""
+        if current_count >= rate_limit.limit or previous_count <= 0:
+            return max(1, math.ceil(remaining))
+        excess = current_count + previous_count * (1.0 - elapsed) - rate_limit.limit
+        return max(1, min(math.ceil(remaining), math.ceil(excess * rate_limit.window / previous_count)))
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,182 @@
+"""
+Per-request timing breakdown by resolved URL name.
+
+RequestTimingMiddleware splits the time of every request into stages and
+feeds them to the metrics registry (rioclaro_api.metrics), labelled with the
+resolved URL name (e.g. "station-list"):
+
+- db: time inside database cursors, via connection.execute_wrapper, plus
+  the number of queries
+- cache: time inside shared-cache calls wrapped in timed_stage('cache')
+  (tiered cache, namespace versions, rate limiter)
+- view: the view itself, excluding db and cache. DRF serializes inside the
+  view, so serializer time lands here
+- render: DRF response rendering (JSON encoding), timed between
+  process_template_response and the post-render callback
+- middleware: the rest (middleware chain, URL resolution)
+
+With SERVER_TIMING_HEADER (default: DEBUG) the breakdown is also sent in a
+Server-Timing header, which browser dev tools show per request.
+
+Code outside the middleware can attribute time to a stage with:
+
+    with timed_stage('cache'):
+        value = cache.get(key)
+
+timed_stage() costs a context-variable lookup when no request is timed.
+"""
+
+import contextvars
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import (
+    HTTP_METHODS,
+    HTTP_DB_QUERIES,
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    HTTP_STAGE_DURATION,
+)
+
+_current_timing = contextvars.ContextVar('request_timing', default=None)
+
+# Stages whose time is measured directly wherever it happens
+MEASURED_STAGES = ('db', 'cache')
+
+
+class RequestTiming:
+    """Accumulated stage durations of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(MEASURED_STAGES, 0.0)
+        self.queries = 0
+        self.view_started = None
+        self.view_finished = None
+        self.render_finished = None
+        self._measured_at = {}
+
+    def add(self, stage, duration):
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+
+    def measured(self):
+        """db + cache time accumulated so far."""
+        return sum(self.durations[stage] for stage in MEASURED_STAGES)
+
+    def mark(self, name):
+        """Record a point in time together with the db + cache time so far."""
+        setattr(self, name, time.perf_counter())
+        self._measured_at[name] = self.measured()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['db'] += time.perf_counter() - started
+            self.queries += 1
+
+    def breakdown(self, finished):
+        """{stage: seconds} for the whole request."""
+        total = finished - self.started
+        stages = dict(self.durations)
+
+        if self.view_started is not None:
+            if self.view_finished is not None:
+                view_end, measured_at_end = self.view_finished, self._measured_at['view_finished']
+            else:
+                # Not a template response: the view ran until the end
+                view_end, measured_at_end = finished, self.measured()
+            measured_in_view = measured_at_end - self._measured_at['view_started']
+            stages['view'] = max(0.0, view_end - self.view_started - measured_in_view)
+
+            if self.view_finished is not None and self.render_finished is not None:
+                measured_in_render = self._measured_at['render_finished'] - self._measured_at['view_finished']
+                stages['render'] = max(0.0, self.render_finished - self.view_finished - measured_in_render)
+
+        stages['middleware'] = max(0.0, total - sum(stages.values()))
+        stages['total'] = total
+        return stages
+
+
+@contextmanager
+def timed_stage(stage):
+    """Attribute the time spent in the block to stage of the current request."""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(stage, time.perf_counter() - started)
+
+
+class RequestTimingMiddleware:
+    """Record total, db, cache, view and render time per resolved URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        request._timing = timing
+        token = _current_timing.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+
+        stages = timing.breakdown(time.perf_counter())
+        self._record(request, response, timing, stages)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG):
+            response['Server-Timing'] = self._server_timing(stages, timing.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing.mark('view_started')
+        return None
+
+    def process_template_response(self, request, response):
+        # Called right after the view returns a DRF Response, before rendering
+        timing = request._timing
+        timing.mark('view_finished')
+        response.add_post_render_callback(lambda rendered: timing.mark('render_finished'))
+        return response
+
+    def _record(self, request, response, timing, stages):
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        view = self._view_name(request)
+
+        HTTP_REQUESTS.inc(method=method, view=view, status=response.status_code)
+        HTTP_REQUEST_DURATION.observe(stages['total'], method=method, view=view)
+        HTTP_DB_QUERIES.observe(timing.queries, view=view)
+        for stage, duration in stages.items():
+            if stage != 'total':
+                HTTP_STAGE_DURATION.observe(duration, view=view, stage=stage)
+
+    @staticmethod
+    def _view_name(request):
+        # Only resolved URL names are used as labels, so label values stay bounded
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or 'unnamed'
+
+    @staticmethod
+    def _server_timing(stages, queries):
+        entries = []
+        for stage, duration in stages.items():
+            entry = f'{stage};dur={duration * 1000:.2f}'
+            if stage == 'db':
+                entry += f';desc="{queries} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
@@ -66,6 +66,8 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'rioclaro_api.request_timing.RequestTimingMiddleware',
+    'rioclaro_api.query_budget.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,6 +76,7 @@ MIDDLEWARE = [
     'users.middleware.RequestSanitizationMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'users.middleware.SessionTimeoutMiddleware',
+    'rioclaro_api.profiling.ProfilingMiddleware',
     'users.security_logging.RequestContextMiddleware',
     'axes.middleware.AxesMiddleware',
     'users.middleware.AuditLogMiddleware',
@@ -202,6 +205,9 @@ SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 SESSION_COOKIE_SECURE = not DEBUG
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 3600  # 1 hour
+# Segundos mínimos entre escrituras de la última actividad en la sesión
+# (users.middleware.SessionTimeoutMiddleware; la caché se actualiza siempre)
+SESSION_ACTIVITY_GRANULARITY_SECONDS = env.int('SESSION_ACTIVITY_GRANULARITY_SECONDS', default=60)
 
 # CSRF Configuration
 CSRF_COOKIE_SECURE = not DEBUG
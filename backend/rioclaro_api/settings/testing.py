@@ -71,3 +71,7 @@ REST_FRAMEWORK.update({
         'rest_framework.permissions.IsAuthenticated',
     ],
 })
+
+# Query budgets declared on views fail the test that exceeds them
+QUERY_INSPECTION = True
+QUERY_BUDGET_ACTION = 'raise'
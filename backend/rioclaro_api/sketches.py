@@ -0,0 +1,79 @@
+"""
+Fixed-size probabilistic sketches for per-client counters kept in the cache.
+
+HyperLogLog estimates the number of distinct values added to it using 2**p
+one-byte registers (p=8: 256 bytes, about 6.5% standard error; small counts
+use linear counting and are close to exact). Adding a value already seen
+never changes the registers, so callers only need to write the sketch back
+to the cache when add() returns True.
+"""
+
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """Distinct-count sketch with 2**precision registers."""
+
+    def __init__(self, precision=8, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError('registers do not match the precision')
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a sketch from to_bytes(); the size encodes the precision."""
+        return cls(precision=len(data).bit_length() - 1, registers=data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        """Add a value; return True when the registers changed."""
+        if isinstance(value, str):
+            value = value.encode()
+        hashed = int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other):
+        """Union with another sketch of the same precision."""
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches of different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        """Estimated number of distinct values added."""
+        m = self.size
+        estimate = self._alpha(m) * m * m / sum(2.0 ** -register for register in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    @staticmethod
+    def _alpha(m):
+        if m == 16:
+            return 0.673
+        if m == 32:
+            return 0.697
+        if m == 64:
+            return 0.709
+        return 0.7213 / (1 + 1.079 / m)
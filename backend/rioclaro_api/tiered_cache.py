@@ -0,0 +1,287 @@
+"""
+Two-tier cache: a small per-process TTL/LRU tier in front of the Django cache.
+
+Reads check the local tier first (no network round trip), then the shared
+cache. Local entries live for TIERED_CACHE_LOCAL_TTL seconds by default, so a
+value rewritten by another worker is picked up after that delay. Keys that
+embed namespace versions (see rioclaro_api.cache_versions) never change
+content, only reachability, so callers may keep them locally for their whole
+timeout (local_timeout argument).
+
+Stampede protection in get_or_set():
+- Probabilistic early recomputation: shared entries carry their logical
+  expiry and the time the value took to compute. Close to expiry each reader
+  recomputes early with a probability that grows as expiry approaches
+  (delta * beta * -log(rand)), so a hot key is normally refreshed by a single
+  worker before it expires.
+- Recompute lock: when a value must be recomputed only the worker that wins
+  cache.add(<key>:lock) computes it. The others serve the stale value (kept
+  TIERED_CACHE_STALE_GRACE seconds past expiry) or, if there is none, wait
+  briefly for the winner's result.
+
+Hit/miss counters per namespace are kept per process, see stats().
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .request_timing import timed_stage
+
+logger = logging.getLogger(__name__)
+
+
+COUNTER_FIELDS = (
+    'local_hits', 'shared_hits', 'misses', 'early_refreshes',
+    'stale_served', 'lock_waits',
+)
+
+
+class LocalCache:
+    """Thread-safe LRU dictionary with a per-entry expiry."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache:
+    """
+    Per-process LRU tier + shared Django cache with stampede protection.
+
+    Values are stored in the shared cache as {'v': value, 'e': logical expiry
+    (epoch seconds), 'd': compute time in seconds}.
+    """
+
+    def __init__(self, shared=None, local_ttl=None, max_entries=None, beta=None,
+                 stale_grace=None, lock_timeout=None, lock_wait=None):
+        self.shared = shared or cache
+        self.local_ttl = local_ttl if local_ttl is not None else getattr(settings, 'TIERED_CACHE_LOCAL_TTL', 5)
+        self.beta = beta if beta is not None else getattr(settings, 'TIERED_CACHE_BETA', 1.0)
+        self.stale_grace = stale_grace if stale_grace is not None else getattr(settings, 'TIERED_CACHE_STALE_GRACE', 30)
+        self.lock_timeout = lock_timeout if lock_timeout is not None else getattr(settings, 'TIERED_CACHE_LOCK_TIMEOUT', 30)
+        self.lock_wait = lock_wait if lock_wait is not None else getattr(settings, 'TIERED_CACHE_LOCK_WAIT', 2.0)
+        self.local = LocalCache(
+            max_entries if max_entries is not None else getattr(settings, 'TIERED_CACHE_LOCAL_MAX_ENTRIES', 500)
+        )
+        self._counters = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        self._counters_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Basic operations
+    # ------------------------------------------------------------------
+
+    def get(self, key, default=None, namespace='default'):
+        """Read through both tiers, ignoring logical expiry's early refresh."""
+        entry = self._get_entry(key, namespace)
+        if entry is None or entry['e'] <= time.time():
+            self._count(namespace, 'misses')
+            return default
+        return entry['v']
+
+    def set(self, key, value, timeout, namespace='default', compute_time=0.0, local_timeout=None):
+        """Write to the shared cache and to the local tier."""
+        entry = {'v': value, 'e': time.time() + timeout, 'd': compute_time}
+        try:
+            with timed_stage('cache'):
+                self.shared.set(key, entry, timeout + self.stale_grace)
+        except Exception as e:
+            logger.error(f"Failed to write shared cache key {key}: {e}")
+        self._set_local(key, entry, local_timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+        try:
+            with timed_stage('cache'):
+                self.shared.delete(key)
+        except Exception as e:
+            logger.error(f"Failed to delete shared cache key {key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Stampede-safe read-through
+    # ------------------------------------------------------------------
+
+    def get_or_set(self, key, compute, timeout, namespace='default', local_timeout=None):
+        """
+        Return the cached value for key, computing it with compute() when it
+        is missing or due for (early) refresh. Only one worker recomputes a
+        key at a time.
+        """
+        now = time.time()
+
+        found, entry = self.local.get(key)
+        if found and not self._should_refresh(entry, now):
+            self._count(namespace, 'local_hits')
+            return entry['v']
+
+        # Local miss or local entry due for refresh: another worker may
+        # already have refreshed it in the shared cache
+        shared_entry = self._shared_get(key)
+        if shared_entry is not None:
+            entry = shared_entry
+            if not self._should_refresh(entry, now):
+                self._count(namespace, 'shared_hits')
+                self._set_local(key, entry, local_timeout)
+                return entry['v']
+
+        lock_key = f'{key}:lock'
+        if self._acquire(lock_key):
+            try:
+                self._count(namespace, 'misses' if entry is None or entry['e'] <= now else 'early_refreshes')
+                return self._compute_and_set(key, compute, timeout, namespace, local_timeout)
+            finally:
+                self._release(lock_key)
+
+        # Another worker is recomputing this key
+        if entry is not None:
+            self._count(namespace, 'stale_served')
+            return entry['v']
+
+        self._count(namespace, 'lock_waits')
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self._shared_get(key)
+            if entry is not None:
+                self._set_local(key, entry, local_timeout)
+                return entry['v']
+
+        # The winner did not finish in time: compute without the lock
+        self._count(namespace, 'misses')
+        return self._compute_and_set(key, compute, timeout, namespace, local_timeout)
+
+    # ------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """Per-namespace counters for this process, plus totals and hit rate."""
+        with self._counters_lock:
+            namespaces = {namespace: dict(counters) for namespace, counters in self._counters.items()}
+
+        totals = dict.fromkeys(COUNTER_FIELDS, 0)
+        for counters in namespaces.values():
+            for field in COUNTER_FIELDS:
+                totals[field] += counters[field]
+            counters['hit_rate'] = _hit_rate(counters)
+        totals['hit_rate'] = _hit_rate(totals)
+
+        return {'namespaces': namespaces, 'totals': totals}
+
+    def reset_stats(self):
+        with self._counters_lock:
+            self._counters.clear()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _get_entry(self, key, namespace):
+        found, entry = self.local.get(key)
+        if found:
+            self._count(namespace, 'local_hits')
+            return entry
+
+        entry = self._shared_get(key)
+        if entry is not None:
+            self._count(namespace, 'shared_hits')
+            self._set_local(key, entry)
+        return entry
+
+    def _shared_get(self, key):
+        try:
+            with timed_stage('cache'):
+                entry = self.shared.get(key)
+        except Exception as e:
+            logger.error(f"Failed to read shared cache key {key}: {e}")
+            return None
+        if isinstance(entry, dict) and 'v' in entry and 'e' in entry:
+            return entry
+        return None
+
+    def _set_local(self, key, entry, local_timeout=None):
+        local_timeout = self.local_ttl if local_timeout is None else local_timeout
+        ttl = min(local_timeout, entry['e'] - time.time())
+        self.local.set(key, entry, ttl)
+
+    def _should_refresh(self, entry, now):
+        if now >= entry['e']:
+            return True
+        delta = entry.get('d') or 0.0
+        if delta <= 0 or self.beta <= 0:
+            return False
+        # -log(u) for u in (0, 1] is an exponential sample: early refresh
+        # becomes likely only within a few compute times of expiry
+        return now - delta * self.beta * math.log(1.0 - random.random()) >= entry['e']
+
+    def _compute_and_set(self, key, compute, timeout, namespace, local_timeout=None):
+        started = time.monotonic()
+        value = compute()
+        self.set(key, value, timeout, namespace, time.monotonic() - started, local_timeout)
+        return value
+
+    def _acquire(self, lock_key):
+        try:
+            with timed_stage('cache'):
+                return self.shared.add(lock_key, 1, self.lock_timeout)
+        except Exception as e:
+            # Without a shared cache every worker computes on its own
+            logger.error(f"Failed to acquire cache lock {lock_key}: {e}")
+            return True
+
+    def _release(self, lock_key):
+        try:
+            with timed_stage('cache'):
+                self.shared.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Failed to release cache lock {lock_key}: {e}")
+
+    def _count(self, namespace, field):
+        with self._counters_lock:
+            self._counters[namespace][field] += 1
+
+
+def _hit_rate(counters):
+    hits = counters['local_hits'] + counters['shared_hits'] + counters['stale_served']
+    lookups = hits + counters['misses'] + counters['early_refreshes']
+    return round(hits * 100.0 / lookups, 2) if lookups else None
+
+
+tiered_cache = TieredCache()
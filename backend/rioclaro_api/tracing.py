@@ -0,0 +1,355 @@
+"""
+Lightweight tracing: nested spans with trace/parent ids, exported off the
+request path.
+
+    from rioclaro_api.tracing import span, traced
+
+    @traced('measurement.create')
+    def create(self, request, *args, **kwargs):
+        with span('validate'):
+            serializer.is_valid(raise_exception=True)
+        with span('save') as current:
+            current.set_attribute('rows', 1)
+            ...
+
+The outermost span opens a trace; spans opened inside it become its
+children through a context variable, so helpers deep in the call stack only
+need `with span(...)`. When the root span ends, the whole trace is queued to
+a background thread that exports it:
+
+- TRACING_EXPORTER = 'jsonl' (default): one JSON object per span appended to
+  TRACING_JSONL_PATH (default logs/traces.jsonl)
+- TRACING_EXPORTER = 'otlp': OTLP/HTTP JSON POSTed to TRACING_OTLP_ENDPOINT
+  (default http://localhost:4318/v1/traces), e.g. an OpenTelemetry collector
+  or `manage.py trace_collector`
+
+Tracing is off unless TRACING_ENABLED is set; TRACING_SAMPLE_RATE (default
+1.0) is the share of root spans that are recorded. Spans outside a sampled
+trace cost a context-variable lookup. Traces are dropped, not queued, when
+TRACING_QUEUE_SIZE (default 1000) traces are already waiting.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = (
+        'name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+        'attributes', 'status', 'error', 'trace', '_started',
+    )
+
+    def __init__(self, name, trace, parent_id=None, attributes=None):
+        self.name = name
+        self.trace = trace
+        self.trace_id = trace.trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started = time.perf_counter_ns()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        # Wall-clock start plus a monotonic duration
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._started)
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'status': self.status,
+            'error': self.error,
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when the trace is not sampled."""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one trace, exported together when the root span ends."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+
+
+# Current span; NOOP_SPAN inside an unsampled trace, None outside any trace
+_current_span = ContextVar('tracing_span', default=None)
+
+
+def _sampled():
+    if not getattr(settings, 'TRACING_ENABLED', False):
+        return False
+    rate = getattr(settings, 'TRACING_SAMPLE_RATE', 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the block as a child of the current span, or as a new trace."""
+    parent = _current_span.get()
+    if parent is NOOP_SPAN:
+        yield NOOP_SPAN
+        return
+
+    if parent is None:
+        if not _sampled():
+            token = _current_span.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+        current = Span(name, Trace(), attributes=attributes)
+    else:
+        current = Span(name, parent.trace, parent_id=parent.span_id, attributes=attributes)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        current.trace.spans.append(current)
+        if parent is None:
+            exporter.submit(current.trace.spans)
+
+
+def traced(name=None, **attributes):
+    """Decorator running a function (or view method) inside span(name)."""
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes) as current:
+                result = function(*args, **kwargs)
+                status_code = getattr(result, 'status_code', None)
+                if status_code is not None:
+                    current.set_attribute('http.status_code', status_code)
+                return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def traced_atomic(name='commit', using=None):
+    """transaction.atomic() whose commit is timed as span(name)."""
+    atomic = transaction.atomic(using=using)
+    atomic.__enter__()
+    try:
+        yield
+    except BaseException:
+        atomic.__exit__(*sys.exc_info())
+        raise
+    with span(name):
+        atomic.__exit__(None, None, None)
+
+
+def current_span():
+    """The active span (a no-op span outside a sampled trace)."""
+    return _current_span.get() or NOOP_SPAN
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+
+def jsonl_path():
+    return str(getattr(settings, 'TRACING_JSONL_PATH', settings.BASE_DIR / 'logs' / 'traces.jsonl'))
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans):
+    """OTLP/HTTP JSON payload (ExportTraceServiceRequest) for a list of spans."""
+    service_name = getattr(settings, 'TRACING_SERVICE_NAME', 'rioclaro-api')
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [
+                    {
+                        'traceId': item.trace_id,
+                        'spanId': item.span_id,
+                        'parentSpanId': item.parent_id or '',
+                        'name': item.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(item.start_ns),
+                        'endTimeUnixNano': str(item.end_ns),
+                        'attributes': [
+                            {'key': key, 'value': _otlp_value(value)} for key, value in item.attributes.items()
+                        ],
+                        'status': {'code': 2, 'message': item.error} if item.status == 'error' else {'code': 1},
+                    }
+                    for item in spans
+                ],
+            }],
+        }],
+    }
+
+
+def records_from_otlp(payload):
+    """Span records (the JSON lines format) from an OTLP/HTTP JSON payload."""
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for item in scope_spans.get('spans', []):
+                start_ns = int(item['startTimeUnixNano'])
+                end_ns = int(item['endTimeUnixNano'])
+                status = item.get('status', {})
+                yield {
+                    'trace_id': item['traceId'],
+                    'span_id': item['spanId'],
+                    'parent_id': item.get('parentSpanId') or None,
+                    'name': item['name'],
+                    'start_ns': start_ns,
+                    'end_ns': end_ns,
+                    'duration_ms': round((end_ns - start_ns) / 1e6, 3),
+                    'attributes': {
+                        attribute['key']: next(iter(attribute['value'].values()), None)
+                        for attribute in item.get('attributes', [])
+                    },
+                    'status': 'error' if status.get('code') == 2 else 'ok',
+                    'error': status.get('message'),
+                }
+
+
+def append_records(path, records, lock=None):
+    """Append span records to a JSON lines file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+    with lock or nullcontext(), open(path, 'a') as handle:
+        handle.write(lines)
+
+
+class TraceExporter:
+    """Bounded queue of finished traces drained by a daemon thread."""
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self.dropped = 0
+        self.exported = 0
+
+    def submit(self, spans):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=2.0):
+        """Wait until queued traces are exported (or timeout)."""
+        if self._queue is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=getattr(settings, 'TRACING_QUEUE_SIZE', 1000))
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Export everything already waiting in one write / request
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export([item for spans in batch for item in spans])
+                self.exported += len(batch)
+            except Exception as e:
+                logger.warning(f"Trace export failed, {len(batch)} traces dropped: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def export(self, spans):
+        if getattr(settings, 'TRACING_EXPORTER', 'jsonl') == 'otlp':
+            self._export_otlp(spans)
+        else:
+            self._export_jsonl(spans)
+
+    def _export_jsonl(self, spans):
+        append_records(jsonl_path(), [item.to_dict() for item in spans], self._file_lock)
+
+    def _export_otlp(self, spans):
+        endpoint = getattr(settings, 'TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+        request = urllib.request.Request(
+            endpoint,
+            data=json.dumps(to_otlp(spans), default=str).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+exporter = TraceExporter()
@@ -29,6 +29,8 @@ from .health import health_check, health_detailed, ready_check, live_check
 
 # Import monitoring views
 from .monitoring import metrics, system_info
+from .metrics import prometheus_metrics
+from .profiling import profile_list, profile_download
 
 # Configure DRF Router
 router = DefaultRouter()
@@ -50,9 +52,14 @@ urlpatterns = [
     path('health/live/', live_check, name='live_check'),
 
     # Monitoring and Metrics Endpoints
-    path('metrics/', metrics, name='metrics'),
+    path('metrics/', prometheus_metrics, name='prometheus_metrics'),
+    path('metrics/summary/', metrics, name='metrics'),
     path('system/', system_info, name='system_info'),
 
+    # Perfiles de requests capturados a pedido (solo administradores)
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/<str:profile_id>/<str:kind>/', profile_download, name='profile_download'),
+
     # Módulo 2: Gestión de Variables y Datos
     path('api/measurements/', include('measurements.urls')),
 ]
\ No newline at end of file
@@ -26,8 +26,13 @@ class StationSerializer(serializers.ModelSerializer):
 
 
 class StationListSerializer(serializers.ModelSerializer):
-    """Serializer simplificado para listados"""
-    has_active_sensors = serializers.ReadOnlyField()
+    """
+    Serializer simplificado para listados
+
+    Usa las anotaciones active_sensors_exist y assigned_users_total de
+    StationViewSet cuando están presentes, para no consultar por fila.
+    """
+    has_active_sensors = serializers.SerializerMethodField()
     assigned_users_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -37,7 +42,14 @@ class StationListSerializer(serializers.ModelSerializer):
             'is_active', 'has_active_sensors', 'assigned_users_count'
         ]
 
+    def get_has_active_sensors(self, obj):
+        if hasattr(obj, 'active_sensors_exist'):
+            return obj.active_sensors_exist
+        return obj.has_active_sensors()
+
     def get_assigned_users_count(self, obj):
+        if hasattr(obj, 'assigned_users_total'):
+            return obj.assigned_users_total
         return obj.assigned_users.count()
 
 
@@ -0,0 +1,50 @@
+"""
+Señales de la app stations
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from rioclaro_api.access_scope import invalidate_access_scope
+from .models import Station, StationAssignment
+
+
+def _invalidate_users(user_ids):
+    """Invalida el alcance de los usuarios ahora y al confirmar la transacción"""
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        invalidate_access_scope(user_id)
+
+    def invalidate():
+        for user_id in user_ids:
+            invalidate_access_scope(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=StationAssignment)
+@receiver(post_delete, sender=StationAssignment)
+def invalidate_assignment_scope(sender, instance, **kwargs):
+    """
+    Invalida las estaciones accesibles en caché del usuario asignado.
+
+    Se invalida también al confirmar la transacción, para que ningún worker
+    conserve el conjunto previo al commit.
+    """
+    _invalidate_users([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Station.assigned_users.through)
+def invalidate_assigned_users_scope(sender, instance, action, reverse, pk_set, **kwargs):
+    """Cambios vía station.assigned_users / user.assigned_stations (add, remove, clear)"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # instance es el usuario
+        _invalidate_users([instance.pk])
+    elif action == 'pre_clear':
+        _invalidate_users(instance.assigned_users.values_list('id', flat=True))
+    else:
+        _invalidate_users(pk_set or [])
@@ -1,3 +1,111 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from rioclaro_api.query_budget import QueryBudgetExceeded
+from sensors.models import Sensor
+from users.models import CustomUser, UserRole
+
+from .models import Station, StationAssignment
+from .views import StationViewSet
+
+
+class StationQueryBudgetTests(TestCase):
+    """Las vistas de estaciones no superan su presupuesto de consultas (RF1)"""
+
+    station_count = 8
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@rioclaro.test', password='clave-segura',
+            role=UserRole.ADMIN, first_name='Ana', last_name='Admin'
+        )
+        self.observers = [
+            CustomUser.objects.create_user(
+                username=f'observer{number}', email=f'observer{number}@rioclaro.test',
+                password='clave-segura', role=UserRole.OBSERVER,
+                first_name='Oscar', last_name=f'Observador {number}'
+            )
+            for number in range(3)
+        ]
+        self.stations = []
+        for number in range(self.station_count):
+            station = Station.objects.create(
+                name=f'Estación {number}', code=f'EST_{number}', latitude=-39.8, longitude=-73.2
+            )
+            self.stations.append(station)
+            for sensor_type in ('water_level', 'temperature'):
+                Sensor.objects.create(
+                    station=station, name=f'{sensor_type} {number}', sensor_type=sensor_type, unit='cm'
+                )
+            for observer in self.observers:
+                StationAssignment.objects.create(user=observer, station=station, assigned_by=self.admin)
+
+        self.client = APIClient(HTTP_USER_AGENT='Mozilla/5.0')
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_station_list_and_detail(self):
+        for user in (self.admin, self.observers[0]):
+            response = self.get(user, reverse('station-list'))
+            self.assertEqual(response.data['count'], self.station_count)
+            self.assertTrue(all(row['has_active_sensors'] for row in response.data['results']))
+
+            response = self.get(user, reverse('station-detail', args=[self.stations[0].pk]))
+            self.assertEqual(response.data['code'], 'EST_0')
+
+    def test_assignment_list(self):
+        response = self.get(self.admin, reverse('stationassignment-list'))
+        self.assertEqual(response.data['count'], self.station_count * len(self.observers))
+
+        response = self.get(self.observers[0], reverse('stationassignment-list'))
+        self.assertEqual(response.data['count'], self.station_count)
+
+    def test_budget_is_enforced(self):
+        self.client.force_authenticate(self.admin)
+
+        with mock.patch.object(StationViewSet, 'query_budget', {'list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('station-list'))
+
+
+class ProfilingFlagTests(TestCase):
+    """Sólo el flag "1" de un administrador perfila el request"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(PROFILING_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        admin = CustomUser.objects.create_user(
+            username='admin', email='admin@rioclaro.test', password='clave-segura',
+            role=UserRole.ADMIN, first_name='Ana', last_name='Admin'
+        )
+        self.client = APIClient(HTTP_USER_AGENT='Mozilla/5.0')
+        self.client.force_login(admin)
+        self.url = reverse('station-list')
+
+    def test_flag_one_profiles(self):
+        self.assertIn('X-Profile-Id', self.client.get(self.url, {'_profile': '1'}))
+        self.assertIn('X-Profile-Id', self.client.get(self.url, HTTP_X_PROFILE='1'))
+
+    def test_other_values_do_not_profile(self):
+        for response in (
+            self.client.get(self.url, {'_profile': '0'}),
+            self.client.get(self.url, {'_profile': ''}),
+            self.client.get(self.url, {'search_profile': '1'}),
+            self.client.get(self.url, HTTP_X_PROFILE='0'),
+            self.client.get(self.url, HTTP_X_PROFILE=''),
+        ):
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
@@ -2,6 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, OuterRef
+from sensors.models import Sensor
 from .models import Station, StationAssignment
 from .serializers import StationSerializer, StationListSerializer, StationAssignmentSerializer
 
@@ -11,6 +13,22 @@ User = get_user_model()
 class StationViewSet(viewsets.ModelViewSet):
     queryset = Station.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    # Sesión y usuario + conteo y página del listado
+    query_budget = {'list': 6, 'retrieve': 6}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Sensores activos y usuarios asignados en la misma consulta del listado
+            queryset = queryset.annotate(
+                active_sensors_exist=Exists(
+                    Sensor.objects.filter(station=OuterRef('pk'), is_active=True)
+                ),
+                assigned_users_total=Count('assigned_users', distinct=True)
+            ).order_by(*Station._meta.ordering)  # el GROUP BY descarta Meta.ordering
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related('assigned_users')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -143,10 +161,13 @@ class StationAssignmentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = StationAssignment.objects.all()
     serializer_class = StationAssignmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 6, 'retrieve': 5}
 
     def get_queryset(self):
         """Filtrar por usuario si no es admin"""
+        # El serializer muestra usuario, estación y quién asignó
+        queryset = StationAssignment.objects.select_related('user', 'station', 'assigned_by')
         if self.request.user.is_admin():
-            return StationAssignment.objects.all()
+            return queryset
         else:
-            return StationAssignment.objects.filter(user=self.request.user)
\ No newline at end of file
+            return queryset.filter(user=self.request.user)
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Microbenchmark del análisis de contenido de AuditLogMiddleware por tamaño de payload
+
+Compara la implementación anterior (cuerpo completo decodificado y un
+re.search por patrón) con el escáner con prefiltro de literales y el tope de
+AUDIT_BODY_SCAN_LIMIT, para lotes de ingesta de distinto tamaño.
+"""
+import json
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from users.middleware import AuditLogMiddleware
+
+
+def legacy_scan(request):
+    """Implementación anterior: cuerpo completo y un re.search por patrón"""
+    request_data = request.body.decode('utf-8')
+    full_content = f"{request.path} {request_data} {request.META.get('HTTP_USER_AGENT', '')}"
+    indicators = []
+    for pattern in AuditLogMiddleware.SUSPICIOUS_PATTERNS:
+        if re.search(pattern, full_content, re.IGNORECASE):
+            indicators.append(f"Pattern match: {pattern}")
+    ua_lower = request.META.get('HTTP_USER_AGENT', '').lower()
+    if any(pattern in ua_lower for pattern in AuditLogMiddleware.SUSPICIOUS_USER_AGENTS):
+        indicators.append('Suspicious User-Agent')
+    return indicators
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo del análisis de contenido de AuditLogMiddleware por tamaño de payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='1,100,1000',
+            help='Filas por lote separadas por coma (por defecto 1,100,1000)',
+        )
+        parser.add_argument('--iterations', type=int, default=50, help='Repeticiones por tamaño (por defecto 50)')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        iterations = options['iterations']
+        middleware = AuditLogMiddleware(lambda request: None)
+        factory = RequestFactory()
+        limit = getattr(settings, 'AUDIT_BODY_SCAN_LIMIT', 64 * 1024)
+
+        self.stdout.write(f'🔄 {iterations} repeticiones por tamaño, tope de análisis {limit} bytes')
+
+        for size in sizes:
+            payload = json.dumps({'measurements': [
+                {
+                    'station': 1,
+                    'sensor': 1,
+                    'measurement_type': 'water_level',
+                    'value': '245.50',
+                    'unit': 'cm',
+                    'timestamp': '2024-01-15T10:30:00Z',
+                    'metadata': {'device_id': f'PLC{row:04d}', 'signal_strength': 95},
+                }
+                for row in range(size)
+            ]})
+            request = factory.post(
+                '/api/measurements/batch/',
+                data=payload,
+                content_type='application/json',
+                HTTP_USER_AGENT='Mozilla/5.0 (X11; Linux x86_64) Gateway/1.0',
+            )
+            request.body  # leer el stream una vez, como lo hace la vista
+
+            legacy = self._time(iterations, lambda: legacy_scan(request))
+            current = self._time(
+                iterations,
+                lambda: middleware._detect_suspicious_activity(request, middleware._get_request_data(request))
+            )
+
+            self.stdout.write(
+                f'  ✓ {size:>5} filas ({len(payload) / 1024:,.1f} KB): '
+                f'anterior {legacy * 1e6:,.0f} µs, actual {current * 1e6:,.0f} µs '
+                f'({legacy / current if current else 0:,.1f}x)'
+            )
+
+        self.stdout.write('  ✓ Tokens de dispositivo: el escáner se omite (costo ≈ 0)')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+
+    def _time(self, iterations, function):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - started) / iterations
@@ -0,0 +1,122 @@
+"""
+Microbenchmark del motor de rate limiting frente a los contadores get/set
+
+Ejecuta el mismo número de verificaciones desde varios hilos contra la caché
+configurada y compara tiempo, operaciones de caché por verificación e
+incrementos perdidos (conteo final vs. requests realizados).
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand
+
+from rioclaro_api.rate_limiter import RateLimit, RateLimiter
+
+
+class CountingCache:
+    """Envuelve la caché contando las operaciones (round trips) realizadas"""
+
+    COUNTED = ('get', 'set', 'add', 'incr', 'get_many', 'set_many', 'delete')
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._lock = threading.Lock()
+        self.operations = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._backend, name)
+        if name not in self.COUNTED:
+            return attribute
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.operations += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+def legacy_check(backend, key, limit, window):
+    """Implementación anterior: cache.get seguido de cache.set(count + 1)"""
+    current_count = backend.get(key, 0)
+    if current_count >= limit:
+        return False
+    backend.set(key, current_count + 1, window)
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Compara el motor de rate limiting atómico con los contadores get/set bajo concurrencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Hilos concurrentes (por defecto 8)')
+        parser.add_argument('--requests', type=int, default=2000, help='Verificaciones por hilo (por defecto 2000)')
+        parser.add_argument('--limits', type=int, default=1, help='Límites evaluados por request (por defecto 1)')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        per_thread = options['requests']
+        limit_count = options['limits']
+        total = threads * per_thread
+
+        self.stdout.write(
+            f'🔄 {threads} hilos × {per_thread} verificaciones, {limit_count} límite(s) por request '
+            f'({caches["default"].__class__.__name__})'
+        )
+
+        # Límites altos y ventana larga: ninguna verificación se rechaza y el
+        # conteo final debe ser igual al número de requests
+        rate_limits = [RateLimit(f'bench{position}', total * 10, 86400) for position in range(limit_count)]
+        run_id = uuid.uuid4().hex[:8]
+
+        # Implementación anterior
+        legacy_cache = CountingCache(cache)
+        legacy_keys = [f'bench_legacy:{run_id}:{rate_limit.name}' for rate_limit in rate_limits]
+
+        def legacy_worker():
+            for _ in range(per_thread):
+                for key, rate_limit in zip(legacy_keys, rate_limits):
+                    legacy_check(legacy_cache, key, rate_limit.limit, rate_limit.window)
+
+        legacy_time = self._run(threads, legacy_worker)
+        legacy_counts = [cache.get(key, 0) for key in legacy_keys]
+        cache.delete_many(legacy_keys)
+
+        # Motor atómico
+        engine_cache = CountingCache(cache)
+        engine = RateLimiter(shared=engine_cache, prefix=f'bench_engine:{run_id}')
+        checks = [(rate_limit, 'client') for rate_limit in rate_limits]
+
+        def engine_worker():
+            for _ in range(per_thread):
+                engine.hit(checks)
+
+        engine_time = self._run(threads, engine_worker)
+        now = time.time()
+        engine_counts = []
+        for rate_limit in rate_limits:
+            index = int(now // rate_limit.window)
+            keys = [f'bench_engine:{run_id}:{rate_limit.name}:client:{index - offset}' for offset in (0, 1)]
+            engine_counts.append(sum(cache.get_many(keys).values()))
+            cache.delete_many(keys)
+
+        self._report('get/set (anterior)', legacy_time, total, legacy_cache.operations, legacy_counts)
+        self._report('incr atómico (motor)', engine_time, total, engine_cache.operations, engine_counts)
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark completado'))
+
+    def _run(self, threads, target):
+        workers = [threading.Thread(target=target) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started
+
+    def _report(self, label, elapsed, total, operations, counts):
+        lost = sum(total - count for count in counts)
+        self.stdout.write(f'  ✓ {label}:')
+        self.stdout.write(f'      {total / elapsed:,.0f} requests/s ({elapsed:.2f}s)')
+        self.stdout.write(f'      {operations / total:.2f} operaciones de caché por request')
+        self.stdout.write(f'      incrementos perdidos: {lost} de {total * len(counts)}')
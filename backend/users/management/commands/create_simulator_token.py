@@ -1,9 +1,13 @@
 import secrets
 
 from django.core.management.base import BaseCommand
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from rest_framework.authtoken.models import Token
 
+from users.ratelimit import SENSOR_DEVICE_GROUP, invalidate_device_token
+
 class Command(BaseCommand):
     help = 'Crear token de autenticación para el simulador Arduino'
 
@@ -66,8 +70,18 @@ class Command(BaseCommand):
                     self.style.SUCCESS('✅ Password del usuario actualizado')
                 )
 
+        # Clase de dispositivo: rate limit por token y no por IP
+        device_group, _ = Group.objects.get_or_create(
+            name=getattr(settings, 'SENSOR_DEVICE_GROUP', SENSOR_DEVICE_GROUP)
+        )
+        user.groups.add(device_group)
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Usuario agregado al grupo de dispositivos "{device_group.name}"')
+        )
+
         # Crear o obtener token
         token, token_created = Token.objects.get_or_create(user=user)
+        invalidate_device_token(token.key)
 
         if token_created:
             self.stdout.write(
@@ -12,6 +12,7 @@ import logging
 import time
 import json
 import re
+from functools import lru_cache
 from datetime import datetime, timedelta
 from django.core.cache import cache
 from django.http import HttpResponseForbidden, JsonResponse
@@ -21,6 +22,8 @@ from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from django.urls import reverse
 from user_agents import parse
+from rioclaro_api.rate_limiter import RateLimit, rate_limiter
+from .ratelimit import RateLimitConfig, get_device_token_identifier
 import hashlib
 
 # Configurar logger específico para seguridad
@@ -31,36 +34,68 @@ class SessionTimeoutMiddleware(MiddlewareMixin):
     """
     Middleware para manejar timeout de sesiones automáticamente.
     Cierra sesiones después del tiempo configurado de inactividad.
+
+    La última actividad exacta se guarda en caché en cada request (escritura
+    barata) y sólo se persiste en la sesión cuando avanza más de
+    SESSION_ACTIVITY_GRANULARITY_SECONDS (60 por defecto). Así un cliente que
+    consulta el dashboard cada pocos segundos no provoca un UPDATE de la
+    sesión por request. El timeout se evalúa con la actividad más reciente
+    entre la caché y la sesión, por lo que se mantiene la misma semántica; si
+    la caché se pierde, la sesión atrasa como máximo una granularidad.
     """
 
+    ACTIVITY_CACHE_PREFIX = 'session_activity'
+
     def process_request(self, request):
         if request.user.is_authenticated:
             current_time = now()
-            last_activity = request.session.get('last_activity')
+            rioclaro_settings = getattr(settings, 'RIOCLARO_SETTINGS', {})
+            timeout_minutes = rioclaro_settings.get('SESSION_TIMEOUT_MINUTES', 480)
+            granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY_SECONDS', 60)
+
+            activity_key = self._activity_cache_key(request)
+            stored_activity = request.session.get('last_activity')
+            cached_activity = cache.get(activity_key) if activity_key else None
 
-            if last_activity:
-                last_activity = datetime.fromisoformat(last_activity)
-                timeout_minutes = getattr(
-                    settings,
-                    'RIOCLARO_SETTINGS', {}
-                ).get('SESSION_TIMEOUT_MINUTES', 480)
+            activities = [
+                datetime.fromisoformat(value)
+                for value in (stored_activity, cached_activity) if value
+            ]
+            if activities:
+                last_activity = max(activities)
 
                 if current_time - last_activity > timedelta(minutes=timeout_minutes):
                     security_logger.warning(
                         f"Session timeout for user {request.user.username} "
                         f"from IP {self._get_client_ip(request)}"
                     )
+                    if activity_key:
+                        cache.delete(activity_key)
                     logout(request)
                     return JsonResponse({
                         'error': 'Session expired due to inactivity',
                         'code': 'SESSION_TIMEOUT'
                     }, status=401)
 
-            # Actualizar last_activity
-            request.session['last_activity'] = current_time.isoformat()
+            # Actualizar last_activity: caché siempre, sesión sólo por granularidad
+            if activity_key:
+                cache.set(activity_key, current_time.isoformat(), timeout_minutes * 60)
+
+            if (
+                not stored_activity
+                or current_time - datetime.fromisoformat(stored_activity) >= timedelta(seconds=granularity)
+            ):
+                request.session['last_activity'] = current_time.isoformat()
 
         return None
 
+    def _activity_cache_key(self, request):
+        """Clave de caché de la actividad; None si la sesión aún no tiene clave"""
+        session_key = request.session.session_key
+        if not session_key:
+            return None
+        return f"{self.ACTIVITY_CACHE_PREFIX}:{session_key}"
+
     def _get_client_ip(self, request):
         """Obtener IP real del cliente considerando proxies"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -71,10 +106,61 @@ class SessionTimeoutMiddleware(MiddlewareMixin):
         return ip
 
 
+class SuspiciousContentScanner:
+    """
+    Escáner de contenido sospechoso con prefiltro de literales
+
+    Cada patrón tiene un literal obligatorio (p.ej. 'union' para
+    union\s+select). El contenido se pasa a minúsculas una sola vez y cada
+    literal se busca con la búsqueda de subcadenas nativa de str, mucho más
+    rápida que el motor de expresiones regulares; sólo si el literal aparece
+    se confirma con el patrón precompilado. Una alternación única de todos
+    los patrones resultó más lenta que búsquedas separadas, porque el módulo
+    re no optimiza alternaciones de literales.
+    """
+
+    def __init__(self, patterns, user_agent_patterns):
+        self.patterns = [
+            (pattern, literal.lower(), re.compile(pattern, re.IGNORECASE))
+            for pattern, literal in patterns
+        ]
+        self.user_agent_patterns = [pattern.lower() for pattern in user_agent_patterns]
+
+    def scan(self, content):
+        """Patrones presentes en el contenido, en el orden en que se definieron"""
+        lowered = content.lower()
+        return [
+            pattern
+            for pattern, literal, regex in self.patterns
+            if literal in lowered and regex.search(lowered)
+        ]
+
+    def is_suspicious_user_agent(self, user_agent):
+        ua_lower = user_agent.lower()
+        return any(pattern in ua_lower for pattern in self.user_agent_patterns)
+
+
+@lru_cache(maxsize=1024)
+def _parse_user_agent(user_agent):
+    """Resumen del user agent; los clientes repiten pocos valores distintos"""
+    parsed = parse(user_agent)
+    return {
+        'browser': f"{parsed.browser.family} {parsed.browser.version_string}",
+        'os': f"{parsed.os.family} {parsed.os.version_string}",
+        'device': parsed.device.family,
+    }
+
+
 class AuditLogMiddleware(MiddlewareMixin):
     """
     Middleware para auditoría completa de requests y detección de actividad sospechosa.
     Registra intentos de autenticación, accesos a endpoints sensibles y patrones de ataque.
+
+    El cuerpo se analiza sólo hasta AUDIT_BODY_SCAN_LIMIT bytes (por defecto
+    64 KB). La ingesta con token de dispositivo (POST de sensores/PLC a los
+    endpoints de DEVICE_INGEST_URLS) no pasa por el escáner de contenido; el
+    resto de los requests de dispositivos sí. Todos los requests con token de
+    dispositivo usan su rate limit propio.
     """
 
     # Patrones sospechosos comunes
@@ -89,6 +175,36 @@ class AuditLogMiddleware(MiddlewareMixin):
         r'onerror\s*=',          # Error handler injection
     ]
 
+    # User agents de herramientas de ataque o clientes automatizados
+    SUSPICIOUS_USER_AGENTS = [
+        'sqlmap', 'nikto', 'nmap', 'masscan', 'zap', 'burp',
+        'python-requests', 'curl', 'wget', 'gobuster',
+        'dirb', 'dirbuster', 'wpscan', 'nuclei'
+    ]
+
+    # Literal obligatorio de cada patrón (prefiltro del escáner)
+    SUSPICIOUS_PATTERN_LITERALS = [
+        '../', '<script', 'union', 'exec', 'javascript:', 'vbscript:', 'onload', 'onerror',
+    ]
+
+    scanner = SuspiciousContentScanner(
+        zip(SUSPICIOUS_PATTERNS, SUSPICIOUS_PATTERN_LITERALS),
+        SUSPICIOUS_USER_AGENTS
+    )
+
+    # Límite: 100 requests por minuto por IP por path
+    PATH_RATE_LIMIT = RateLimit('audit_path', 100, 60)
+    # Tokens de dispositivo: límite propio por token en lugar de por IP
+    DEVICE_RATE_LIMIT = RateLimitConfig.get_rate_limit('sensor_device')
+
+    # Endpoints de ingesta que omiten el escáner con token de dispositivo
+    DEVICE_INGEST_URLS = [
+        'measurements:measurement-create',
+        'measurements:measurement-batch-create',
+        'measurements:extensible-measurements-list',
+        'measurements:extensible-measurements-bulk-create',
+    ]
+
     # Endpoints sensibles que requieren auditoría especial
     SENSITIVE_ENDPOINTS = [
         '/api/auth/',
@@ -104,10 +220,14 @@ class AuditLogMiddleware(MiddlewareMixin):
         # Obtener información del request
         client_ip = self._get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
-        request_data = self._get_request_data(request)
+        device = get_device_token_identifier(request)
 
-        # Detectar patrones sospechosos
-        suspicious_activity = self._detect_suspicious_activity(request, request_data)
+        # Detectar patrones sospechosos (la ingesta de dispositivos autenticados se omite)
+        if device and self._is_device_ingest(request):
+            suspicious_activity = []
+        else:
+            request_data = self._get_request_data(request)
+            suspicious_activity = self._detect_suspicious_activity(request, request_data)
 
         if suspicious_activity:
             security_logger.critical(
@@ -124,15 +244,24 @@ class AuditLogMiddleware(MiddlewareMixin):
                     'code': 'SECURITY_BLOCK'
                 }, status=403)
 
-        # Rate limiting por IP para requests sospechosos
-        if self._check_rate_limit(client_ip, request.path):
+        # Rate limiting: tokens de sensores/PLC por token, el resto por IP y path
+        if device:
+            exceeded = rate_limiter.check([(self.DEVICE_RATE_LIMIT, device)])
+        else:
+            exceeded = self._check_rate_limit(client_ip, request.path)
+
+        if exceeded:
             security_logger.warning(
-                f"RATE LIMIT EXCEEDED for IP {client_ip} on path {request.path}"
+                f"RATE LIMIT EXCEEDED for {'device token ' + device if device else 'IP ' + client_ip} "
+                f"on path {request.path}"
             )
-            return JsonResponse({
+            response = JsonResponse({
                 'error': 'Rate limit exceeded',
-                'code': 'RATE_LIMIT_EXCEEDED'
+                'code': 'RATE_LIMIT_EXCEEDED',
+                'retry_after': exceeded.retry_after
             }, status=429)
+            response['Retry-After'] = str(exceeded.retry_after)
+            return response
 
         return None
 
@@ -172,7 +301,8 @@ class AuditLogMiddleware(MiddlewareMixin):
         """Obtener datos del request de manera segura"""
         try:
             if request.content_type == 'application/json':
-                return request.body.decode('utf-8')
+                limit = getattr(settings, 'AUDIT_BODY_SCAN_LIMIT', 64 * 1024)
+                return request.body[:limit].decode('utf-8', errors='ignore')
             elif hasattr(request, 'POST') and request.POST:
                 # No loggear passwords
                 data = dict(request.POST)
@@ -190,10 +320,9 @@ class AuditLogMiddleware(MiddlewareMixin):
         # Combinar URL, headers y datos para análisis
         full_content = f"{request.path} {request_data} {request.META.get('HTTP_USER_AGENT', '')}"
 
-        # Buscar patrones sospechosos
-        for pattern in self.SUSPICIOUS_PATTERNS:
-            if re.search(pattern, full_content, re.IGNORECASE):
-                suspicious_indicators.append(f"Pattern match: {pattern}")
+        # Buscar patrones sospechosos (prefiltro de literales + patrones precompilados)
+        for pattern in self.scanner.scan(full_content):
+            suspicious_indicators.append(f"Pattern match: {pattern}")
 
         # Detectar user agents sospechosos
         user_agent = request.META.get('HTTP_USER_AGENT', '')
@@ -212,14 +341,7 @@ class AuditLogMiddleware(MiddlewareMixin):
 
     def _is_suspicious_user_agent(self, user_agent):
         """Detectar user agents sospechosos"""
-        suspicious_ua_patterns = [
-            'sqlmap', 'nikto', 'nmap', 'masscan', 'zap', 'burp',
-            'python-requests', 'curl', 'wget', 'gobuster',
-            'dirb', 'dirbuster', 'wpscan', 'nuclei'
-        ]
-
-        ua_lower = user_agent.lower()
-        return any(pattern in ua_lower for pattern in suspicious_ua_patterns)
+        return self.scanner.is_suspicious_user_agent(user_agent)
 
     def _should_block_request(self, suspicious_indicators):
         """Decidir si bloquear un request basado en indicadores sospechosos"""
@@ -230,22 +352,26 @@ class AuditLogMiddleware(MiddlewareMixin):
                 return True
         return False
 
-    def _check_rate_limit(self, ip, path):
-        """Rate limiting básico por IP"""
-        cache_key = f"rate_limit:{hashlib.md5(ip.encode()).hexdigest()}:{path}"
-        current_requests = cache.get(cache_key, 0)
+    def _is_device_ingest(self, request):
+        return request.method == 'POST' and request.path_info in self._device_ingest_paths()
 
-        # Límite: 100 requests por minuto por IP por path
-        if current_requests > 100:
-            return True
+    @classmethod
+    @lru_cache(maxsize=1)
+    def _device_ingest_paths(cls):
+        return frozenset(reverse(name) for name in cls.DEVICE_INGEST_URLS)
 
-        cache.set(cache_key, current_requests + 1, 60)  # TTL 60 segundos
-        return False
+    def _check_rate_limit(self, ip, path):
+        """
+        Rate limiting básico por IP (contador atómico, ver rioclaro_api.rate_limiter)
+
+        Retorna la decisión del límite excedido o None
+        """
+        identifier = f"{hashlib.md5(ip.encode()).hexdigest()}:{path}"
+        return rate_limiter.check([(self.PATH_RATE_LIMIT, identifier)])
 
     def _log_request_response(self, request, response, duration):
         """Log detallado de request/response"""
         client_ip = self._get_client_ip(request)
-        user_agent_parsed = parse(request.META.get('HTTP_USER_AGENT', ''))
 
         log_data = {
             'timestamp': now().isoformat(),
@@ -255,11 +381,7 @@ class AuditLogMiddleware(MiddlewareMixin):
             'path': request.path,
             'status_code': response.status_code,
             'duration': round(duration, 3),
-            'user_agent': {
-                'browser': f"{user_agent_parsed.browser.family} {user_agent_parsed.browser.version_string}",
-                'os': f"{user_agent_parsed.os.family} {user_agent_parsed.os.version_string}",
-                'device': user_agent_parsed.device.family,
-            },
+            'user_agent': _parse_user_agent(request.META.get('HTTP_USER_AGENT', '')),
             'referer': request.META.get('HTTP_REFERER', ''),
         }
 
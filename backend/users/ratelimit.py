@@ -6,6 +6,7 @@ Sistema avanzado de rate limiting con:
 2. Rate limiting por IP y por usuario
 3. Detección de patrones de abuso
 4. Integración con django-ratelimit
+5. Clase de dispositivo: tokens de sensores/PLC limitados por token, no por IP
 """
 
 import hashlib
@@ -14,6 +15,8 @@ from functools import wraps
 from django.core.cache import cache
 from django.http import JsonResponse
 from django.conf import settings
+from rioclaro_api.rate_limiter import RateLimit, rate_limiter
+from rioclaro_api.sketches import HyperLogLog
 try:
     from django_ratelimit.decorators import ratelimit
     from django_ratelimit.exceptions import Ratelimited
@@ -70,9 +73,20 @@ class RateLimitConfig:
             'block': True,
             'method': ['POST'],
             'key': 'user_or_ip'
+        },
+        # Gateways y PLC: varias estaciones pueden enviar desde una misma IP,
+        # por eso se limita por token; la capacidad real la regula el
+        # control de admisión de la ingesta (rioclaro_api.admission)
+        'sensor_device': {
+            'rate': '1200/min',
+            'block': True,
+            'method': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
+            'key': 'token'
         }
     }
 
+    RATE_PERIODS = {'s': 1, 'sec': 1, 'min': 60, 'm': 60, 'hour': 3600, 'h': 3600, 'day': 86400, 'd': 86400}
+
     @classmethod
     def get_limit_for_path(cls, path):
         """
@@ -89,6 +103,71 @@ class RateLimitConfig:
         else:
             return cls.LIMITS['public_api']
 
+    @classmethod
+    def get_limit_for_request(cls, request):
+        """
+        Tipo de rate limit del request: los tokens de dispositivo usan su
+        propia clase en cualquier path; el resto según el path
+        """
+        if get_device_token_identifier(request):
+            return cls.LIMITS['sensor_device']
+        return cls.get_limit_for_path(request.path)
+
+    @classmethod
+    def get_rate_limit(cls, name):
+        """RateLimit del motor compartido para una categoría de LIMITS"""
+        count, period = cls.LIMITS[name]['rate'].split('/')
+        return RateLimit(name, int(count), cls.RATE_PERIODS[period])
+
+
+# Grupo de usuarios cuyos tokens pertenecen a sensores/PLC (ver create_simulator_token)
+SENSOR_DEVICE_GROUP = 'sensor_devices'
+
+
+def get_request_token(request):
+    """Clave del header 'Authorization: Token <clave>' o None"""
+    parts = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(parts) == 2 and parts[0].lower() == 'token':
+        return parts[1]
+    return None
+
+
+def get_device_token_identifier(request):
+    """
+    Identificador (hash) del token de dispositivo del request, o None si el
+    request no usa un token de dispositivo
+
+    El resultado de la consulta se guarda en caché por token
+    (DEVICE_TOKEN_CACHE_TTL segundos, por defecto 300), incluido el negativo.
+    """
+    token_key = get_request_token(request)
+    if not token_key:
+        return None
+
+    digest = _device_token_digest(token_key)
+    cache_key = f"device_token:{digest}"
+    is_device = cache.get(cache_key)
+    if is_device is None:
+        from rest_framework.authtoken.models import Token
+        device_group = getattr(settings, 'SENSOR_DEVICE_GROUP', SENSOR_DEVICE_GROUP)
+        is_device = Token.objects.filter(
+            key=token_key,
+            user__is_active=True,
+            user__groups__name=device_group
+        ).exists()
+        cache.set(cache_key, is_device, getattr(settings, 'DEVICE_TOKEN_CACHE_TTL', 300))
+
+    return digest if is_device else None
+
+
+def invalidate_device_token(token_key):
+    """Descarta la clasificación en caché de un token (p.ej. al cambiar su grupo)"""
+    cache.delete(f"device_token:{_device_token_digest(token_key)}")
+
+
+def _device_token_digest(token_key):
+    return hashlib.sha256(token_key.encode()).hexdigest()[:16]
+
 
 def get_client_identifier(request, key_type='ip'):
     """
@@ -109,6 +188,11 @@ def get_client_identifier(request, key_type='ip'):
         if request.user.is_authenticated:
             return f"user_{request.user.id}"
         return f"ip_{get_client_identifier(request, 'ip')}"
+    elif key_type == 'token':
+        device = get_device_token_identifier(request)
+        if device:
+            return f"token_{device}"
+        return f"ip_{get_client_identifier(request, 'ip')}"
     return 'unknown'
 
 
@@ -119,7 +203,7 @@ def smart_ratelimit(view_func):
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         # Obtener configuración para este path
-        limit_config = RateLimitConfig.get_limit_for_path(request.path)
+        limit_config = RateLimitConfig.get_limit_for_request(request)
 
         # Aplicar rate limiting usando django-ratelimit
         rate = limit_config['rate']
@@ -158,6 +242,21 @@ class AdvancedRateLimiter:
     Sistema avanzado de rate limiting con detección de patrones de abuso
     """
 
+    # Más de 20 requests en 10 segundos es sospechoso
+    BURST_LIMIT = RateLimit('advanced_burst', 20, 10)
+    # Más de 50 requests por hora de un user agent sospechoso
+    SUSPICIOUS_UA_LIMIT = RateLimit('advanced_suspicious_ua', 50, 3600)
+
+    # Crawling: más de 50 paths únicos por hora; sketch de 2**8 registros
+    CRAWL_UNIQUE_PATHS_LIMIT = 50
+    CRAWL_SKETCH_PRECISION = 8
+
+    # User agents sospechosos comunes en ataques
+    SUSPICIOUS_USER_AGENTS = [
+        'python-requests', 'curl/', 'wget/', 'Go-http-client',
+        'Apache-HttpClient', 'Java/', 'node-fetch'
+    ]
+
     def __init__(self):
         self.cache_prefix = 'advanced_ratelimit'
         self.abuse_threshold = 10  # Número de violaciones antes de considerar abuso
@@ -167,15 +266,11 @@ class AdvancedRateLimiter:
         Detectar patrones avanzados de abuso
         """
         client_ip = get_client_identifier(request, 'ip')
-        current_time = int(time.time())
-
-        # Detectar ráfagas de requests
-        if self._detect_burst_pattern(client_ip, current_time):
-            return self._create_abuse_response('burst_detected')
 
-        # Detectar requests distribuidos sospechosos
-        if self._detect_distributed_pattern(request):
-            return self._create_abuse_response('distributed_attack')
+        # Ráfagas y user agents sospechosos se evalúan en una sola pasada
+        abuse_type = self._detect_rate_patterns(request, client_ip)
+        if abuse_type:
+            return self._create_abuse_response(abuse_type)
 
         # Detectar crawling agresivo
         if self._detect_aggressive_crawling(client_ip, request.path):
@@ -183,67 +278,63 @@ class AdvancedRateLimiter:
 
         return None
 
-    def _detect_burst_pattern(self, client_ip, current_time):
-        """
-        Detectar ráfagas de requests en ventanas de tiempo cortas
+    def _detect_rate_patterns(self, request, client_ip):
         """
-        # Ventana de 10 segundos
-        window_key = f"{self.cache_prefix}:burst:{client_ip}:{current_time // 10}"
-        request_count = cache.get(window_key, 0)
+        Detectar ráfagas de requests y ataques distribuidos por user-agent
 
-        # Más de 20 requests en 10 segundos es sospechoso
-        if request_count > 20:
-            rate_logger.warning(f"Burst pattern detected from IP {client_ip}: {request_count} requests in 10s")
-            return True
-
-        cache.set(window_key, request_count + 1, 15)  # TTL 15 segundos
-        return False
-
-    def _detect_distributed_pattern(self, request):
-        """
-        Detectar posibles ataques distribuidos basados en user-agent y patrones
+        Todos los contadores se incrementan en una sola pasada del motor de
+        rate limiting (incr atómico, ver rioclaro_api.rate_limiter).
+        Retorna el tipo de abuso detectado o None.
         """
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        checks = [('burst_detected', self.BURST_LIMIT, client_ip)]
 
-        # User agents sospechosos comunes en ataques
-        suspicious_uas = [
-            'python-requests', 'curl/', 'wget/', 'Go-http-client',
-            'Apache-HttpClient', 'Java/', 'node-fetch'
-        ]
-
-        if any(ua in user_agent for ua in suspicious_uas):
-            # Contar requests de este tipo de UA
+        # Contar requests de user agents sospechosos comunes en ataques
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        if any(ua in user_agent for ua in self.SUSPICIOUS_USER_AGENTS):
             ua_hash = hashlib.md5(user_agent.encode()).hexdigest()[:8]
-            ua_key = f"{self.cache_prefix}:suspicious_ua:{ua_hash}"
-            ua_count = cache.get(ua_key, 0)
-
-            if ua_count > 50:  # Más de 50 requests por hora de UA sospechoso
+            checks.append(('distributed_attack', self.SUSPICIOUS_UA_LIMIT, ua_hash))
+
+        decisions = rate_limiter.hit(
+            [(rate_limit, identifier) for _, rate_limit, identifier in checks]
+        )
+        for (abuse_type, _, _), decision in zip(checks, decisions):
+            if decision.allowed:
+                continue
+            if abuse_type == 'burst_detected':
+                rate_logger.warning(f"Burst pattern detected from IP {client_ip}: {decision.count:.0f} requests in 10s")
+            else:
                 rate_logger.warning(f"Distributed pattern detected with UA: {user_agent[:50]}")
-                return True
+            return abuse_type
 
-            cache.set(ua_key, ua_count + 1, 3600)  # TTL 1 hora
-
-        return False
+        return None
 
     def _detect_aggressive_crawling(self, client_ip, path):
         """
         Detectar crawling agresivo de endpoints
+
+        Los paths únicos por IP se estiman con un HyperLogLog de tamaño fijo
+        (256 bytes) por hora, en lugar de guardar el conjunto de paths. Un
+        path ya visto no modifica el sketch, así que sólo se escribe en caché
+        cuando cambia.
         """
-        # Contar requests únicos por path
-        path_key = f"{self.cache_prefix}:paths:{client_ip}"
-        paths_accessed = cache.get(path_key, set())
+        window = int(time.time() // 3600)
+        path_key = f"{self.cache_prefix}:paths:{client_ip}:{window}"
+        stored = cache.get(path_key)
 
-        if isinstance(paths_accessed, str):  # Compatibilidad
-            paths_accessed = set()
+        if isinstance(stored, bytes) and len(stored) == 1 << self.CRAWL_SKETCH_PRECISION:
+            sketch = HyperLogLog.from_bytes(stored)
+        else:
+            sketch = HyperLogLog(self.CRAWL_SKETCH_PRECISION)
 
-        paths_accessed.add(path)
+        if sketch.add(path):
+            cache.set(path_key, sketch.to_bytes(), 3600)  # TTL 1 hora (ventana horaria)
 
         # Más de 50 paths únicos por hora es crawling agresivo
-        if len(paths_accessed) > 50:
-            rate_logger.warning(f"Aggressive crawling detected from IP {client_ip}: {len(paths_accessed)} unique paths")
+        unique_paths = sketch.count()
+        if unique_paths > self.CRAWL_UNIQUE_PATHS_LIMIT:
+            rate_logger.warning(f"Aggressive crawling detected from IP {client_ip}: ~{unique_paths} unique paths")
             return True
 
-        cache.set(path_key, paths_accessed, 3600)  # TTL 1 hora
         return False
 
     def _create_abuse_response(self, abuse_type):
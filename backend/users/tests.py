@@ -1,3 +1,46 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import CustomUser, UserRole
+from .ratelimit import SENSOR_DEVICE_GROUP
+
+
+class DeviceTokenAuditTests(TestCase):
+    """El token de dispositivo omite el escáner de contenido sólo en la ingesta"""
+
+    payload = "<script>alert(1)</script>"
+
+    def setUp(self):
+        cache.clear()
+        device = CustomUser.objects.create_user(
+            username='plc-01', email='plc@rioclaro.test', password='clave-segura',
+            role=UserRole.OBSERVER, first_name='PLC', last_name='Estación'
+        )
+        device.groups.add(Group.objects.create(name=SENSOR_DEVICE_GROUP))
+        token = Token.objects.create(user=device)
+
+        self.client = APIClient(HTTP_USER_AGENT='Mozilla/5.0')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_ingest_endpoint_skips_scan(self):
+        response = self.client.post(
+            reverse('measurements:measurement-batch-create'),
+            {'measurements': [{'notes': self.payload}]},
+            format='json'
+        )
+
+        self.assertNotEqual(response.status_code, 403)
+
+    def test_other_endpoints_are_scanned(self):
+        response = self.client.post(
+            reverse('measurements:report-jobs'),
+            {'report_type': 'daily-averages', 'params': {'station_id': self.payload}},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['code'], 'SECURITY_BLOCK')